@@ -6,47 +6,217 @@
 
 import threading
 import time
-from typing import Any, Optional, Dict
+import random
+import sys
+import asyncio
+import functools
+import inspect
+import weakref
+from concurrent.futures import Future
+from contextlib import ExitStack
+from typing import Any, Optional, Dict, Hashable, List, Set, Tuple, Callable
 from collections import OrderedDict
 import json
 import hashlib
 from datetime import datetime, timedelta
 
+# 条目大小直方图分桶 (上界字节数, 标签)
+SIZE_HISTOGRAM_BUCKETS = [
+    (1024, "<1KB"),
+    (10 * 1024, "1KB-10KB"),
+    (100 * 1024, "10KB-100KB"),
+    (1024 * 1024, "100KB-1MB"),
+    (float("inf"), ">=1MB"),
+]
+
+def deep_sizeof(value: Any) -> int:
+    """递归累加sys.getsizeof，估算对象实际占用的内存字节数"""
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+    return total
+
+def serialized_sizeof(value: Any) -> int:
+    """按JSON序列化后的字节长度估算大小"""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+def _size_bucket(size: int) -> str:
+    """返回大小所属的直方图分桶"""
+    for upper, label in SIZE_HISTOGRAM_BUCKETS:
+        if size < upper:
+            return label
+    return SIZE_HISTOGRAM_BUCKETS[-1][1]
+
+def _raw_key(key: str) -> str:
+    return key
+
+def _md5_key(key: str) -> str:
+    return hashlib.md5(key.encode()).hexdigest()
+
+def _hash64_key(key: str) -> int:
+    # str的64位SipHash缓存在字符串对象上，进程内稳定；以定长整数作键，不保留原始字符串。
+    # 不同键哈希碰撞时会互相覆盖，概率约为 n^2 / 2^65，只适用于进程内的L1
+    return hash(key)
+
+# L1键模式: md5为旧的定长键，MemoryCache默认仍用md5，新增的分片与TinyLFU缓存默认raw；
+# raw直接用原始字符串（字符串自带缓存的哈希）；
+# intern驻留后使用，重复的键字符串共享一份；hash64用64位哈希整数作定长键。
+# 持久化层仍使用sha256定长键
+KEY_MODES = {
+    "md5": _md5_key,
+    "raw": _raw_key,
+    "intern": sys.intern,
+    "hash64": _hash64_key,
+}
+
+def _key_func(key_mode: str) -> Callable[[str], Hashable]:
+    """返回键模式对应的键生成函数"""
+    if key_mode not in KEY_MODES:
+        raise ValueError(f"未知的键模式: {key_mode}")
+    return KEY_MODES[key_mode]
+
+class SingleFlight:
+    """合并同一键的并发加载: loader只执行一次，其余调用方等待同一个future"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Future] = {}
+        # 事件循环 -> {键: 加载Task}；Task绑定在创建它的循环上，不同循环之间不合并
+        self._async_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, asyncio.Task]]" = \
+            weakref.WeakKeyDictionary()
+        self._stats = {"loads": 0, "coalesced": 0}
+    
+    def in_flight(self, key: Any) -> bool:
+        """该键是否有正在进行的加载"""
+        with self._lock:
+            return key in self._calls or any(key in calls for calls in self._async_calls.values())
+    
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        """线程版本: 同一键同时只有一个调用方执行fn，异常会传递给所有等待者"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._stats["loads"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+    
+    async def do_async(self, key: Any, fn: Callable[[], Any]) -> Any:
+        """asyncio版本: fn返回awaitable，作为独立的Task运行
+        
+        所有调用方（包括发起者）都通过shield等待该Task，任一调用方被取消只影响自身，
+        其余调用方照常拿到结果；所有调用方都被取消时Task仍会跑完并写入缓存
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._async_calls.setdefault(loop, {})
+            task = calls.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                calls[key] = task
+                task.add_done_callback(functools.partial(self._finish_async, calls, key))
+                self._stats["loads"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        
+        return await asyncio.shield(task)
+    
+    def _finish_async(self, calls: Dict[Any, asyncio.Task], key: Any, task: asyncio.Task) -> None:
+        with self._lock:
+            if calls.get(key) is task:
+                del calls[key]
+        # 标记异常已被读取，避免等待者全部取消时asyncio告警
+        if not task.cancelled():
+            task.exception()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """加载次数与被合并的调用次数"""
+        with self._lock:
+            return dict(self._stats)
+
 class MemoryCache:
     """线程安全的内存缓存实现"""
     
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    def __init__(self, max_size: int = 1000, ttl: int = 3600,
+                 max_bytes: Optional[int] = None,
+                 sizer: Optional[Callable[[Any], int]] = None,
+                 key_mode: str = "md5", stale_ttl: int = 0,
+                 on_evict: Optional[Callable[[str], None]] = None):
         self.max_size = max_size
         self.ttl = ttl
+        # 按容量或字节淘汰条目时以内部键回调，回调时持有锁
+        self.on_evict = on_evict
+        # 过期后仍保留stale_ttl秒，供get_or_compute在后台刷新期间返回旧值
+        self.stale_ttl = stale_ttl
+        self.key_mode = key_mode
+        self._generate_key = _key_func(key_mode)
+        self.max_bytes = max_bytes
+        self.sizer = sizer or deep_sizeof
         self._cache = OrderedDict()
         self._lock = threading.RLock()
+        self._bytes = 0
+        self._histogram = {label: 0 for _, label in SIZE_HISTOGRAM_BUCKETS}
+        self._flight = SingleFlight()
+        # 后台刷新Task的强引用，防止执行中被垃圾回收
+        self._refresh_tasks: Set[asyncio.Task] = set()
         self._stats = {
             "hits": 0,
             "misses": 0,
             "evictions": 0,
+            "oversize_rejections": 0,
             "size": 0
         }
     
-    def _generate_key(self, key: str) -> str:
-        """生成缓存键"""
-        return hashlib.md5(key.encode()).hexdigest()
-    
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
+        return self._get(self._generate_key(key))
+    
+    def _get(self, cache_key: str) -> Optional[Any]:
+        """按内部键获取缓存值"""
         with self._lock:
-            cache_key = self._generate_key(key)
-            
-            if cache_key not in self._cache:
+            entry = self._cache.get(cache_key)
+            if entry is None:
                 self._stats["misses"] += 1
                 return None
             
-            value, timestamp = self._cache[cache_key]
+            value, timestamp, _ = entry
             
-            # 检查过期
-            if time.time() - timestamp > self.ttl:
-                del self._cache[cache_key]
+            # 检查过期，仍在stale窗口内的条目保留给get_or_compute
+            age = time.time() - timestamp
+            if age > self.ttl:
+                if age > self.ttl + self.stale_ttl:
+                    self._remove(cache_key)
                 self._stats["misses"] += 1
-                self._stats["size"] = len(self._cache)
                 return None
             
             # 移动到末尾 (LRU)
@@ -54,33 +224,175 @@ class MemoryCache:
             self._stats["hits"] += 1
             return value
     
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，只返回命中的键"""
+        results = {}
+        with self._lock:
+            for key in keys:
+                value = self._get(self._generate_key(key))
+                if value is not None:
+                    results[key] = value
+        return results
+    
+    def _peek(self, cache_key: str, max_age: float) -> Optional[Any]:
+        """读取不超过max_age的值，不更新统计和LRU顺序"""
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is None or time.time() - entry[1] > max_age:
+                return None
+            return entry[0]
+    
+    def get_or_compute(self, key: str, loader: Callable[[], Any]) -> Any:
+        """获取缓存值，未命中时同一键只调用一次loader，并发调用方共享结果"""
+        cache_key = self._generate_key(key)
+        value = self._get(cache_key)
+        if value is not None:
+            return value
+        
+        if self.stale_ttl:
+            stale = self._peek(cache_key, self.ttl + self.stale_ttl)
+            if stale is not None:
+                # 返回旧值，同时只启动一个后台刷新
+                if not self._flight.in_flight(cache_key):
+                    threading.Thread(
+                        target=self._background_refresh, args=(cache_key, loader), daemon=True
+                    ).start()
+                return stale
+        
+        return self._flight.do(cache_key, lambda: self._load(cache_key, loader))
+    
+    async def aget_or_compute(self, key: str, loader: Callable[[], Any]) -> Any:
+        """get_or_compute的asyncio版本，loader可以是同步函数或协程函数"""
+        cache_key = self._generate_key(key)
+        value = self._get(cache_key)
+        if value is not None:
+            return value
+        
+        if self.stale_ttl:
+            stale = self._peek(cache_key, self.ttl + self.stale_ttl)
+            if stale is not None:
+                if not self._flight.in_flight(cache_key):
+                    task = asyncio.ensure_future(
+                        self._flight.do_async(cache_key, lambda: self._aload(cache_key, loader))
+                    )
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._finish_refresh)
+                return stale
+        
+        return await self._flight.do_async(cache_key, lambda: self._aload(cache_key, loader))
+    
+    def _load(self, cache_key: str, loader: Callable[[], Any]) -> Any:
+        """执行loader并写入缓存"""
+        # 双重检查: 上一轮加载可能刚刚写入
+        value = self._peek(cache_key, self.ttl)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self._set(cache_key, value, time.time())
+        return value
+    
+    async def _aload(self, cache_key: str, loader: Callable[[], Any]) -> Any:
+        """执行（可能是异步的）loader并写入缓存，同步loader放到线程池执行，不阻塞事件循环"""
+        value = self._peek(cache_key, self.ttl)
+        if value is None:
+            if inspect.iscoroutinefunction(loader):
+                value = await loader()
+            else:
+                value = await asyncio.get_running_loop().run_in_executor(None, loader)
+                # 兼容返回awaitable的普通函数
+                if inspect.isawaitable(value):
+                    value = await value
+            if value is not None:
+                self._set(cache_key, value, time.time())
+        return value
+    
+    def _finish_refresh(self, task: asyncio.Task) -> None:
+        """异步后台刷新结束: 释放引用并报告异常"""
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"缓存后台刷新错误: {task.exception()}")
+    
+    def _background_refresh(self, cache_key: str, loader: Callable[[], Any]) -> None:
+        """后台刷新过期值"""
+        try:
+            self._flight.do(cache_key, lambda: self._load(cache_key, loader))
+        except Exception as e:
+            print(f"缓存后台刷新错误: {e}")
+    
     def set(self, key: str, value: Any) -> None:
         """设置缓存值"""
+        self._set(self._generate_key(key), value, time.time())
+    
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """批量设置缓存值"""
+        now = time.time()
+        for key, value in items.items():
+            self._set(self._generate_key(key), value, now)
+    
+    def _set(self, cache_key: str, value: Any, timestamp: float) -> None:
+        """按内部键设置缓存值"""
+        # 在锁外计算大小，避免深度遍历阻塞其他线程
+        self._store(cache_key, value, timestamp, self.sizer(value))
+    
+    def _store(self, cache_key: str, value: Any, timestamp: float, size: int) -> bool:
+        """写入已计算大小的条目，返回是否写入（超过字节预算时拒绝）"""
         with self._lock:
-            cache_key = self._generate_key(key)
-            
             # 如果已存在，先删除
             if cache_key in self._cache:
-                del self._cache[cache_key]
+                self._remove(cache_key)
             
-            # 检查容量
-            if len(self._cache) >= self.max_size:
-                # 移除最旧的
-                oldest_key = next(iter(self._cache))
-                del self._cache[oldest_key]
+            # 单个值超过字节预算时不缓存
+            if self.max_bytes is not None and size > self.max_bytes:
+                self._stats["oversize_rejections"] += 1
+                return False
+            
+            # 检查容量（条目数和字节数），移除最旧的
+            while self._cache and (
+                len(self._cache) >= self.max_size or
+                (self.max_bytes is not None and self._bytes + size > self.max_bytes)
+            ):
+                evicted = next(iter(self._cache))
+                self._remove(evicted)
                 self._stats["evictions"] += 1
+                if self.on_evict:
+                    self.on_evict(evicted)
             
-            self._cache[cache_key] = (value, time.time())
-            self._cache.move_to_end(cache_key)
+            self._cache[cache_key] = (value, timestamp, size)
+            self._bytes += size
+            self._histogram[_size_bucket(size)] += 1
             self._stats["size"] = len(self._cache)
+            return True
+    
+    def _remove(self, cache_key: str) -> None:
+        """移除条目并更新字节统计，调用方需持有锁"""
+        _, _, size = self._cache.pop(cache_key)
+        self._bytes -= size
+        self._histogram[_size_bucket(size)] -= 1
+        self._stats["size"] = len(self._cache)
+    
+    def _expire(self, cache_key: str, now: float) -> bool:
+        """若内部键已过期则移除，供时间轮回收调用"""
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is None or now - entry[1] <= self.ttl + self.stale_ttl:
+                return False
+            self._remove(cache_key)
+            return True
     
     def delete(self, key: str) -> bool:
         """删除缓存项"""
+        return self._delete(self._generate_key(key))
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        with self._lock:
+            return sum(self._delete(self._generate_key(key)) for key in keys)
+    
+    def _delete(self, cache_key: str) -> bool:
+        """按内部键删除缓存项"""
         with self._lock:
-            cache_key = self._generate_key(key)
             if cache_key in self._cache:
-                del self._cache[cache_key]
-                self._stats["size"] = len(self._cache)
+                self._remove(cache_key)
                 return True
             return False
     
@@ -88,6 +400,8 @@ class MemoryCache:
         """清空缓存"""
         with self._lock:
             self._cache.clear()
+            self._bytes = 0
+            self._histogram = {label: 0 for _, label in SIZE_HISTOGRAM_BUCKETS}
             self._stats["size"] = 0
     
     def get_stats(self) -> Dict[str, Any]:
@@ -99,26 +413,533 @@ class MemoryCache:
             return {
                 **self._stats,
                 "hit_rate": hit_rate,
-                "memory_usage_mb": len(self._cache) * 0.001  # 估算
+                "memory_usage_mb": self._bytes / (1024 * 1024),
+                "resident_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "avg_entry_bytes": self._bytes / len(self._cache) if self._cache else 0,
+                "size_histogram": dict(self._histogram),
+                "single_flight": self._flight.get_stats()
+            }
+
+class TimingWheel:
+    """分层时间轮，O(1)登记、改期与取消过期时间，每个tick只处理一个槽位
+    
+    槽位为 条目 -> 到期tick 的字典，_locations记录条目所在的(层级, 槽位)，
+    重复登记时先从原槽位摘除，每个条目在轮上始终只有一个登记
+    """
+    
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 3):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: List[List[Dict[Any, int]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._locations: Dict[Any, Tuple[int, int]] = {}
+        self._current_tick = int(time.time() / tick)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locations)
+    
+    def schedule(self, item: Any, expire_at: float) -> None:
+        """登记一个在expire_at时刻过期的条目，已登记的条目改期"""
+        with self._lock:
+            expire_tick = max(int(expire_at / self.tick) + 1, self._current_tick + 1)
+            self._unlink(item)
+            self._place(item, expire_tick)
+    
+    def cancel(self, item: Any) -> bool:
+        """取消条目的登记"""
+        with self._lock:
+            return self._unlink(item)
+    
+    def clear(self) -> None:
+        """取消全部登记"""
+        with self._lock:
+            for wheel in self._wheels:
+                for bucket in wheel:
+                    bucket.clear()
+            self._locations.clear()
+    
+    def _unlink(self, item: Any) -> bool:
+        location = self._locations.pop(item, None)
+        if location is None:
+            return False
+        level, slot = location
+        del self._wheels[level][slot][item]
+        return True
+    
+    def _place(self, item: Any, expire_tick: int) -> None:
+        """按剩余tick数放入对应层级的槽位"""
+        delta = expire_tick - self._current_tick
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots or level == self.levels - 1:
+                slot = (expire_tick // span) % self.slots
+                self._wheels[level][slot][item] = expire_tick
+                self._locations[item] = (level, slot)
+                return
+            span *= self.slots
+    
+    def advance(self, now: float) -> List[Any]:
+        """推进时间轮到now，返回到期的条目"""
+        target_tick = int(now / self.tick)
+        expired = []
+        with self._lock:
+            while self._current_tick < target_tick:
+                self._current_tick += 1
+                tick = self._current_tick
+                
+                # 高层槽位到达边界时下放到低层
+                span = self.slots
+                for level in range(1, self.levels):
+                    if tick % span:
+                        break
+                    slot = (tick // span) % self.slots
+                    bucket = self._wheels[level][slot]
+                    self._wheels[level][slot] = {}
+                    for item, expire_tick in bucket.items():
+                        self._place(item, expire_tick)
+                    span *= self.slots
+                
+                slot = tick % self.slots
+                bucket = self._wheels[0][slot]
+                self._wheels[0][slot] = {}
+                for item in bucket:
+                    del self._locations[item]
+                expired.extend(bucket)
+        return expired
+
+class ShardedMemoryCache:
+    """分片锁的内存缓存，配合时间轮主动回收过期条目"""
+    
+    def __init__(self, max_size: int = 1000, ttl: int = 3600, num_shards: int = 16,
+                 tick: float = 1.0, background_expiry: bool = True,
+                 max_bytes: Optional[int] = None,
+                 sizer: Optional[Callable[[Any], int]] = None,
+                 key_mode: str = "raw"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.num_shards = num_shards
+        self.key_mode = key_mode
+        self._generate_key = _key_func(key_mode)
+        self.max_bytes = max_bytes
+        shard_size = max(1, max_size // num_shards)
+        shard_bytes = max(1, max_bytes // num_shards) if max_bytes is not None else None
+        # 每个键在时间轮上只有一个登记: 覆盖时改期，删除和淘汰时取消
+        self._wheel = TimingWheel(tick=tick)
+        self._shards = [
+            MemoryCache(max_size=shard_size, ttl=ttl, max_bytes=shard_bytes, sizer=sizer,
+                        key_mode=key_mode, on_evict=functools.partial(self._unschedule, index))
+            for index in range(num_shards)
+        ]
+        self._expirations = 0
+        self._stop_event = threading.Event()
+        self._expiry_thread = None
+        if background_expiry:
+            self._expiry_thread = threading.Thread(
+                target=self._expiry_loop, name="memory-cache-expiry", daemon=True
+            )
+            self._expiry_thread.start()
+    
+    def _shard_index(self, cache_key: str) -> int:
+        """根据键哈希选择分片"""
+        return hash(cache_key) % self.num_shards
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        cache_key = self._generate_key(key)
+        return self._shards[self._shard_index(cache_key)]._get(cache_key)
+    
+    def _group_by_shard(self, keys: List[str]) -> Dict[int, List[Tuple[str, str]]]:
+        """按分片分组，返回 分片 -> [(原始键, 内部键)]"""
+        groups: Dict[int, List[Tuple[str, str]]] = {}
+        for key in keys:
+            cache_key = self._generate_key(key)
+            groups.setdefault(self._shard_index(cache_key), []).append((key, cache_key))
+        return groups
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，每个分片只加锁一次"""
+        results = {}
+        for index, pairs in self._group_by_shard(keys).items():
+            shard = self._shards[index]
+            with shard._lock:
+                for key, cache_key in pairs:
+                    value = shard._get(cache_key)
+                    if value is not None:
+                        results[key] = value
+        return results
+    
+    def set(self, key: str, value: Any) -> None:
+        """设置缓存值，并在时间轮上登记过期时间"""
+        cache_key = self._generate_key(key)
+        self._set(self._shard_index(cache_key), cache_key, value, time.time())
+    
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """批量设置缓存值"""
+        now = time.time()
+        for index, pairs in self._group_by_shard(list(items)).items():
+            for key, cache_key in pairs:
+                self._set(index, cache_key, items[key], now)
+    
+    def _set(self, index: int, cache_key: str, value: Any, timestamp: float) -> None:
+        """写入条目与时间轮登记在同一分片锁内完成，并发的set/delete不会让两者错位"""
+        shard = self._shards[index]
+        # 大小在锁外计算，避免深度遍历阻塞同分片的其他线程
+        size = shard.sizer(value)
+        with shard._lock:
+            if shard._store(cache_key, value, timestamp, size):
+                self._wheel.schedule((index, cache_key), timestamp + self.ttl)
+            else:
+                # 超过字节预算被拒绝时旧条目已移除
+                self._unschedule(index, cache_key)
+    
+    def _unschedule(self, index: int, cache_key: str) -> None:
+        self._wheel.cancel((index, cache_key))
+    
+    def _delete(self, index: int, cache_key: str) -> bool:
+        """删除条目并取消其时间轮登记；在分片锁内完成，避免与并发set交错后漏掉新登记"""
+        shard = self._shards[index]
+        with shard._lock:
+            if not shard._delete(cache_key):
+                return False
+            self._unschedule(index, cache_key)
+            return True
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存项"""
+        cache_key = self._generate_key(key)
+        return self._delete(self._shard_index(cache_key), cache_key)
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        deleted = 0
+        for index, pairs in self._group_by_shard(keys).items():
+            with self._shards[index]._lock:
+                deleted += sum(self._delete(index, cache_key) for _, cache_key in pairs)
+        return deleted
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with ExitStack() as stack:
+            for shard in self._shards:
+                stack.enter_context(shard._lock)
+            for shard in self._shards:
+                shard.clear()
+            self._wheel.clear()
+    
+    def expire(self, now: Optional[float] = None) -> int:
+        """推进时间轮并回收到期条目，返回回收数量"""
+        now = now if now is not None else time.time()
+        reclaimed = 0
+        # 登记与条目在分片锁内同步维护；_expire仍校验时间戳，跳过到期前刚被改写的条目
+        for index, cache_key in self._wheel.advance(now):
+            if self._shards[index]._expire(cache_key, now):
+                reclaimed += 1
+        self._expirations += reclaimed
+        return reclaimed
+    
+    def _expiry_loop(self) -> None:
+        """后台过期回收循环"""
+        while not self._stop_event.wait(self._wheel.tick):
+            try:
+                self.expire()
+            except Exception as e:
+                print(f"过期回收错误: {e}")
+    
+    def close(self) -> None:
+        """停止后台回收线程"""
+        self._stop_event.set()
+        if self._expiry_thread:
+            self._expiry_thread.join()
+            self._expiry_thread = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计（汇总所有分片）"""
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "oversize_rejections": 0, "size": 0}
+        resident_bytes = 0
+        histogram = {label: 0 for _, label in SIZE_HISTOGRAM_BUCKETS}
+        for shard in self._shards:
+            with shard._lock:
+                for name in totals:
+                    totals[name] += shard._stats[name]
+                resident_bytes += shard._bytes
+                for label, count in shard._histogram.items():
+                    histogram[label] += count
+        
+        total_requests = totals["hits"] + totals["misses"]
+        hit_rate = totals["hits"] / total_requests if total_requests > 0 else 0
+        
+        return {
+            **totals,
+            "hit_rate": hit_rate,
+            "memory_usage_mb": resident_bytes / (1024 * 1024),
+            "resident_bytes": resident_bytes,
+            "max_bytes": self.max_bytes,
+            "avg_entry_bytes": resident_bytes / totals["size"] if totals["size"] else 0,
+            "size_histogram": histogram,
+            "expirations": self._expirations,
+            "wheel_entries": len(self._wheel),
+            "num_shards": self.num_shards
+        }
+
+class CountMinSketch:
+    """带周期衰减的Count-Min Sketch频率估计器"""
+    
+    def __init__(self, width: int, depth: int = 4, max_count: int = 15,
+                 sample_size: Optional[int] = None):
+        # 宽度取2的幂，便于用掩码取槽位
+        self.width = 1 << max(4, (max(width, 1) - 1).bit_length())
+        self._mask = self.width - 1
+        self.depth = depth
+        self.max_count = max_count
+        self.sample_size = sample_size or 10 * width
+        self._tables = [[0] * self.width for _ in range(depth)]
+        self._additions = 0
+    
+    def _indexes(self, key: Any) -> List[int]:
+        """双重哈希生成每一行的槽位"""
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        return [(h1 + i * h2) & self._mask for i in range(self.depth)]
+    
+    def increment(self, key: Any) -> None:
+        """记录一次访问，达到采样窗口后整体衰减"""
+        for row, index in zip(self._tables, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+    
+    def estimate(self, key: Any) -> int:
+        """估计访问频率"""
+        return min(row[index] for row, index in zip(self._tables, self._indexes(key)))
+    
+    def _age(self) -> None:
+        """所有计数减半，让旧的热点逐渐冷却"""
+        for row in self._tables:
+            for i in range(self.width):
+                row[i] >>= 1
+        self._additions //= 2
+
+class WTinyLFUCache:
+    """W-TinyLFU缓存: 窗口LRU + 分段主LRU + 基于频率的准入"""
+    
+    def __init__(self, max_size: int = 1000, ttl: int = 3600,
+                 window_ratio: float = 0.01, protected_ratio: float = 0.8,
+                 key_mode: str = "raw"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.key_mode = key_mode
+        self._generate_key = _key_func(key_mode)
+        self.window_size = max(1, int(max_size * window_ratio))
+        self.main_size = max(1, max_size - self.window_size)
+        self.protected_size = max(1, int(self.main_size * protected_ratio))
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._sketch = CountMinSketch(width=max_size)
+        # get未命中时已计数、尚未写入的键；紧随其后的set不再重复计数
+        self._counted_misses: OrderedDict = OrderedDict()
+        self._counted_limit = max(64, self.window_size)
+        self._lock = threading.RLock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "admissions": 0,
+            "rejections": 0,
+            "size": 0
+        }
+    
+    def _find(self, cache_key: str) -> Optional[OrderedDict]:
+        """返回键所在的分段"""
+        for segment in (self._window, self._probation, self._protected):
+            if cache_key in segment:
+                return segment
+        return None
+    
+    def _update_size(self) -> None:
+        self._stats["size"] = len(self._window) + len(self._probation) + len(self._protected)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，命中试用段的键晋升到保护段"""
+        cache_key = self._generate_key(key)
+        with self._lock:
+            self._sketch.increment(cache_key)
+            segment = self._find(cache_key)
+            if segment is None:
+                self._miss(cache_key)
+                return None
+            
+            value, expire_at = segment[cache_key]
+            
+            # 检查过期
+            if time.time() > expire_at:
+                del segment[cache_key]
+                self._update_size()
+                self._miss(cache_key)
+                return None
+            
+            if segment is self._probation:
+                del self._probation[cache_key]
+                self._protected[cache_key] = (value, expire_at)
+                # 保护段溢出时，最旧的降级回试用段
+                if len(self._protected) > self.protected_size:
+                    demoted_key, demoted = self._protected.popitem(last=False)
+                    self._probation[demoted_key] = demoted
+            else:
+                segment.move_to_end(cache_key)
+            
+            self._stats["hits"] += 1
+            return value
+    
+    def _miss(self, cache_key: str) -> None:
+        self._stats["misses"] += 1
+        self._counted_misses[cache_key] = None
+        self._counted_misses.move_to_end(cache_key)
+        if len(self._counted_misses) > self._counted_limit:
+            self._counted_misses.popitem(last=False)
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """设置缓存值，新键先进入窗口段
+        
+        每次访问只计一次频率: 未命中后回填的set已在get中计数，直接set的键在这里计数
+        """
+        cache_key = self._generate_key(key)
+        expire_at = time.time() + (ttl or self.ttl)
+        with self._lock:
+            if cache_key in self._counted_misses:
+                del self._counted_misses[cache_key]
+            else:
+                self._sketch.increment(cache_key)
+            segment = self._find(cache_key)
+            if segment is not None:
+                segment[cache_key] = (value, expire_at)
+                segment.move_to_end(cache_key)
+                return
+            
+            self._window[cache_key] = (value, expire_at)
+            if len(self._window) > self.window_size:
+                candidate_key, candidate = self._window.popitem(last=False)
+                self._admit(candidate_key, candidate)
+            self._update_size()
+    
+    def _admit(self, candidate_key: str, candidate: Tuple[Any, float]) -> None:
+        """窗口淘汰的候选与主区受害者比较频率，只有更热的才能进入"""
+        if len(self._probation) + len(self._protected) < self.main_size:
+            self._probation[candidate_key] = candidate
+            return
+        
+        victim_segment = self._probation if self._probation else self._protected
+        victim_key = next(iter(victim_segment))
+        if self._sketch.estimate(candidate_key) > self._sketch.estimate(victim_key):
+            del victim_segment[victim_key]
+            self._probation[candidate_key] = candidate
+            self._stats["admissions"] += 1
+        else:
+            self._stats["rejections"] += 1
+        self._stats["evictions"] += 1
+    
+    def segment_of(self, key: str) -> Optional[str]:
+        """返回键当前所在的分段名称"""
+        cache_key = self._generate_key(key)
+        with self._lock:
+            for name, segment in (("window", self._window), ("probation", self._probation),
+                                  ("protected", self._protected)):
+                if cache_key in segment:
+                    return name
+        return None
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存项"""
+        cache_key = self._generate_key(key)
+        with self._lock:
+            segment = self._find(cache_key)
+            if segment is None:
+                return False
+            del segment[cache_key]
+            self._update_size()
+            return True
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._window.clear()
+            self._probation.clear()
+            self._protected.clear()
+            self._counted_misses.clear()
+            self._update_size()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            total_requests = self._stats["hits"] + self._stats["misses"]
+            hit_rate = self._stats["hits"] / total_requests if total_requests > 0 else 0
+            
+            return {
+                **self._stats,
+                "hit_rate": hit_rate,
+                "segments": {
+                    "window": len(self._window),
+                    "probation": len(self._probation),
+                    "protected": len(self._protected)
+                }
             }
 
 class AdvancedMemoryCache:
-    """支持TTL分级的内存缓存"""
+    """支持TTL分级的内存缓存
     
-    def __init__(self):
-        self.caches = {
-            "hot": MemoryCache(max_size=100, ttl=300),      # 5分钟
-            "warm": MemoryCache(max_size=500, ttl=1800),  # 30分钟
-            "cold": MemoryCache(max_size=1000, ttl=3600)  # 1小时
+    默认policy="tiered"为热/温/冷三层LRU；policy="tinylfu"时改为单个W-TinyLFU缓存，
+    层级只决定TTL，caches为空
+    """
+    
+    # 各层级占总容量与TTL的比例，默认值对应 100/500/1000 条、5分钟/30分钟/1小时
+    TIER_SIZE_RATIOS = {"hot": 1 / 16, "warm": 5 / 16, "cold": 10 / 16}
+    TIER_TTL_RATIOS = {"hot": 1 / 12, "warm": 1 / 2, "cold": 1}
+    # W-TinyLFU分段与层级的对应关系
+    SEGMENT_TIERS = {"protected": "hot", "probation": "warm", "window": "cold"}
+    
+    def __init__(self, max_size: int = 1600, ttl: int = 3600, policy: str = "tiered"):
+        if policy not in ("tinylfu", "tiered"):
+            raise ValueError(f"未知的缓存策略: {policy}")
+        
+        self.policy = policy
+        self.tier_ttls = {
+            tier: max(1, int(ttl * ratio)) for tier, ratio in self.TIER_TTL_RATIOS.items()
         }
+        self.caches = {}
+        self.store = None
+        
+        if policy == "tinylfu":
+            # 统一容量，由频率准入决定谁留下
+            self.store = WTinyLFUCache(max_size=max_size, ttl=ttl)
+        else:
+            self.caches = {
+                tier: MemoryCache(max_size=max(1, int(max_size * ratio)), ttl=self.tier_ttls[tier])
+                for tier, ratio in self.TIER_SIZE_RATIOS.items()
+            }
     
     def get_tier(self, key: str) -> str:
         """根据访问频率决定缓存层级"""
-        # 简化的实现，实际可基于访问频率统计
+        if self.store is not None:
+            segment = self.store.segment_of(key)
+            return self.SEGMENT_TIERS.get(segment, "cold")
+        
+        for tier in ["hot", "warm", "cold"]:
+            cache = self.caches[tier]
+            if cache._generate_key(key) in cache._cache:
+                return tier
         return "hot"  # 默认热点
     
     def get(self, key: str) -> Optional[Any]:
         """分层获取"""
+        if self.store is not None:
+            return self.store.get(key)
+        
         for tier in ["hot", "warm", "cold"]:
             value = self.caches[tier].get(key)
             if value is not None:
@@ -129,10 +950,196 @@ class AdvancedMemoryCache:
                 return value
         return None
     
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量分层获取，只返回命中的键"""
+        results = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                results[key] = value
+        return results
+    
     def set(self, key: str, value: Any, tier: str = "warm") -> None:
         """分层设置"""
-        if tier in self.caches:
+        if tier not in self.tier_ttls:
+            return
+        if self.store is not None:
+            self.store.set(key, value, ttl=self.tier_ttls[tier])
+        else:
             self.caches[tier].set(key, value)
+    
+    def set_many(self, items: Dict[str, Any], tier: str = "warm") -> None:
+        """批量分层设置"""
+        for key, value in items.items():
+            self.set(key, value, tier=tier)
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存项"""
+        if self.store is not None:
+            return self.store.delete(key)
+        return any([cache.delete(key) for cache in self.caches.values()])
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        return sum(self.delete(key) for key in keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        if self.store is not None:
+            return self.store.get_stats()
+        return {tier: cache.get_stats() for tier, cache in self.caches.items()}
+
+def benchmark_key_modes(sizes: Tuple[int, ...] = (1000, 100000, 1000000),
+                        ops: int = 200000) -> List[Dict[str, Any]]:
+    """各键模式下 get命中/get未命中/set 的单次耗时(ns/op)"""
+    results = []
+    rng = random.Random(42)
+    
+    for size in sizes:
+        keys = [f"prompt:{i}:请解释一下缓存的工作原理" for i in range(size)]
+        hit_keys = [keys[rng.randrange(size)] for _ in range(ops)]
+        miss_keys = [f"missing:{i}" for i in range(ops)]
+        
+        for mode in KEY_MODES:
+            # 使用sys.getsizeof作为sizer，避免深度遍历干扰键开销的测量
+            cache = MemoryCache(max_size=size, ttl=3600, sizer=sys.getsizeof, key_mode=mode)
+            for key in keys:
+                cache.set(key, 1)
+            
+            timings = {}
+            for op_name, op, op_keys in (
+                ("get_hit", cache.get, hit_keys),
+                ("get_miss", cache.get, miss_keys),
+            ):
+                start = time.perf_counter_ns()
+                for key in op_keys:
+                    op(key)
+                timings[op_name] = (time.perf_counter_ns() - start) / ops
+            
+            start = time.perf_counter_ns()
+            for key in hit_keys:
+                cache.set(key, 2)
+            timings["set"] = (time.perf_counter_ns() - start) / ops
+            
+            results.append({"entries": size, "key_mode": mode, **timings})
+            print(f"entries={size:<8} mode={mode:<7} "
+                  f"get_hit={timings['get_hit']:>7.0f}ns get_miss={timings['get_miss']:>7.0f}ns "
+                  f"set={timings['set']:>7.0f}ns")
+            del cache
+    
+    return results
+
+def zipf_trace(length: int, num_keys: int, alpha: float = 1.0, seed: int = 42) -> List[str]:
+    """生成Zipf分布的键访问序列"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** alpha) for rank in range(1, num_keys + 1)]
+    cum_weights = []
+    total = 0.0
+    for w in weights:
+        total += w
+        cum_weights.append(total)
+    return [f"zipf:{rank}" for rank in rng.choices(range(num_keys), cum_weights=cum_weights, k=length)]
+
+def scan_trace(length: int, num_keys: int, scan_every: int = 5000,
+               scan_length: int = 3000, alpha: float = 1.0, seed: int = 42) -> List[str]:
+    """Zipf热点访问中穿插一次性的长扫描（如批量的一次性prompt）"""
+    base = zipf_trace(length, num_keys, alpha, seed)
+    trace = []
+    scan_id = 0
+    for i, key in enumerate(base):
+        trace.append(key)
+        if i and i % scan_every == 0:
+            trace.extend(f"scan:{scan_id}:{n}" for n in range(scan_length))
+            scan_id += 1
+    return trace
+
+def load_trace(path: str) -> List[str]:
+    """加载录制的键序列，每行一个键"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def replay_trace(cache: Any, trace: List[str]) -> float:
+    """回放键序列，未命中时回填，返回命中率"""
+    hits = 0
+    for key in trace:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, key)
+    return hits / len(trace) if trace else 0.0
+
+def compare_admission_policies(traces: Dict[str, List[str]], max_size: int = 1600) -> List[Dict[str, Any]]:
+    """对比同容量LRU、原分层LRU与W-TinyLFU在各序列上的命中率
+    
+    回放时未命中的键写入warm层，分层LRU实际只用到hot+warm的容量，
+    因此以容量为max_size的单层LRU作为同等容量的基线
+    """
+    factories = {
+        "lru": lambda: MemoryCache(max_size=max_size),
+        "tiered": lambda: AdvancedMemoryCache(max_size=max_size, policy="tiered"),
+        "tinylfu": lambda: AdvancedMemoryCache(max_size=max_size, policy="tinylfu"),
+    }
+    results = []
+    for trace_name, trace in traces.items():
+        for policy, factory in factories.items():
+            cache = factory()
+            if policy == "tiered":
+                capacity = cache.caches["hot"].max_size + cache.caches["warm"].max_size
+            else:
+                capacity = max_size
+            hit_rate = replay_trace(cache, trace)
+            results.append({"trace": trace_name, "policy": policy, "capacity": capacity,
+                            "hit_rate": hit_rate})
+            print(f"{trace_name:<12} {policy:<8} 有效容量: {capacity:<5} 命中率: {hit_rate:.2%}")
+    return results
+
+def benchmark_contention(thread_counts: Tuple[int, ...] = (1, 4, 16, 64),
+                         ops_per_thread: int = 20000, key_space: int = 5000) -> List[Dict[str, Any]]:
+    """对比MemoryCache与ShardedMemoryCache在多线程下的吞吐"""
+    factories = {
+        "MemoryCache": lambda: MemoryCache(max_size=key_space, ttl=60),
+        "ShardedMemoryCache": lambda: ShardedMemoryCache(max_size=key_space, ttl=60, num_shards=16),
+    }
+    results = []
+    
+    for name, factory in factories.items():
+        for threads in thread_counts:
+            cache = factory()
+            for i in range(key_space):
+                cache.set(f"key:{i}", i)
+            
+            def worker(seed: int):
+                rng = random.Random(seed)
+                for _ in range(ops_per_thread):
+                    key = f"key:{rng.randrange(key_space)}"
+                    # 80%读 20%写
+                    if rng.random() < 0.8:
+                        cache.get(key)
+                    else:
+                        cache.set(key, seed)
+            
+            workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+            start = time.perf_counter()
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+            elapsed = time.perf_counter() - start
+            
+            if hasattr(cache, "close"):
+                cache.close()
+            
+            total_ops = threads * ops_per_thread
+            results.append({
+                "cache": name,
+                "threads": threads,
+                "ops": total_ops,
+                "seconds": round(elapsed, 3),
+                "ops_per_sec": round(total_ops / elapsed)
+            })
+            print(f"{name:<20} threads={threads:<3} {total_ops / elapsed:>12,.0f} ops/s")
+    
+    return results
 
 # 使用示例
 if __name__ == "__main__":
@@ -147,4 +1154,19 @@ if __name__ == "__main__":
     
     # 获取统计
     stats = cache.get_stats()
-    print(f"缓存统计: {json.dumps(stats, indent=2, ensure_ascii=False)}")
\ No newline at end of file
+    print(f"缓存统计: {json.dumps(stats, indent=2, ensure_ascii=False)}")
+    
+    # 锁竞争与键模式基准测试: python 11_memory_cache.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_contention()
+        benchmark_key_modes()
+    
+    # 准入策略回放: python 11_memory_cache.py --replay [trace.txt ...]
+    if "--replay" in sys.argv:
+        traces = {
+            "zipf": zipf_trace(200000, 20000),
+            "zipf+scan": scan_trace(200000, 20000),
+        }
+        for path in sys.argv[sys.argv.index("--replay") + 1:]:
+            traces[path] = load_trace(path)
+        compare_admission_policies(traces)
\ No newline at end of file
@@ -8,34 +8,198 @@ import sqlite3
 import json
 import time
 import threading
-from typing import Any, Optional, Dict, List
+import os
+import sys
+import tempfile
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Dict, List, Iterator, Set
 from datetime import datetime, timedelta
 import hashlib
 
+from cache_codec import ValueCodec
+
+# 持久连接的默认PRAGMA
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",      # 写入不阻塞读取
+    "synchronous": "NORMAL",    # WAL模式下NORMAL即可保证一致性
+    "mmap_size": 268435456,     # 256MB内存映射读
+    "cache_size": -65536,       # 64MB页缓存（负数单位为KB）
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# 批量操作中单条IN语句的最大参数个数
+IN_CHUNK_SIZE = 500
+
+class _ThreadConnection:
+    """线程局部存储中的连接持有者，线程退出时随局部存储一起被回收"""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+def _release_connection(conn: sqlite3.Connection, connections: Set[sqlite3.Connection],
+                        lock: threading.RLock):
+    """持有者回收时关闭连接；不引用缓存实例，避免线程存活期间延长其生命周期"""
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
 class SQLiteCache:
     """SQLite本地缓存实现"""
     
-    def __init__(self, db_path: str = "cache.db", table_name: str = "cache_data"):
+    def __init__(self, db_path: str = "cache.db", table_name: str = "cache_data",
+                 persistent: bool = True, pragmas: Dict[str, Any] = None,
+                 access_flush_every: int = 100, access_flush_interval_ms: int = 1000,
+                 max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                 janitor_interval: Optional[float] = None, sweep_batch_size: int = 500,
+                 vacuum_interval: float = 3600, vacuum_pages: int = 1000,
+                 codec: Optional[ValueCodec] = None):
         self.db_path = db_path
         self.table_name = table_name
+        # 值以带头字节的二进制存储，旧的JSON文本行仍可读取
+        self.codec = codec or ValueCodec()
+        # persistent=False时保留旧行为：每次操作新建连接，不设置PRAGMA
+        self.persistent = persistent
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})} if persistent else dict(pragmas or {})
         self._lock = threading.RLock()
+        self._local = threading.local()
+        # 仍存活线程的持久连接，线程退出后由_release_connection关闭并移除
+        self._connections: Set[sqlite3.Connection] = set()
+        # 访问统计先在内存中累计，每N次命中或每T毫秒批量写回，读路径保持只读
+        # 按时间写回由后台清理线程完成；未启动清理线程时才退回到下一次命中时检查
+        self.access_flush_every = access_flush_every
+        self.access_flush_interval = access_flush_interval_ms / 1000
+        self._access_lock = threading.Lock()
+        self._pending_access: Dict[str, List[float]] = {}
+        self._pending_hits = 0
+        self._last_access_flush = time.monotonic()
+        # 后台清理: 分批删除过期行、按最近访问淘汰超限行、定期增量VACUUM
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.sweep_batch_size = sweep_batch_size
+        self.vacuum_interval = vacuum_interval
+        self.vacuum_pages = vacuum_pages
+        self._last_vacuum = time.monotonic()
+        self._janitor_thread = None
+        self._janitor_stop = threading.Event()
+        self._janitor_stats = {
+            "expired_rows": 0,
+            "evicted_rows": 0,
+            "reclaimed_bytes": 0,
+            "janitor_runs": 0
+        }
         self._init_db()
+        if janitor_interval:
+            self.start_janitor(janitor_interval)
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """新建连接并应用PRAGMA"""
+        # 同一SQL文本的预编译语句由连接内的语句缓存复用
+        conn = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=False)
+        # 标签表依赖外键级联删除
+        conn.execute("PRAGMA foreign_keys = ON")
+        # REPLACE覆盖旧行时也触发删除触发器，全文索引同步依赖此项
+        conn.execute("PRAGMA recursive_triggers = ON")
+        # 必须在建表和切换WAL之前设置才会生效，对已有数据库无影响
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+    
+    def _thread_connection(self) -> sqlite3.Connection:
+        """获取当前线程的持久连接，线程退出后连接自动关闭"""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = self._open_connection()
+            holder = _ThreadConnection(conn)
+            self._local.holder = holder
+            with self._lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _release_connection, conn, self._connections, self._lock)
+        return holder.conn
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """获取连接，持久模式下复用本线程连接"""
+        if self.persistent:
+            yield self._thread_connection()
+            return
+        
+        conn = self._open_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    def close(self):
+        """停止后台清理，写回访问统计并关闭所有线程的持久连接"""
+        self.stop_janitor()
+        self.flush_access_stats()
+        with self._lock:
+            # 终结器可能在持锁期间重入并修改集合，先取快照
+            for conn in list(self._connections):
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    def _create_table(self, conn: sqlite3.Connection, name: str) -> None:
+        # 显式的INTEGER PRIMARY KEY即rowid别名，VACUUM不会重新编号，可供其他表引用
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {name} (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                value BLOB NOT NULL,
+                data_type TEXT DEFAULT 'json',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                access_count INTEGER DEFAULT 1,
+                ttl INTEGER DEFAULT 86400,
+                tags TEXT DEFAULT '[]',
+                last_accessed REAL
+            )
+        """)
+    
+    def _migrate_row_ids(self, conn: sqlite3.Connection) -> None:
+        """旧表以key为主键、只有隐式rowid，重建为带id列的表，id沿用原rowid"""
+        new_table = f"{self.table_name}_migrating"
+        conn.commit()
+        # 删除旧表时不能级联删除标签，外键检查只能在事务外关闭
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            conn.execute("BEGIN")
+            try:
+                self._create_table(conn, new_table)
+                conn.execute(f"""
+                    INSERT INTO {new_table}
+                    (id, key, value, data_type, created_at, updated_at, access_count, ttl, tags,
+                     last_accessed)
+                    SELECT rowid, key, value, data_type, created_at, updated_at, access_count, ttl,
+                           tags, last_accessed
+                    FROM {self.table_name}
+                """)
+                conn.execute(f"DROP TABLE {self.table_name}")
+                conn.execute(f"ALTER TABLE {new_table} RENAME TO {self.table_name}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
     
     def _init_db(self):
         """初始化数据库表"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(f"""
-                CREATE TABLE IF NOT EXISTS {self.table_name} (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
-                    data_type TEXT DEFAULT 'json',
-                    created_at REAL NOT NULL,
-                    updated_at REAL NOT NULL,
-                    access_count INTEGER DEFAULT 1,
-                    ttl INTEGER DEFAULT 86400,
-                    tags TEXT DEFAULT '[]'
-                )
-            """)
+        with self._connect() as conn, conn:
+            self._create_table(conn, self.table_name)
+            
+            # 旧表补充last_accessed列：updated_at只作为TTL起点，访问时间单独记录
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table_name})")}
+            if "last_accessed" not in columns:
+                conn.execute(f"ALTER TABLE {self.table_name} ADD COLUMN last_accessed REAL")
+                conn.execute(f"UPDATE {self.table_name} SET last_accessed = updated_at")
+            if "id" not in columns:
+                self._migrate_row_ids(conn)
             
             # 创建索引
             conn.execute(f"""
@@ -47,6 +211,43 @@ class SQLiteCache:
                 CREATE INDEX IF NOT EXISTS idx_{self.table_name}_updated 
                 ON {self.table_name}(updated_at)
             """)
+            
+            # 过期清理按 updated_at + ttl 表达式索引，LRU淘汰按最近访问时间
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_expire
+                ON {self.table_name}(updated_at + ttl)
+            """)
+            
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_last_accessed
+                ON {self.table_name}(last_accessed)
+            """)
+            
+            # 标签索引表：主键(tag, key)支持按标签查找，key索引支持级联删除
+            tags_table_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (f"{self.table_name}_tags",)
+            ).fetchone()
+            
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name}_tags (
+                    key TEXT NOT NULL REFERENCES {self.table_name}(key) ON DELETE CASCADE,
+                    tag TEXT NOT NULL,
+                    PRIMARY KEY (tag, key)
+                ) WITHOUT ROWID
+            """)
+            
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.table_name}_tags_key
+                ON {self.table_name}_tags(key)
+            """)
+            
+            # 首次创建时从JSON标签列回填
+            if not tags_table_exists:
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO {self.table_name}_tags (key, tag)
+                    SELECT c.key, j.value FROM {self.table_name} c, json_each(c.tags) j
+                """)
     
     def _generate_key(self, key: str) -> str:
         """生成缓存键"""
@@ -54,189 +255,711 @@ class SQLiteCache:
     
     def set(self, key: str, value: Any, ttl: int = 3600, tags: List[str] = None) -> bool:
         """设置缓存值"""
-        with self._lock:
-            try:
-                cache_key = self._generate_key(key)
-                value_str = json.dumps(value, ensure_ascii=False)
-                data_type = type(value).__name__
-                current_time = time.time()
-                tags_str = json.dumps(tags or [])
-                
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute(f"""
-                        INSERT OR REPLACE INTO {self.table_name} 
-                        (key, value, data_type, created_at, updated_at, access_count, ttl, tags)
-                        VALUES (?, ?, ?, ?, ?, COALESCE(
-                            (SELECT access_count + 1 FROM {self.table_name} WHERE key = ?), 1
-                        ), ?, ?)
-                    """, (cache_key, value_str, data_type, current_time, current_time, 
-                          cache_key, ttl, tags_str))
-                
-                return True
-            except Exception as e:
-                print(f"SQLite缓存设置错误: {e}")
-                return False
+        try:
+            with self._connect() as conn, conn:
+                self._upsert(conn, {key: value}, ttl, tags)
+            return True
+        except Exception as e:
+            print(f"SQLite缓存设置错误: {e}")
+            return False
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = 3600, tags: List[str] = None) -> int:
+        """批量设置缓存值，单个事务内用executemany写入，返回写入数量"""
+        if not items:
+            return 0
+        
+        try:
+            with self._connect() as conn, conn:
+                self._upsert(conn, items, ttl, tags)
+            return len(items)
+        except Exception as e:
+            print(f"SQLite批量设置错误: {e}")
+            return 0
+    
+    def _upsert(self, conn: sqlite3.Connection, items: Dict[str, Any], ttl: int,
+                tags: Optional[List[str]]) -> None:
+        """写入缓存行与标签，调用方负责事务"""
+        current_time = time.time()
+        tags_str = json.dumps(tags or [])
+        rows = []
+        for key, value in items.items():
+            cache_key = self._generate_key(key)
+            rows.append((cache_key, self.codec.encode(value), type(value).__name__,
+                         current_time, current_time, cache_key, ttl, tags_str, current_time))
+        
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO {self.table_name} 
+            (key, value, data_type, created_at, updated_at, access_count, ttl, tags,
+             last_accessed)
+            VALUES (?, ?, ?, ?, ?, COALESCE(
+                (SELECT access_count + 1 FROM {self.table_name} WHERE key = ?), 1
+            ), ?, ?, ?)
+        """, rows)
+        
+        # REPLACE会级联删除旧标签，这里写入新标签
+        self._write_tags(conn, [(row[0], tag) for row in rows for tag in set(tags or [])])
     
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
-        with self._lock:
-            try:
-                cache_key = self._generate_key(key)
+        try:
+            cache_key = self._generate_key(key)
+            
+            with self._connect() as conn:
+                result = conn.execute(f"""
+                    SELECT value, data_type, updated_at, ttl, access_count
+                    FROM {self.table_name}
+                    WHERE key = ?
+                """, (cache_key,)).fetchone()
                 
-                with sqlite3.connect(self.db_path) as conn:
-                    result = conn.execute(f"""
-                        SELECT value, data_type, updated_at, ttl, access_count
-                        FROM {self.table_name}
-                        WHERE key = ?
-                    """, (cache_key,)).fetchone()
-                    
-                    if not result:
-                        return None
-                    
-                    value_str, data_type, updated_at, ttl, access_count = result
-                    
-                    # 检查过期
-                    if time.time() - updated_at > ttl:
-                        self.delete(key)
-                        return None
-                    
-                    # 更新访问计数
-                    conn.execute(f"""
-                        UPDATE {self.table_name} 
-                        SET access_count = access_count + 1, updated_at = ?
-                        WHERE key = ?
-                    """, (time.time(), cache_key))
-                    
-                    return json.loads(value_str)
-                    
-            except Exception as e:
-                print(f"SQLite缓存获取错误: {e}")
+            if not result:
                 return None
+            
+            value_blob, data_type, updated_at, ttl, access_count = result
+            
+            # 检查过期（updated_at为写入时间，读取不会延长TTL）
+            if time.time() - updated_at > ttl:
+                self.delete(key)
+                return None
+            
+            # 访问计数延迟批量写回
+            self._record_access(cache_key)
+            
+            return self.codec.decode(value_blob)
+            
+        except Exception as e:
+            print(f"SQLite缓存获取错误: {e}")
+            return None
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，按IN分块查询，只返回未过期的命中项"""
+        key_map = {self._generate_key(key): key for key in keys}
+        if not key_map:
+            return {}
+        
+        try:
+            cache_keys = list(key_map)
+            rows = []
+            with self._connect() as conn:
+                for start in range(0, len(cache_keys), IN_CHUNK_SIZE):
+                    chunk = cache_keys[start:start + IN_CHUNK_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(conn.execute(f"""
+                        SELECT key, value, updated_at, ttl
+                        FROM {self.table_name}
+                        WHERE key IN ({placeholders})
+                    """, chunk).fetchall())
+            
+            now = time.time()
+            results = {}
+            expired = []
+            for cache_key, value_blob, updated_at, ttl in rows:
+                if now - updated_at > ttl:
+                    expired.append(cache_key)
+                    continue
+                self._record_access(cache_key)
+                results[key_map[cache_key]] = self.codec.decode(value_blob)
+            
+            if expired:
+                self._delete_keys(expired)
+            
+            return results
+        except Exception as e:
+            print(f"SQLite批量获取错误: {e}")
+            return {}
+    
+    def _write_tags(self, conn: sqlite3.Connection, pairs: List[tuple]) -> None:
+        """写入(key, tag)索引行"""
+        if pairs:
+            conn.executemany(f"""
+                INSERT OR IGNORE INTO {self.table_name}_tags (key, tag) VALUES (?, ?)
+            """, pairs)
+    
+    def _record_access(self, cache_key: str) -> None:
+        """在内存中累计一次命中，达到阈值时批量写回"""
+        now = time.time()
+        with self._access_lock:
+            entry = self._pending_access.get(cache_key)
+            if entry is None:
+                self._pending_access[cache_key] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+            self._pending_hits += 1
+            
+            due = self._pending_hits >= self.access_flush_every
+            if not due and not self._janitor_running():
+                due = time.monotonic() - self._last_access_flush >= self.access_flush_interval
+        
+        if due:
+            self.flush_access_stats()
+    
+    def _access_flush_due(self) -> bool:
+        """是否有超过access_flush_interval未写回的访问统计"""
+        with self._access_lock:
+            return bool(self._pending_hits and
+                        time.monotonic() - self._last_access_flush >= self.access_flush_interval)
+    
+    def flush_access_stats(self) -> int:
+        """将累计的访问计数和最后访问时间用executemany写回，返回更新的键数"""
+        with self._access_lock:
+            pending = self._pending_access
+            self._pending_access = {}
+            self._pending_hits = 0
+            self._last_access_flush = time.monotonic()
+        
+        if not pending:
+            return 0
+        
+        try:
+            with self._connect() as conn, conn:
+                conn.executemany(f"""
+                    UPDATE {self.table_name}
+                    SET access_count = access_count + ?,
+                        last_accessed = MAX(COALESCE(last_accessed, 0), ?)
+                    WHERE key = ?
+                """, [(count, last_accessed, cache_key)
+                      for cache_key, (count, last_accessed) in pending.items()])
+            return len(pending)
+        except Exception as e:
+            print(f"SQLite访问统计写回错误: {e}")
+            return 0
     
     def delete(self, key: str) -> bool:
         """删除缓存项"""
-        with self._lock:
-            try:
-                cache_key = self._generate_key(key)
-                with sqlite3.connect(self.db_path) as conn:
-                    result = conn.execute(f"""
-                        DELETE FROM {self.table_name} WHERE key = ?
-                    """, (cache_key,))
-                    return result.rowcount > 0
-            except Exception as e:
-                print(f"SQLite缓存删除错误: {e}")
-                return False
+        try:
+            cache_key = self._generate_key(key)
+            with self._connect() as conn, conn:
+                result = conn.execute(f"""
+                    DELETE FROM {self.table_name} WHERE key = ?
+                """, (cache_key,))
+                return result.rowcount > 0
+        except Exception as e:
+            print(f"SQLite缓存删除错误: {e}")
+            return False
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        try:
+            return self._delete_keys([self._generate_key(key) for key in keys])
+        except Exception as e:
+            print(f"SQLite批量删除错误: {e}")
+            return 0
+    
+    def _delete_keys(self, cache_keys: List[str]) -> int:
+        """按内部键分块删除"""
+        deleted = 0
+        with self._connect() as conn, conn:
+            for start in range(0, len(cache_keys), IN_CHUNK_SIZE):
+                chunk = cache_keys[start:start + IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                deleted += conn.execute(f"""
+                    DELETE FROM {self.table_name} WHERE key IN ({placeholders})
+                """, chunk).rowcount
+        return deleted
     
     def delete_by_tags(self, tags: List[str]) -> int:
         """按标签删除缓存"""
-        with self._lock:
-            try:
-                tags_str = json.dumps(tags)
-                with sqlite3.connect(self.db_path) as conn:
-                    result = conn.execute(f"""
-                        DELETE FROM {self.table_name}
-                        WHERE tags LIKE ? OR tags LIKE ? OR tags LIKE ?
-                    """, (f'%"{tags[0]}"%', f'%"{tags[-1]}"%', f'%"{tags[0]}"%'))
-                    return result.rowcount
-            except Exception as e:
-                print(f"SQLite标签删除错误: {e}")
-                return 0
+        if not tags:
+            return 0
+        
+        try:
+            placeholders = ",".join("?" * len(tags))
+            with self._connect() as conn, conn:
+                # 通过标签索引定位键，标签行随外键级联删除
+                result = conn.execute(f"""
+                    DELETE FROM {self.table_name}
+                    WHERE key IN (
+                        SELECT key FROM {self.table_name}_tags WHERE tag IN ({placeholders})
+                    )
+                """, list(tags))
+                return result.rowcount
+        except Exception as e:
+            print(f"SQLite标签删除错误: {e}")
+            return 0
     
     def clear_expired(self) -> int:
         """清理过期缓存"""
+        try:
+            with self._connect() as conn, conn:
+                result = conn.execute(f"""
+                    DELETE FROM {self.table_name}
+                    WHERE updated_at + ttl < ?
+                """, (time.time(),))
+                return result.rowcount
+        except Exception as e:
+            print(f"SQLite清理过期错误: {e}")
+            return 0
+    
+    def sweep_expired(self) -> int:
+        """分批删除过期行，每批一个短事务，避免长时间持有写锁"""
+        total = 0
+        try:
+            while True:
+                with self._connect() as conn, conn:
+                    deleted = conn.execute(f"""
+                        DELETE FROM {self.table_name}
+                        WHERE key IN (
+                            SELECT key FROM {self.table_name}
+                            WHERE updated_at + ttl < ?
+                            LIMIT ?
+                        )
+                    """, (time.time(), self.sweep_batch_size)).rowcount
+                total += deleted
+                if deleted < self.sweep_batch_size:
+                    break
+        except Exception as e:
+            print(f"SQLite过期清理错误: {e}")
+        
+        self._add_janitor_stat("expired_rows", total)
+        return total
+    
+    def enforce_limits(self) -> int:
+        """按最近访问时间淘汰超出max_rows/max_bytes的行，返回淘汰行数"""
+        if self.max_rows is None and self.max_bytes is None:
+            return 0
+        
+        # 先写回访问时间，保证LRU顺序准确
+        self.flush_access_stats()
+        evicted = 0
+        try:
+            if self.max_rows is not None:
+                with self._connect() as conn:
+                    excess = conn.execute(
+                        f"SELECT COUNT(*) FROM {self.table_name}"
+                    ).fetchone()[0] - self.max_rows
+                
+                while excess > 0:
+                    with self._connect() as conn, conn:
+                        deleted = conn.execute(f"""
+                            DELETE FROM {self.table_name}
+                            WHERE key IN (
+                                SELECT key FROM {self.table_name}
+                                ORDER BY last_accessed
+                                LIMIT ?
+                            )
+                        """, (min(excess, self.sweep_batch_size),)).rowcount
+                    if deleted == 0:
+                        break
+                    excess -= deleted
+                    evicted += deleted
+            
+            if self.max_bytes is not None:
+                with self._connect() as conn:
+                    total_bytes = conn.execute(
+                        f"SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {self.table_name}"
+                    ).fetchone()[0]
+                
+                while total_bytes > self.max_bytes:
+                    with self._connect() as conn, conn:
+                        candidates = conn.execute(f"""
+                            SELECT key, LENGTH(value) FROM {self.table_name}
+                            ORDER BY last_accessed
+                            LIMIT ?
+                        """, (self.sweep_batch_size,)).fetchall()
+                        if not candidates:
+                            break
+                        
+                        victims = []
+                        for cache_key, size in candidates:
+                            if total_bytes <= self.max_bytes:
+                                break
+                            victims.append((cache_key,))
+                            total_bytes -= size or 0
+                        
+                        conn.executemany(
+                            f"DELETE FROM {self.table_name} WHERE key = ?", victims
+                        )
+                    evicted += len(victims)
+        except Exception as e:
+            print(f"SQLite容量淘汰错误: {e}")
+        
+        self._add_janitor_stat("evicted_rows", evicted)
+        return evicted
+    
+    def incremental_vacuum(self, pages: Optional[int] = None) -> int:
+        """回收空闲页，返回回收的字节数"""
+        try:
+            with self._connect() as conn:
+                page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                # executescript会执行到完成，execute只会回收一页
+                conn.executescript(f"PRAGMA incremental_vacuum({pages or self.vacuum_pages})")
+                after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            
+            reclaimed = max(0, before - after) * page_size
+            self._add_janitor_stat("reclaimed_bytes", reclaimed)
+            return reclaimed
+        except Exception as e:
+            print(f"SQLite增量VACUUM错误: {e}")
+            return 0
+    
+    def _add_janitor_stat(self, name: str, amount: int) -> None:
+        # 清理线程写入、调用方读取，与其他共享状态一样在_lock下更新
         with self._lock:
+            self._janitor_stats[name] += amount
+    
+    def run_janitor(self) -> Dict[str, int]:
+        """执行一轮清理"""
+        result = {
+            "expired_rows": self.sweep_expired(),
+            "evicted_rows": self.enforce_limits(),
+            "reclaimed_bytes": 0
+        }
+        if time.monotonic() - self._last_vacuum >= self.vacuum_interval:
+            result["reclaimed_bytes"] = self.incremental_vacuum()
+            self._last_vacuum = time.monotonic()
+        self._add_janitor_stat("janitor_runs", 1)
+        return result
+    
+    def start_janitor(self, interval: float = 60) -> None:
+        """启动后台清理线程"""
+        if self._janitor_running():
+            return
+        self._janitor_stop.clear()
+        self._janitor_thread = threading.Thread(
+            target=self._janitor_loop, args=(interval,), name="sqlite-cache-janitor", daemon=True
+        )
+        self._janitor_thread.start()
+    
+    def _janitor_running(self) -> bool:
+        return self._janitor_thread is not None and self._janitor_thread.is_alive()
+    
+    def stop_janitor(self) -> None:
+        """停止后台清理线程"""
+        self._janitor_stop.set()
+        if self._janitor_thread:
+            self._janitor_thread.join()
+            self._janitor_thread = None
+    
+    def _janitor_loop(self, interval: float) -> None:
+        """后台清理循环: 每interval秒清理一轮，其间按access_flush_interval写回访问统计"""
+        tick = min(interval, self.access_flush_interval) if self.access_flush_interval > 0 else interval
+        next_run = time.monotonic() + interval
+        while not self._janitor_stop.wait(tick):
             try:
-                with sqlite3.connect(self.db_path) as conn:
-                    result = conn.execute(f"""
-                        DELETE FROM {self.table_name}
-                        WHERE updated_at + ttl < ?
-                    """, (time.time(),))
-                    return result.rowcount
+                if self._access_flush_due():
+                    self.flush_access_stats()
+                if time.monotonic() >= next_run:
+                    self.run_janitor()
+                    next_run = time.monotonic() + interval
             except Exception as e:
-                print(f"SQLite清理过期错误: {e}")
-                return 0
+                print(f"SQLite后台清理错误: {e}")
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计"""
+        self.flush_access_stats()
         with self._lock:
-            try:
-                with sqlite3.connect(self.db_path) as conn:
-                    stats = conn.execute(f"""
-                        SELECT 
-                            COUNT(*) as total_items,
-                            AVG(access_count) as avg_access,
-                            SUM(LENGTH(value)) as total_size,
-                            MIN(created_at) as oldest_item,
-                            MAX(updated_at) as newest_item
-                        FROM {self.table_name}
-                    """).fetchone()
-                    
-                    return {
-                        "total_items": stats[0] or 0,
-                        "avg_access_count": stats[1] or 0,
-                        "total_size_bytes": stats[2] or 0,
-                        "oldest_item": datetime.fromtimestamp(stats[3]).isoformat() if stats[3] else None,
-                        "newest_item": datetime.fromtimestamp(stats[4]).isoformat() if stats[4] else None
-                    }
-            except Exception as e:
-                print(f"SQLite统计错误: {e}")
-                return {}
+            janitor_stats = dict(self._janitor_stats)
+        try:
+            with self._connect() as conn:
+                stats = conn.execute(f"""
+                    SELECT 
+                        COUNT(*) as total_items,
+                        AVG(access_count) as avg_access,
+                        SUM(LENGTH(value)) as total_size,
+                        MIN(created_at) as oldest_item,
+                        MAX(updated_at) as newest_item
+                    FROM {self.table_name}
+                """).fetchone()
+                
+                return {
+                    "total_items": stats[0] or 0,
+                    "avg_access_count": stats[1] or 0,
+                    "total_size_bytes": stats[2] or 0,
+                    "oldest_item": datetime.fromtimestamp(stats[3]).isoformat() if stats[3] else None,
+                    "newest_item": datetime.fromtimestamp(stats[4]).isoformat() if stats[4] else None,
+                    "max_rows": self.max_rows,
+                    "max_bytes": self.max_bytes,
+                    **janitor_stats
+                }
+        except Exception as e:
+            print(f"SQLite统计错误: {e}")
+            return {}
+
+def text_fields(*fields: str) -> Callable[[str, Any], Optional[str]]:
+    """构造AdvancedSQLiteCache的search_text: 只索引字典值中的指定字段"""
+    def extract(cache_key: str, value: Any) -> Optional[str]:
+        if not isinstance(value, dict):
+            return None
+        return "\n".join(str(value[field]) for field in fields if value.get(field) is not None) or None
+    return extract
 
 class AdvancedSQLiteCache(SQLiteCache):
-    """高级SQLite缓存，支持批量操作和复杂查询"""
+    """高级SQLite缓存，支持批量操作和复杂查询
+    
+    全文搜索需显式传入search_text(缓存键, 值) -> 文本或None，缓存键为主表中的键哈希，
+    写入和重建索引时传入的参数相同。返回的文本以明文存入FTS5索引表，不受值压缩的保护，
+    应只选择可公开的字段，例如text_fields("prompt")；未配置时不建索引，
+    search_by_pattern退化为逐行解码扫描。trigram分词需要SQLite >= 3.34
+    """
+    
+    def __init__(self, *args, search_text: Optional[Callable[[str, Any], Optional[str]]] = None,
+                 **kwargs):
+        if search_text is not None and sqlite3.sqlite_version_info < (3, 34, 0):
+            raise ValueError(f"全文索引的trigram分词需要SQLite >= 3.34，当前为 {sqlite3.sqlite_version}")
+        # _init_db在父类构造中调用，需先设置
+        self.search_text = search_text
+        super().__init__(*args, **kwargs)
+    
+    def _init_db(self):
+        """初始化数据库表；配置了search_text时维护FTS5全文索引"""
+        super()._init_db()
+        fts_table = f"{self.table_name}_fts"
+        
+        with self._connect() as conn, conn:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({fts_table})")]
+            # 旧版索引表含原始键列并保存完整的值文本；未配置search_text或结构不符时删除
+            if columns and (self.search_text is None or columns != ["content"]):
+                conn.execute(f"DROP TRIGGER IF EXISTS {self.table_name}_fts_delete")
+                conn.execute(f"DROP TABLE {fts_table}")
+                columns = []
+            if self.search_text is None:
+                return
+            
+            # 值以编码后的二进制存储，索引文本在写入时显式同步，索引行的rowid即主表id
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table}
+                USING fts5(content, tokenize = 'trigram')
+            """)
+            
+            # 删除、覆盖、过期清理和淘汰都经由触发器同步删除索引行
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {self.table_name}_fts_delete
+                AFTER DELETE ON {self.table_name} BEGIN
+                    DELETE FROM {fts_table} WHERE rowid = old.id;
+                END
+            """)
+        
+        # 首次创建时为已有数据建立索引
+        if not columns:
+            self.rebuild_search_index()
+    
+    def _index_text(self, conn: sqlite3.Connection, items: Dict[str, Any]) -> None:
+        """为刚写入的行写入全文索引"""
+        if self.search_text is None:
+            return
+        rows = []
+        for key, value in items.items():
+            cache_key = self._generate_key(key)
+            text = self.search_text(cache_key, value)
+            if text:
+                rows.append((text, cache_key))
+        conn.executemany(f"""
+            INSERT INTO {self.table_name}_fts (rowid, content)
+            SELECT id, ? FROM {self.table_name} WHERE key = ?
+        """, rows)
+    
+    def _upsert(self, conn: sqlite3.Connection, items: Dict[str, Any], ttl: int,
+                tags: Optional[List[str]]) -> None:
+        """写入缓存行、标签与全文索引"""
+        super()._upsert(conn, items, ttl, tags)
+        self._index_text(conn, items)
     
     def batch_set(self, items: List[Dict[str, Any]]) -> int:
         """批量设置缓存"""
-        with self._lock:
-            try:
-                current_time = time.time()
-                with sqlite3.connect(self.db_path) as conn:
+        try:
+            current_time = time.time()
+            with self._connect() as conn, conn:
+                # rowcount只统计主表写入，不含触发器和级联删除
+                cursor = conn.executemany(f"""
+                    INSERT OR REPLACE INTO {self.table_name} 
+                    (key, value, data_type, created_at, updated_at, ttl, tags, last_accessed)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (self._generate_key(item["key"]), 
+                     self.codec.encode(item["value"]),
+                     type(item["value"]).__name__,
+                     current_time, current_time,
+                     item.get("ttl", 3600),
+                     json.dumps(item.get("tags", [])),
+                     current_time)
+                    for item in items
+                ])
+                written = cursor.rowcount
+                
+                self._index_text(conn, {item["key"]: item["value"] for item in items})
+                self._write_tags(conn, [
+                    (self._generate_key(item["key"]), tag)
+                    for item in items
+                    for tag in set(item.get("tags", []))
+                ])
+                return written
+        except Exception as e:
+            print(f"SQLite批量设置错误: {e}")
+            return 0
+    
+    def search_by_pattern(self, pattern: str, limit: int = 50, offset: int = 0,
+                          include_values: bool = False) -> List[Dict[str, Any]]:
+        """在search_text提取的索引文本中搜索，按bm25排序分页返回，值默认不反序列化"""
+        if self.search_text is None:
+            return self._scan_by_pattern(pattern, limit, offset, include_values)
+        try:
+            fts_table = f"{self.table_name}_fts"
+            value_column = ", m.value" if include_values else ""
+            
+            if len(pattern) >= 3:
+                # 整体作为短语查询，trigram分词下即为子串匹配
+                condition = f"{fts_table} MATCH ?"
+                params = ['"' + pattern.replace('"', '""') + '"']
+                score = f"bm25({fts_table})"
+                snippet = f"snippet({fts_table}, 0, '[', ']', '...', 16)"
+            else:
+                # trigram无法匹配不足3个字符的模式，退化为在索引文本上LIKE
+                condition = "f.content LIKE ?"
+                params = [f"%{pattern}%"]
+                score = "0"
+                snippet = "substr(f.content, 1, 64)"
+            
+            with self._connect() as conn:
+                rows = conn.execute(f"""
+                    SELECT m.key, m.data_type, m.created_at, m.updated_at,
+                           m.access_count, m.tags, {score} AS score, {snippet} AS snippet
+                           {value_column}
+                    FROM {fts_table} f
+                    JOIN {self.table_name} m ON m.id = f.rowid
+                    WHERE {condition} AND m.updated_at + m.ttl >= ?
+                    ORDER BY score, m.access_count DESC
+                    LIMIT ? OFFSET ?
+                """, params + [time.time(), limit, offset]).fetchall()
+            
+            items = []
+            for row in rows:
+                item = {
+                    "key": row[0],
+                    "data_type": row[1],
+                    "created_at": datetime.fromtimestamp(row[2]).isoformat(),
+                    "updated_at": datetime.fromtimestamp(row[3]).isoformat(),
+                    "access_count": row[4],
+                    "tags": json.loads(row[5]),
+                    # bm25越小越相关，取反后越大越相关
+                    "score": -row[6],
+                    "snippet": row[7]
+                }
+                if include_values:
+                    item["value"] = self.codec.decode(row[8])
+                items.append(item)
+            
+            return items
+        except Exception as e:
+            print(f"SQLite搜索错误: {e}")
+            return []
+    
+    def _scan_by_pattern(self, pattern: str, limit: int, offset: int,
+                         include_values: bool) -> List[Dict[str, Any]]:
+        """未配置全文索引时逐行解码，在键和值的JSON文本中不区分大小写地查找子串"""
+        try:
+            needle = pattern.lower()
+            matches = []
+            with self._connect() as conn:
+                cursor = conn.execute(f"""
+                    SELECT key, data_type, created_at, updated_at, access_count, tags, value
+                    FROM {self.table_name}
+                    WHERE updated_at + ttl >= ?
+                    ORDER BY access_count DESC, updated_at DESC
+                """, (time.time(),))
+                while len(matches) < offset + limit:
+                    rows = cursor.fetchmany(self.sweep_batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        value = self.codec.decode(row[6])
+                        text = json.dumps(value, ensure_ascii=False, default=str)
+                        position = text.lower().find(needle)
+                        if position < 0 and needle not in row[0]:
+                            continue
+                        start = max(position, 0)
+                        matches.append((row, value, text[max(0, start - 24):start + len(pattern) + 40]))
+            
+            items = []
+            for row, value, snippet in matches[offset:offset + limit]:
+                item = {
+                    "key": row[0],
+                    "data_type": row[1],
+                    "created_at": datetime.fromtimestamp(row[2]).isoformat(),
+                    "updated_at": datetime.fromtimestamp(row[3]).isoformat(),
+                    "access_count": row[4],
+                    "tags": json.loads(row[5]),
+                    "score": 0.0,
+                    "snippet": snippet
+                }
+                if include_values:
+                    item["value"] = value
+                items.append(item)
+            return items
+        except Exception as e:
+            print(f"SQLite搜索错误: {e}")
+            return []
+    
+    def rebuild_search_index(self) -> int:
+        """从主表重建全文索引，返回索引行数"""
+        if self.search_text is None:
+            return 0
+        try:
+            fts_table = f"{self.table_name}_fts"
+            indexed = 0
+            with self._connect() as conn, conn:
+                conn.execute(f"DELETE FROM {fts_table}")
+                cursor = conn.execute(f"SELECT id, key, value FROM {self.table_name}")
+                while True:
+                    rows = cursor.fetchmany(self.sweep_batch_size)
+                    if not rows:
+                        break
+                    texts = [(row_id, self.search_text(cache_key, self.codec.decode(value)))
+                             for row_id, cache_key, value in rows]
+                    texts = [(row_id, text) for row_id, text in texts if text]
                     conn.executemany(f"""
-                        INSERT OR REPLACE INTO {self.table_name} 
-                        (key, value, data_type, created_at, updated_at, ttl, tags)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, [
-                        (self._generate_key(item["key"]), 
-                         json.dumps(item["value"], ensure_ascii=False),
-                         type(item["value"]).__name__,
-                         current_time, current_time,
-                         item.get("ttl", 3600),
-                         json.dumps(item.get("tags", [])))
-                        for item in items
-                    ])
-                    return conn.total_changes
-            except Exception as e:
-                print(f"SQLite批量设置错误: {e}")
-                return 0
+                        INSERT INTO {fts_table} (rowid, content) VALUES (?, ?)
+                    """, texts)
+                    indexed += len(texts)
+            return indexed
+        except Exception as e:
+            print(f"SQLite全文索引重建错误: {e}")
+            return 0
+
+def benchmark_sqlite(thread_counts: tuple = (1, 8), ops_per_thread: int = 2000,
+                     key_space: int = 1000) -> List[Dict[str, Any]]:
+    """对比每次新建连接与持久连接+WAL的get/set吞吐"""
+    results = []
     
-    def search_by_pattern(self, pattern: str) -> List[Dict[str, Any]]:
-        """按模式搜索缓存"""
-        with self._lock:
-            try:
-                with sqlite3.connect(self.db_path) as conn:
-                    results = conn.execute(f"""
-                        SELECT key, value, data_type, created_at, updated_at, access_count, tags
-                        FROM {self.table_name}
-                        WHERE key LIKE ? OR value LIKE ?
-                        ORDER BY access_count DESC, updated_at DESC
-                    """, (f"%{pattern}%", f"%{pattern}%"))
+    for label, persistent in (("per-op connection", False), ("persistent+WAL", True)):
+        for threads in thread_counts:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cache = SQLiteCache(os.path.join(tmp_dir, "bench.db"), persistent=persistent)
+                for i in range(key_space):
+                    cache.set(f"key:{i}", {"answer": f"cached answer {i}", "tokens": i})
+                
+                row = {"mode": label, "threads": threads}
+                for op_name in ("get", "set"):
+                    failures = []
                     
-                    items = []
-                    for row in results.fetchall():
-                        items.append({
-                            "key": row[0],
-                            "value": json.loads(row[1]),
-                            "data_type": row[2],
-                            "created_at": datetime.fromtimestamp(row[3]).isoformat(),
-                            "updated_at": datetime.fromtimestamp(row[4]).isoformat(),
-                            "access_count": row[5],
-                            "tags": json.loads(row[6])
-                        })
+                    def worker(offset: int):
+                        for n in range(ops_per_thread):
+                            key = f"key:{(offset * 7919 + n) % key_space}"
+                            if op_name == "get":
+                                ok = cache.get(key) is not None
+                            else:
+                                ok = cache.set(key, {"answer": "refreshed", "tokens": n})
+                            if not ok:
+                                failures.append(key)
                     
-                    return items
-            except Exception as e:
-                print(f"SQLite搜索错误: {e}")
-                return []
+                    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+                    start = time.perf_counter()
+                    for t in workers:
+                        t.start()
+                    for t in workers:
+                        t.join()
+                    elapsed = time.perf_counter() - start
+                    
+                    row[f"{op_name}_ops_per_sec"] = round(threads * ops_per_thread / elapsed)
+                    row[f"{op_name}_failures"] = len(failures)
+                
+                cache.close()
+                results.append(row)
+                print(f"{label:<18} threads={threads:<2} "
+                      f"get={row['get_ops_per_sec']:>8,} ops/s  set={row['set_ops_per_sec']:>8,} ops/s  "
+                      f"failures={row['get_failures'] + row['set_failures']}")
+    
+    return results
 
 # 使用示例
 if __name__ == "__main__":
@@ -256,4 +979,8 @@ if __name__ == "__main__":
     
     # 清理过期缓存
     cleared = cache.clear_expired()
-    print(f"清理过期缓存: {cleared} 项")
\ No newline at end of file
+    print(f"清理过期缓存: {cleared} 项")
+    
+    # 吞吐基准测试: python 12_sqlite_cache.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_sqlite()
\ No newline at end of file
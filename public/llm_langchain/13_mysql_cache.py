@@ -6,20 +6,84 @@ MySQL缓存实现 - L3数据库缓存
 
 import mysql.connector
 from mysql.connector import pooling
+import asyncio
 import json
 import hashlib
 import threading
-from typing import Any, Optional, Dict, List
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Dict, List, AsyncIterator
 from datetime import datetime, timedelta
 import logging
 
+from cache_codec import ValueCodec
+from hash_ring import HashRing, MovedRange
+
+try:
+    import aiomysql
+    HAS_AIOMYSQL = True
+except ImportError:
+    HAS_AIOMYSQL = False
+
+# 批量操作中单条语句的最大行数
+BATCH_CHUNK_SIZE = 500
+
+# 缓存自身的配置项，不传给数据库驱动
+CACHE_CONFIG_KEYS = {"table_name", "pool_name", "pool_size", "min_pool_size", "name", "weight"}
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {table_name} (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    cache_key VARCHAR(255) UNIQUE KEY,
+    cache_value LONGBLOB,
+    data_type VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP,
+    access_count BIGINT DEFAULT 1,
+    tags JSON,
+    metadata JSON,
+    INDEX idx_key (cache_key),
+    INDEX idx_expires (expires_at),
+    INDEX idx_updated (updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+VALUE_COLUMN_TYPE_SQL = """
+SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'cache_value'
+"""
+
+def _driver_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉缓存自身的配置项，剩余部分作为驱动连接参数"""
+    return {name: value for name, value in config.items() if name not in CACHE_CONFIG_KEYS}
+
+def _upsert_sql(table_name: str, rows: int) -> str:
+    """多行 INSERT ... ON DUPLICATE KEY UPDATE 语句"""
+    values_sql = ",".join(["(%s, %s, %s, %s, %s, %s)"] * rows)
+    return f"""
+        INSERT INTO {table_name} 
+        (cache_key, cache_value, data_type, expires_at, tags, metadata)
+        VALUES {values_sql}
+        ON DUPLICATE KEY UPDATE
+        cache_value = VALUES(cache_value),
+        data_type = VALUES(data_type),
+        expires_at = VALUES(expires_at),
+        tags = VALUES(tags),
+        metadata = VALUES(metadata),
+        access_count = access_count + 1,
+        updated_at = CURRENT_TIMESTAMP
+    """
+
 class MySQLCache:
     """MySQL数据库缓存实现"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], codec: Optional[ValueCodec] = None):
         self.config = config
         self.pool = None
         self.table_name = config.get("table_name", "cache_data")
+        self.codec = codec or ValueCodec()
         self._lock = threading.RLock()
         self._init_pool()
         self._init_table()
@@ -28,9 +92,9 @@ class MySQLCache:
         """初始化连接池"""
         try:
             self.pool = mysql.connector.pooling.MySQLConnectionPool(
-                pool_name="mysql_cache_pool",
-                pool_size=10,
-                **self.config
+                pool_name=self.config.get("pool_name", "mysql_cache_pool"),
+                pool_size=self.config.get("pool_size", 10),
+                **_driver_config(self.config)
             )
         except Exception as e:
             logging.error(f"MySQL连接池初始化失败: {e}")
@@ -38,33 +102,26 @@ class MySQLCache:
     
     def _init_table(self):
         """初始化数据库表"""
-        create_sql = f"""
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
-            id BIGINT AUTO_INCREMENT PRIMARY KEY,
-            cache_key VARCHAR(255) UNIQUE KEY,
-            cache_value LONGTEXT,
-            data_type VARCHAR(50),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP,
-            access_count BIGINT DEFAULT 1,
-            tags JSON,
-            metadata JSON,
-            INDEX idx_key (cache_key),
-            INDEX idx_expires (expires_at),
-            INDEX idx_updated (updated_at)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """
+        create_sql = CREATE_TABLE_SQL.format(table_name=self.table_name)
         
         try:
             with self.pool.get_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(create_sql)
+                    self._migrate_value_column(cursor)
                     conn.commit()
         except Exception as e:
             logging.error(f"MySQL表初始化失败: {e}")
             raise
     
+    def _migrate_value_column(self, cursor) -> None:
+        """旧表的cache_value为LONGTEXT，迁移为LONGBLOB以存储编码后的二进制值"""
+        cursor.execute(VALUE_COLUMN_TYPE_SQL, (self.table_name,))
+        row = cursor.fetchone()
+        if row and row[0].lower() != "longblob":
+            # 原有JSON文本按字节保留，读取时由编解码器识别为旧格式
+            cursor.execute(f"ALTER TABLE {self.table_name} MODIFY cache_value LONGBLOB")
+    
     def _generate_key(self, key: str) -> str:
         """生成缓存键"""
         return hashlib.sha256(key.encode()).hexdigest()
@@ -75,7 +132,7 @@ class MySQLCache:
         with self._lock:
             try:
                 cache_key = self._generate_key(key)
-                value_str = json.dumps(value, ensure_ascii=False)
+                value_blob = self.codec.encode(value)
                 data_type = type(value).__name__
                 expires_at = datetime.now() + timedelta(seconds=ttl)
                 tags_json = json.dumps(tags or [])
@@ -95,7 +152,7 @@ class MySQLCache:
                             metadata = VALUES(metadata),
                             access_count = access_count + 1,
                             updated_at = CURRENT_TIMESTAMP
-                        """, (cache_key, value_str, data_type, expires_at, 
+                        """, (cache_key, value_blob, data_type, expires_at, 
                               tags_json, metadata_json))
                         conn.commit()
                 
@@ -131,12 +188,109 @@ class MySQLCache:
                         """, (cache_key,))
                         conn.commit()
                         
-                        return json.loads(result["cache_value"])
+                        return self.codec.decode(result["cache_value"])
                         
             except Exception as e:
                 logging.error(f"MySQL缓存获取错误: {e}")
                 return None
     
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，一次IN查询，只返回命中的键"""
+        key_map = {self._generate_key(key): key for key in keys}
+        if not key_map:
+            return {}
+        
+        with self._lock:
+            try:
+                cache_keys = list(key_map)
+                results = {}
+                
+                with self.pool.get_connection() as conn:
+                    with conn.cursor(dictionary=True) as cursor:
+                        for start in range(0, len(cache_keys), BATCH_CHUNK_SIZE):
+                            chunk = cache_keys[start:start + BATCH_CHUNK_SIZE]
+                            placeholders = ",".join(["%s"] * len(chunk))
+                            cursor.execute(f"""
+                                SELECT cache_key, cache_value
+                                FROM {self.table_name}
+                                WHERE cache_key IN ({placeholders}) AND expires_at > NOW()
+                            """, chunk)
+                            hits = cursor.fetchall()
+                            
+                            if not hits:
+                                continue
+                            
+                            for row in hits:
+                                results[key_map[row["cache_key"]]] = self.codec.decode(row["cache_value"])
+                            
+                            # 更新访问计数
+                            hit_placeholders = ",".join(["%s"] * len(hits))
+                            cursor.execute(f"""
+                                UPDATE {self.table_name}
+                                SET access_count = access_count + 1
+                                WHERE cache_key IN ({hit_placeholders})
+                            """, [row["cache_key"] for row in hits])
+                        conn.commit()
+                
+                return results
+            except Exception as e:
+                logging.error(f"MySQL批量获取错误: {e}")
+                return {}
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = 3600,
+                 tags: List[str] = None, metadata: Dict = None) -> int:
+        """批量设置缓存值，使用多行INSERT ... ON DUPLICATE KEY UPDATE"""
+        if not items:
+            return 0
+        
+        with self._lock:
+            try:
+                expires_at = datetime.now() + timedelta(seconds=ttl)
+                tags_json = json.dumps(tags or [])
+                metadata_json = json.dumps(metadata or {})
+                rows = [
+                    (self._generate_key(key), self.codec.encode(value), type(value).__name__,
+                     expires_at, tags_json, metadata_json)
+                    for key, value in items.items()
+                ]
+                
+                with self.pool.get_connection() as conn:
+                    with conn.cursor() as cursor:
+                        for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+                            chunk = rows[start:start + BATCH_CHUNK_SIZE]
+                            cursor.execute(_upsert_sql(self.table_name, len(chunk)),
+                                           [param for row in chunk for param in row])
+                        conn.commit()
+                
+                return len(rows)
+            except Exception as e:
+                logging.error(f"MySQL批量设置错误: {e}")
+                return 0
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        cache_keys = [self._generate_key(key) for key in keys]
+        if not cache_keys:
+            return 0
+        
+        with self._lock:
+            try:
+                deleted = 0
+                with self.pool.get_connection() as conn:
+                    with conn.cursor() as cursor:
+                        for start in range(0, len(cache_keys), BATCH_CHUNK_SIZE):
+                            chunk = cache_keys[start:start + BATCH_CHUNK_SIZE]
+                            placeholders = ",".join(["%s"] * len(chunk))
+                            cursor.execute(f"""
+                                DELETE FROM {self.table_name} WHERE cache_key IN ({placeholders})
+                            """, chunk)
+                            deleted += cursor.rowcount
+                        conn.commit()
+                return deleted
+            except Exception as e:
+                logging.error(f"MySQL批量删除错误: {e}")
+                return 0
+    
     def delete(self, key: str) -> bool:
         """删除缓存项"""
         with self._lock:
@@ -233,28 +387,355 @@ class MySQLCache:
                 logging.error(f"MySQL统计错误: {e}")
                 return {}
 
+class AsyncMySQLCache:
+    """基于aiomysql的异步MySQL缓存，接口与MySQLCache对应（均为协程）"""
+    
+    def __init__(self, config: Dict[str, Any], codec: Optional[ValueCodec] = None,
+                 wait_sample_size: int = 1024):
+        if not HAS_AIOMYSQL:
+            raise ImportError("AsyncMySQLCache需要安装aiomysql: pip install aiomysql")
+        
+        self.config = config
+        self.pool = None
+        self.table_name = config.get("table_name", "cache_data")
+        self.codec = codec or ValueCodec()
+        self.pool_size = config.get("pool_size", 10)
+        self.min_pool_size = config.get("min_pool_size", 1)
+        # aiomysql没有服务端预编译(COM_STMT_PREPARE)，参数在客户端转义后拼入SQL文本发送；
+        # 这里只把各(类型, 行数)的SQL文本构建一次后复用，省去重复的字符串拼接
+        self._sql_texts: Dict[tuple, str] = {}
+        # 连接池等待时间（毫秒），保留最近的样本用于计算分位数
+        self._wait_times = deque(maxlen=wait_sample_size)
+        self._pool_stats = {"acquires": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+    
+    async def initialize(self) -> "AsyncMySQLCache":
+        """创建连接池并初始化数据库表"""
+        try:
+            driver_config = _driver_config(self.config)
+            # mysql.connector使用database，aiomysql使用db
+            if "database" in driver_config:
+                driver_config["db"] = driver_config.pop("database")
+            
+            self.pool = await aiomysql.create_pool(
+                minsize=self.min_pool_size,
+                maxsize=self.pool_size,
+                autocommit=True,
+                charset="utf8mb4",
+                **driver_config
+            )
+            
+            async with self._acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(CREATE_TABLE_SQL.format(table_name=self.table_name))
+                    await cursor.execute(VALUE_COLUMN_TYPE_SQL, (self.table_name,))
+                    row = await cursor.fetchone()
+                    if row and row[0].lower() != "longblob":
+                        await cursor.execute(
+                            f"ALTER TABLE {self.table_name} MODIFY cache_value LONGBLOB"
+                        )
+            return self
+        except Exception as e:
+            logging.error(f"异步MySQL缓存初始化失败: {e}")
+            raise
+    
+    async def close(self) -> None:
+        """关闭连接池"""
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+    
+    async def __aenter__(self) -> "AsyncMySQLCache":
+        return await self.initialize()
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[Any]:
+        """从连接池获取连接，并记录等待时间"""
+        start = time.perf_counter()
+        conn = await self.pool.acquire()
+        wait_ms = (time.perf_counter() - start) * 1000
+        self._wait_times.append(wait_ms)
+        self._pool_stats["acquires"] += 1
+        self._pool_stats["total_wait_ms"] += wait_ms
+        self._pool_stats["max_wait_ms"] = max(self._pool_stats["max_wait_ms"], wait_ms)
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+    
+    def _sql(self, kind: str, rows: int = 1) -> str:
+        """获取(类型, 行数)对应的SQL文本"""
+        statement = self._sql_texts.get((kind, rows))
+        if statement is None:
+            placeholders = ",".join(["%s"] * rows)
+            if kind == "upsert":
+                statement = _upsert_sql(self.table_name, rows)
+            elif kind == "get":
+                statement = f"""
+                    SELECT cache_key, cache_value FROM {self.table_name}
+                    WHERE cache_key IN ({placeholders}) AND expires_at > NOW()
+                """
+            elif kind == "touch":
+                statement = f"""
+                    UPDATE {self.table_name} SET access_count = access_count + 1
+                    WHERE cache_key IN ({placeholders})
+                """
+            elif kind == "delete":
+                statement = f"DELETE FROM {self.table_name} WHERE cache_key IN ({placeholders})"
+            else:
+                raise ValueError(f"未知的语句类型: {kind}")
+            self._sql_texts[(kind, rows)] = statement
+        return statement
+    
+    def _generate_key(self, key: str) -> str:
+        """生成缓存键"""
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        results = await self.get_many([key])
+        return results.get(key)
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，只返回命中的键"""
+        key_map = {self._generate_key(key): key for key in keys}
+        if not key_map:
+            return {}
+        
+        try:
+            cache_keys = list(key_map)
+            results = {}
+            
+            async with self._acquire() as conn:
+                async with conn.cursor() as cursor:
+                    for start in range(0, len(cache_keys), BATCH_CHUNK_SIZE):
+                        chunk = cache_keys[start:start + BATCH_CHUNK_SIZE]
+                        await cursor.execute(self._sql("get", len(chunk)), chunk)
+                        hits = await cursor.fetchall()
+                        
+                        if not hits:
+                            continue
+                        
+                        for cache_key, cache_value in hits:
+                            results[key_map[cache_key]] = self.codec.decode(cache_value)
+                        
+                        # 更新访问计数
+                        await cursor.execute(self._sql("touch", len(hits)),
+                                             [row[0] for row in hits])
+            
+            return results
+        except Exception as e:
+            logging.error(f"异步MySQL缓存获取错误: {e}")
+            return {}
+    
+    async def set(self, key: str, value: Any, ttl: int = 3600,
+                  tags: List[str] = None, metadata: Dict = None) -> bool:
+        """设置缓存值"""
+        return await self.set_many({key: value}, ttl=ttl, tags=tags, metadata=metadata) > 0
+    
+    async def set_many(self, items: Dict[str, Any], ttl: int = 3600,
+                       tags: List[str] = None, metadata: Dict = None) -> int:
+        """批量设置缓存值，使用多行INSERT ... ON DUPLICATE KEY UPDATE"""
+        if not items:
+            return 0
+        
+        try:
+            expires_at = datetime.now() + timedelta(seconds=ttl)
+            tags_json = json.dumps(tags or [])
+            metadata_json = json.dumps(metadata or {})
+            rows = [
+                (self._generate_key(key), self.codec.encode(value), type(value).__name__,
+                 expires_at, tags_json, metadata_json)
+                for key, value in items.items()
+            ]
+            
+            async with self._acquire() as conn:
+                async with conn.cursor() as cursor:
+                    for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+                        chunk = rows[start:start + BATCH_CHUNK_SIZE]
+                        await cursor.execute(self._sql("upsert", len(chunk)),
+                                             [param for row in chunk for param in row])
+            
+            return len(rows)
+        except Exception as e:
+            logging.error(f"异步MySQL缓存设置错误: {e}")
+            return 0
+    
+    async def delete(self, key: str) -> bool:
+        """删除缓存项"""
+        return await self.delete_many([key]) > 0
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        cache_keys = [self._generate_key(key) for key in keys]
+        if not cache_keys:
+            return 0
+        
+        try:
+            deleted = 0
+            async with self._acquire() as conn:
+                async with conn.cursor() as cursor:
+                    for start in range(0, len(cache_keys), BATCH_CHUNK_SIZE):
+                        chunk = cache_keys[start:start + BATCH_CHUNK_SIZE]
+                        deleted += await cursor.execute(self._sql("delete", len(chunk)), chunk)
+            return deleted
+        except Exception as e:
+            logging.error(f"异步MySQL缓存删除错误: {e}")
+            return 0
+    
+    async def clear_expired(self) -> int:
+        """清理过期缓存"""
+        try:
+            async with self._acquire() as conn:
+                async with conn.cursor() as cursor:
+                    return await cursor.execute(
+                        f"DELETE FROM {self.table_name} WHERE expires_at <= NOW()"
+                    )
+        except Exception as e:
+            logging.error(f"异步MySQL清理过期错误: {e}")
+            return 0
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池使用与等待时间统计"""
+        waits = sorted(self._wait_times)
+        acquires = self._pool_stats["acquires"]
+        
+        def percentile(p: float) -> float:
+            return waits[min(len(waits) - 1, int(len(waits) * p))] if waits else 0.0
+        
+        return {
+            "pool_size": self.pool_size,
+            "pool_open": self.pool.size if self.pool else 0,
+            "pool_free": self.pool.freesize if self.pool else 0,
+            "acquires": acquires,
+            "avg_wait_ms": self._pool_stats["total_wait_ms"] / acquires if acquires else 0.0,
+            "p50_wait_ms": percentile(0.5),
+            "p99_wait_ms": percentile(0.99),
+            "max_wait_ms": self._pool_stats["max_wait_ms"],
+            "cached_sql_texts": len(self._sql_texts)
+        }
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        try:
+            async with self._acquire() as conn:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(f"""
+                        SELECT 
+                            COUNT(*) as total_items,
+                            SUM(LENGTH(cache_value)) as total_size,
+                            SUM(CASE WHEN expires_at <= NOW() THEN 1 ELSE 0 END) as expired_items
+                        FROM {self.table_name}
+                    """)
+                    stats = await cursor.fetchone()
+            
+            return {
+                "total_items": stats["total_items"] or 0,
+                "total_size_bytes": int(stats["total_size"] or 0),
+                "expired_items": int(stats["expired_items"] or 0),
+                "pool": self.get_pool_stats()
+            }
+        except Exception as e:
+            logging.error(f"异步MySQL统计错误: {e}")
+            return {"pool": self.get_pool_stats()}
+
 class MySQLCacheCluster:
-    """MySQL缓存集群"""
+    """MySQL缓存集群，按一致性哈希环路由，可选多副本"""
     
-    def __init__(self, cluster_config: List[Dict[str, Any]]):
-        self.nodes = [MySQLCache(config) for config in cluster_config]
-        self._current_node = 0
+    def __init__(self, cluster_config: List[Dict[str, Any]], vnodes: int = 160,
+                 replicas: int = 1):
+        self.ring = HashRing(vnodes=vnodes, replicas=replicas)
+        self.nodes: Dict[str, MySQLCache] = {}
+        for config in cluster_config:
+            self.add_node(config)
+    
+    @staticmethod
+    def _node_name(config: Dict[str, Any]) -> str:
+        """节点名称，未配置name时由连接地址生成"""
+        return config.get("name") or f"{config.get('host', 'localhost')}:{config.get('port', 3306)}/{config.get('database', '')}"
+    
+    def add_node(self, config: Dict[str, Any]) -> List[MovedRange]:
+        """加入节点，返回改由新节点负责的哈希区间（这些键在新节点上首次访问会未命中）"""
+        name = self._node_name(config)
+        if name in self.nodes:
+            raise ValueError(f"节点已存在: {name}")
+        self.nodes[name] = MySQLCache(config)
+        return self.ring.add_node(name, config.get("weight", 1))
+    
+    def remove_node(self, name: str) -> List[MovedRange]:
+        """移除节点，返回由其他节点接管的哈希区间"""
+        moved = self.ring.remove_node(name)
+        self.nodes.pop(name)
+        return moved
     
     def _get_node(self, key: str) -> MySQLCache:
-        """根据key选择节点 (一致性哈希)"""
-        import hashlib
-        hash_value = int(hashlib.md5(key.encode()).hexdigest(), 16)
-        return self.nodes[hash_value % len(self.nodes)]
+        """根据key在哈希环上选择主节点"""
+        return self.nodes[self.ring.get_node(key)]
+    
+    def _get_replicas(self, key: str) -> List[MySQLCache]:
+        """键的所有副本节点，主节点在前"""
+        return [self.nodes[name] for name in self.ring.get_nodes(key)]
     
     def set(self, key: str, value: Any, **kwargs) -> bool:
-        """设置缓存值"""
-        node = self._get_node(key)
-        return node.set(key, value, **kwargs)
+        """设置缓存值，写入所有副本"""
+        results = [node.set(key, value, **kwargs) for node in self._get_replicas(key)]
+        return bool(results) and all(results)
     
     def get(self, key: str) -> Optional[Any]:
-        """获取缓存值"""
-        node = self._get_node(key)
-        return node.get(key)
+        """获取缓存值，主节点未命中或不可用时依次读取后续副本"""
+        for node in self._get_replicas(key):
+            value = node.get(key)
+            if value is not None:
+                return value
+        return None
+    
+    def delete(self, key: str) -> bool:
+        """删除所有副本上的缓存项"""
+        return any([node.delete(key) for node in self._get_replicas(key)])
+    
+    def _group_by_node(self, keys: List[str], replica: int = 0) -> List[tuple]:
+        """按第replica个副本所在节点分组键，返回 [(节点, 键列表)]"""
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            names = self.ring.get_nodes(key)
+            if replica < len(names):
+                groups.setdefault(names[replica], []).append(key)
+        return [(self.nodes[name], node_keys) for name, node_keys in groups.items()]
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取，每个节点一次查询，未命中的键再查询后续副本"""
+        results = {}
+        remaining = list(keys)
+        for replica in range(self.ring.replicas):
+            for node, node_keys in self._group_by_node(remaining, replica):
+                results.update(node.get_many(node_keys))
+            remaining = [key for key in remaining if key not in results]
+            if not remaining:
+                break
+        return results
+    
+    def set_many(self, items: Dict[str, Any], **kwargs) -> int:
+        """批量设置，每个副本、每个节点一次多行写入，返回主副本写入数量"""
+        written = 0
+        for replica in range(self.ring.replicas):
+            for node, node_keys in self._group_by_node(list(items), replica):
+                count = node.set_many({key: items[key] for key in node_keys}, **kwargs)
+                if replica == 0:
+                    written += count
+        return written
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除所有副本，返回主副本删除数量"""
+        deleted = 0
+        for replica in range(self.ring.replicas):
+            for node, node_keys in self._group_by_node(keys, replica):
+                count = node.delete_many(node_keys)
+                if replica == 0:
+                    deleted += count
+        return deleted
 
 # 使用示例
 if __name__ == "__main__":
@@ -282,4 +763,17 @@ if __name__ == "__main__":
     
     # 获取统计
     stats = cache.get_stats()
-    print(f"MySQL缓存统计: {json.dumps(stats, indent=2, ensure_ascii=False)}")
\ No newline at end of file
+    print(f"MySQL缓存统计: {json.dumps(stats, indent=2, ensure_ascii=False)}")
+    
+    # 异步版本（需要aiomysql），适用于asyncio服务
+    if HAS_AIOMYSQL:
+        async def async_demo():
+            async with AsyncMySQLCache({**mysql_config, "pool_size": 20}) as async_cache:
+                await async_cache.set_many(
+                    {f"product:{i}": {"id": i} for i in range(100)}, ttl=600
+                )
+                products = await async_cache.get_many([f"product:{i}" for i in range(100)])
+                print(f"异步批量获取: {len(products)} 条")
+                print(f"连接池统计: {async_cache.get_pool_stats()}")
+        
+        asyncio.run(async_demo())
\ No newline at end of file
@@ -7,56 +7,120 @@ Redis缓存实现 - L4分布式缓存
 import redis
 import json
 import hashlib
+import random
+import sys
 import threading
+import time
 from typing import Any, Optional, Dict, List, Union
 from datetime import datetime, timedelta
 import logging
+from collections import OrderedDict, deque
 from redis.cluster import RedisCluster
 from redis.sentinel import Sentinel
 
+from cache_codec import ValueCodec
+from hash_ring import HashRing, MovedRange
+
+# 写值并加入标签集合；标签集合TTL不低于成员TTL，避免集合先于成员过期
+# KEYS[1]=缓存键 KEYS[2..]=标签集合 ARGV[1]=ttl ARGV[2]=序列化后的值
+SET_WITH_TAGS_LUA = """
+local ttl = tonumber(ARGV[1])
+redis.call('SETEX', KEYS[1], ttl, ARGV[2])
+for i = 2, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if redis.call('TTL', KEYS[i]) < ttl then
+        redis.call('EXPIRE', KEYS[i], ttl)
+    end
+end
+return 1
+"""
+
+# 合并标签集合，分批删除成员后删除标签集合本身，返回删除的缓存项数量
+# KEYS=标签集合 ARGV[1]=每批DEL的键数
+DELETE_BY_TAGS_LUA = """
+local members = redis.call('SUNION', unpack(KEYS))
+local batch = tonumber(ARGV[1])
+local deleted = 0
+for i = 1, #members, batch do
+    deleted = deleted + redis.call('DEL', unpack(members, i, math.min(i + batch - 1, #members)))
+end
+redis.call('DEL', unpack(KEYS))
+return deleted
+"""
+
 class RedisCache:
-    """Redis缓存实现"""
+    """Redis缓存实现
     
-    def __init__(self, config: Dict[str, Any]):
+    集群模式(type="cluster")下带标签的写入不走Lua脚本，标签集合TTL用EXPIRE NX/GT维护，需要Redis 7.0+
+    """
+    
+    def __init__(self, config: Dict[str, Any], codec: Optional[ValueCodec] = None):
         self.config = config
         self.connection_type = config.get("type", "single")
+        # 值编码为二进制，客户端不做响应解码
+        self.codec = codec or ValueCodec()
         self.client = None
-        self._lock = threading.RLock()
+        # redis-py客户端与连接池本身线程安全，不再用全局锁串行化网络I/O
         self._init_client()
+        # 集群模式下多键脚本会跨slot，改用pipeline回退
+        self._use_scripts = self.connection_type != "cluster"
+        if self._use_scripts:
+            self._set_script = self.client.register_script(SET_WITH_TAGS_LUA)
+            self._delete_by_tags_script = self.client.register_script(DELETE_BY_TAGS_LUA)
     
     def _init_client(self):
         """初始化Redis客户端"""
         try:
+            max_connections = self.config.get("max_connections", 50)
+            
             if self.connection_type == "cluster":
+                # max_connections为每个节点的连接上限
                 self.client = RedisCluster(
                     startup_nodes=self.config["nodes"],
-                    decode_responses=True,
+                    decode_responses=False,
+                    max_connections=max_connections,
+                    **self._connection_options(),
                     **self.config.get("cluster_options", {})
                 )
             elif self.connection_type == "sentinel":
                 sentinel = Sentinel(
                     self.config["sentinels"],
                     socket_timeout=0.1,
-                    decode_responses=True
+                    decode_responses=False
                 )
                 self.client = sentinel.master_for(
                     self.config["service_name"],
-                    socket_timeout=0.1,
-                    decode_responses=True
+                    decode_responses=False,
+                    max_connections=max_connections,
+                    **self._connection_options()
                 )
             else:  # single
-                self.client = redis.Redis(
+                # 连接耗尽时阻塞等待至多pool_timeout秒，而不是无限新建连接
+                pool = redis.BlockingConnectionPool(
                     host=self.config.get("host", "localhost"),
                     port=self.config.get("port", 6379),
                     db=self.config.get("db", 0),
                     password=self.config.get("password"),
-                    decode_responses=True,
+                    decode_responses=False,
+                    max_connections=max_connections,
+                    timeout=self.config.get("pool_timeout", 5),
+                    **self._connection_options(),
                     **self.config.get("options", {})
                 )
+                self.client = redis.Redis(connection_pool=pool)
         except Exception as e:
             logging.error(f"Redis客户端初始化失败: {e}")
             raise
     
+    def _connection_options(self) -> Dict[str, Any]:
+        """连接超时、保活与健康检查配置"""
+        return {
+            "socket_timeout": self.config.get("socket_timeout", 5.0),
+            "socket_connect_timeout": self.config.get("socket_connect_timeout", 2.0),
+            "socket_keepalive": self.config.get("socket_keepalive", True),
+            "health_check_interval": self.config.get("health_check_interval", 30)
+        }
+    
     def _generate_key(self, key: str) -> str:
         """生成缓存键"""
         prefix = self.config.get("key_prefix", "cache")
@@ -64,86 +128,180 @@ class RedisCache:
     
     def set(self, key: str, value: Any, ttl: int = 3600, 
             tags: List[str] = None, metadata: Dict = None) -> bool:
-        """设置缓存值"""
-        with self._lock:
-            try:
-                cache_key = self._generate_key(key)
-                
-                # 构建缓存数据结构
-                cache_data = {
-                    "value": value,
-                    "data_type": type(value).__name__,
-                    "created_at": datetime.now().isoformat(),
-                    "tags": tags or [],
-                    "metadata": metadata or {}
-                }
-                
-                # 序列化数据
-                value_str = json.dumps(cache_data, ensure_ascii=False)
-                
-                # 设置缓存
-                result = self.client.setex(cache_key, ttl, value_str)
-                
-                # 设置标签索引
-                if tags:
-                    for tag in tags:
-                        tag_key = f"{self.config.get('key_prefix', 'cache')}:tag:{tag}"
-                        self.client.sadd(tag_key, cache_key)
-                        self.client.expire(tag_key, ttl)
-                
-                return bool(result)
-            except Exception as e:
-                logging.error(f"Redis缓存设置错误: {e}")
-                return False
+        """设置缓存值，值与标签索引一次往返写入"""
+        try:
+            cache_key = self._generate_key(key)
+            
+            # 构建缓存数据结构
+            cache_data = {
+                "value": value,
+                "data_type": type(value).__name__,
+                "created_at": datetime.now().isoformat(),
+                "tags": tags or [],
+                "metadata": metadata or {}
+            }
+            
+            payload = self.codec.encode(cache_data)
+            if self._use_scripts:
+                # 单次写入直接EVALSHA，缺少脚本时自动回退EVAL；pipeline会先多一次SCRIPT EXISTS往返
+                self._on_write([cache_key])
+                return bool(self._set_script(keys=[cache_key] + self._tag_keys(tags),
+                                             args=[ttl, payload]))
+            
+            pipe = self.client.pipeline(transaction=False)
+            self._queue_set(pipe, cache_key, payload, ttl, tags)
+            results = pipe.execute()
+            
+            return bool(results[0])
+        except Exception as e:
+            logging.error(f"Redis缓存设置错误: {e}")
+            return False
+
+    def _tag_key(self, tag: str) -> str:
+        """标签索引集合的键"""
+        return f"{self.config.get('key_prefix', 'cache')}:tag:{tag}"
+    
+    def _tag_keys(self, tags: Optional[List[str]]) -> List[str]:
+        return [self._tag_key(tag) for tag in dict.fromkeys(tags or [])]
+    
+    def _queue_set(self, pipe, cache_key: str, payload: bytes, ttl: int,
+                   tags: Optional[List[str]]) -> None:
+        """向pipeline追加写值与标签索引的命令，标签集合TTL只延长不缩短"""
+        tag_keys = self._tag_keys(tags)
+        self._on_write([cache_key])
+        
+        if self._use_scripts:
+            self._set_script(keys=[cache_key] + tag_keys, args=[ttl, payload], client=pipe)
+            return
+        
+        # 集群模式下各键分布在不同slot，无法在一个脚本内操作
+        # NX为新集合设置TTL，GT只在更长时延长（需要Redis 7.0+）
+        pipe.setex(cache_key, ttl, payload)
+        for tag_key in tag_keys:
+            pipe.sadd(tag_key, cache_key)
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
     
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
-        with self._lock:
-            try:
-                cache_key = self._generate_key(key)
-                value_str = self.client.get(cache_key)
-                
-                if not value_str:
-                    return None
-                
-                cache_data = json.loads(value_str)
-                return cache_data["value"]
-                
-            except Exception as e:
-                logging.error(f"Redis缓存获取错误: {e}")
+        try:
+            cache_key = self._generate_key(key)
+            value_blob = self._fetch_many([cache_key])[0]
+            
+            if not value_blob:
                 return None
+            
+            cache_data = self.codec.decode(value_blob)
+            return cache_data["value"]
+            
+        except Exception as e:
+            logging.error(f"Redis缓存获取错误: {e}")
+            return None
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，一次MGET往返，只返回命中的键"""
+        if not keys:
+            return {}
+        
+        try:
+            values = self._fetch_many([self._generate_key(key) for key in keys])
+            
+            return {
+                key: self.codec.decode(value_blob)["value"]
+                for key, value_blob in zip(keys, values)
+                if value_blob
+            }
+        except Exception as e:
+            logging.error(f"Redis批量获取错误: {e}")
+            return {}
+
+    def _fetch_many(self, cache_keys: List[str]) -> List[Optional[bytes]]:
+        """按内部键读取编码后的值"""
+        # 集群模式下键分布在不同slot，按slot拆分的MGET
+        if self.connection_type == "cluster":
+            return self.client.mget_nonatomic(cache_keys)
+        return self.client.mget(cache_keys)
     
+    def _on_write(self, cache_keys: List[str]) -> None:
+        """本进程写入或删除键之前的回调，供子类维护本地状态"""
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = 3600,
+                 tags: List[str] = None, metadata: Dict = None) -> int:
+        """批量设置缓存值，值与标签索引通过一个pipeline发送"""
+        if not items:
+            return 0
+        
+        try:
+            created_at = datetime.now().isoformat()
+            pipe = self.client.pipeline(transaction=False)
+            
+            for key, value in items.items():
+                self._queue_set(pipe, self._generate_key(key), self.codec.encode({
+                    "value": value,
+                    "data_type": type(value).__name__,
+                    "created_at": created_at,
+                    "tags": tags or [],
+                    "metadata": metadata or {}
+                }), ttl, tags)
+            
+            results = pipe.execute()
+            # 脚本模式每项一条结果；回退模式每项 1 + 3 * 标签数 条，首条为SETEX结果
+            step = len(results) // len(items)
+            return sum(1 for result in results[::step] if result)
+        except Exception as e:
+            logging.error(f"Redis批量设置错误: {e}")
+            return 0
+
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        if not keys:
+            return 0
+        
+        try:
+            cache_keys = [self._generate_key(key) for key in keys]
+            self._on_write(cache_keys)
+            return self.client.delete(*cache_keys)
+        except Exception as e:
+            logging.error(f"Redis批量删除错误: {e}")
+            return 0
+
     def delete(self, key: str) -> bool:
         """删除缓存项"""
-        with self._lock:
-            try:
-                cache_key = self._generate_key(key)
-                result = self.client.delete(cache_key)
-                return result > 0
-            except Exception as e:
-                logging.error(f"Redis缓存删除错误: {e}")
-                return False
-    
+        try:
+            cache_key = self._generate_key(key)
+            self._on_write([cache_key])
+            result = self.client.delete(cache_key)
+            return result > 0
+        except Exception as e:
+            logging.error(f"Redis缓存删除错误: {e}")
+            return False
+
     def delete_by_tags(self, tags: List[str]) -> int:
-        """按标签删除缓存"""
-        with self._lock:
-            try:
-                deleted_count = 0
-                prefix = self.config.get("key_prefix", "cache")
-                
-                for tag in tags:
-                    tag_key = f"{prefix}:tag:{tag}"
-                    keys = self.client.smembers(tag_key)
-                    
-                    if keys:
-                        deleted_count += self.client.delete(*keys)
-                        self.client.delete(tag_key)
-                
-                return deleted_count
-            except Exception as e:
-                logging.error(f"Redis标签删除错误: {e}")
-                return 0
-    
+        """按标签删除缓存，服务端合并标签集合并分批删除成员"""
+        if not tags:
+            return 0
+        
+        try:
+            tag_keys = [self._tag_key(tag) for tag in dict.fromkeys(tags)]
+            
+            if self._use_scripts:
+                return self._delete_by_tags_script(
+                    keys=tag_keys, args=[self.config.get("delete_batch_size", 500)]
+                )
+            
+            # 集群模式: 一次pipeline取回所有标签成员，再按slot拆分删除
+            pipe = self.client.pipeline(transaction=False)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = set().union(*pipe.execute())
+            
+            deleted_count = self.client.delete(*members) if members else 0
+            self.client.delete(*tag_keys)
+            return deleted_count
+        except Exception as e:
+            logging.error(f"Redis标签删除错误: {e}")
+            return 0
+
     def exists(self, key: str) -> bool:
         """检查缓存是否存在"""
         try:
@@ -203,9 +361,218 @@ class RedisCache:
             logging.error(f"Redis统计错误: {e}")
             return {}
 
+class NearCache:
+    """进程内近端缓存：有界LRU，保存编码后的值，由键空间通知失效"""
+    
+    def __init__(self, max_size: int = 1000, ttl: float = 60, lag_sample_size: int = 1024):
+        self.max_size = max_size
+        # 通知丢失时的兜底过期时间
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效递增；读取前后序号不同说明期间有失效，放弃回填避免缓存旧值
+        self._sequence = 0
+        # 订阅建立前收不到失效通知，此时不回填
+        self.ready = False
+        # 本进程写入的时间，收到对应通知时计算失效延迟
+        self._pending_writes: Dict[str, float] = {}
+        self._lag_samples = deque(maxlen=lag_sample_size)
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "fills": 0,
+            "stale_fills_skipped": 0,
+            "invalidations": 0
+        }
+    
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+    
+    def get(self, cache_key: str) -> Optional[bytes]:
+        """读取近端缓存"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[cache_key]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self._stats["hits"] += 1
+            return entry[0]
+    
+    def put(self, cache_key: str, value_blob: bytes, sequence: int) -> bool:
+        """回填近端缓存，读取期间发生过失效时放弃"""
+        with self._lock:
+            if not self.ready or sequence != self._sequence:
+                self._stats["stale_fills_skipped"] += 1
+                return False
+            self._entries[cache_key] = (value_blob, time.monotonic())
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._stats["fills"] += 1
+            return True
+    
+    def invalidate(self, cache_key: str) -> None:
+        """收到键空间通知时移除条目"""
+        with self._lock:
+            self._sequence += 1
+            self._entries.pop(cache_key, None)
+            self._stats["invalidations"] += 1
+            written_at = self._pending_writes.pop(cache_key, None)
+            if written_at is not None:
+                self._lag_samples.append((time.perf_counter() - written_at) * 1000)
+    
+    def mark_written(self, cache_keys: List[str]) -> None:
+        """本进程写入前先移除本地条目，并记录写入时间用于测量失效延迟"""
+        now = time.perf_counter()
+        with self._lock:
+            self._sequence += 1
+            # 通知可能丢失，限制待确认写入的数量
+            if len(self._pending_writes) > 10000:
+                self._pending_writes.clear()
+            for cache_key in cache_keys:
+                self._entries.pop(cache_key, None)
+                self._pending_writes[cache_key] = now
+    
+    def clear(self) -> None:
+        """清空近端缓存"""
+        with self._lock:
+            self._sequence += 1
+            self._entries.clear()
+            self._pending_writes.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取近端缓存统计"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            lags = sorted(self._lag_samples)
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0,
+                "subscribed": self.ready,
+                "invalidation_lag_ms": {
+                    "samples": len(lags),
+                    "avg": sum(lags) / len(lags) if lags else 0.0,
+                    "p50": lags[len(lags) // 2] if lags else 0.0,
+                    "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+                }
+            }
+
 class RedisCacheAdvanced(RedisCache):
     """高级Redis缓存，支持复杂数据结构"""
     
+    def __init__(self, config: Dict[str, Any], codec: Optional[ValueCodec] = None):
+        super().__init__(config, codec)
+        # 可选的近端缓存：config中设置near_cache_size启用
+        self.near_cache = None
+        self._near_stop = threading.Event()
+        self._near_thread = None
+        if config.get("near_cache_size"):
+            if self.connection_type == "cluster":
+                raise ValueError("近端缓存依赖单节点的键空间通知，不支持集群模式")
+            self.near_cache = NearCache(
+                max_size=config["near_cache_size"],
+                ttl=config.get("near_cache_ttl", 60)
+            )
+            self._enable_keyspace_notifications()
+            self._near_thread = threading.Thread(
+                target=self._invalidation_loop, name="redis-near-cache", daemon=True
+            )
+            self._near_thread.start()
+    
+    def _enable_keyspace_notifications(self) -> None:
+        """开启字符串写入($)、通用命令(g)、过期(x)和淘汰(e)的键空间通知"""
+        if not self.config.get("configure_notifications", True):
+            return
+        try:
+            current = self.client.config_get("notify-keyspace-events").get("notify-keyspace-events", "")
+            if isinstance(current, bytes):
+                current = current.decode()
+            flags = set(current) | set("K$gxe")
+            # A已包含$gxe等类别
+            if "A" in current:
+                flags -= set("$gxe")
+            self.client.config_set("notify-keyspace-events", "".join(sorted(flags)))
+        except Exception as e:
+            # 托管Redis可能禁用CONFIG命令，需要在服务端预先配置
+            logging.warning(f"Redis键空间通知配置失败: {e}")
+    
+    def _invalidation_loop(self) -> None:
+        """订阅本前缀的键空间通知并失效近端缓存，断线后重连"""
+        db = self.config.get("db", 0)
+        prefix = self.config.get("key_prefix", "cache")
+        pattern = f"__keyspace@{db}__:{prefix}:*"
+        
+        while not self._near_stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub()
+                pubsub.psubscribe(pattern)
+                while not self._near_stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    if message["type"] == "psubscribe":
+                        # 订阅建立之前的写入没有收到通知，清空后再开始回填
+                        self.near_cache.clear()
+                        self.near_cache.ready = True
+                    elif message["type"] == "pmessage":
+                        channel = message["channel"]
+                        if isinstance(channel, bytes):
+                            channel = channel.decode()
+                        self.near_cache.invalidate(channel.split(":", 1)[1])
+            except Exception as e:
+                logging.error(f"Redis近端缓存订阅错误: {e}")
+                self.near_cache.ready = False
+                self.near_cache.clear()
+                self._near_stop.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+    
+    def close(self) -> None:
+        """停止近端缓存订阅线程"""
+        self._near_stop.set()
+        if self._near_thread:
+            self._near_thread.join()
+            self._near_thread = None
+    
+    def _fetch_many(self, cache_keys: List[str]) -> List[Optional[bytes]]:
+        """先查近端缓存，未命中的键一次MGET后回填"""
+        if self.near_cache is None:
+            return super()._fetch_many(cache_keys)
+        
+        values = [self.near_cache.get(cache_key) for cache_key in cache_keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            sequence = self.near_cache.sequence
+            fetched = super()._fetch_many([cache_keys[i] for i in missing])
+            for i, value_blob in zip(missing, fetched):
+                values[i] = value_blob
+                if value_blob:
+                    self.near_cache.put(cache_keys[i], value_blob, sequence)
+        return values
+    
+    def _on_write(self, cache_keys: List[str]) -> None:
+        """本进程写入时先移除近端缓存条目"""
+        if self.near_cache is not None:
+            self.near_cache.mark_written(cache_keys)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计，包含近端缓存命中率与失效延迟"""
+        stats = super().get_stats()
+        if self.near_cache is not None:
+            stats["near_cache"] = self.near_cache.get_stats()
+        return stats
+    
     def set_hash(self, key: str, field: str, value: Any, ttl: int = 3600) -> bool:
         """设置哈希缓存"""
         try:
@@ -293,26 +660,186 @@ class RedisCacheAdvanced(RedisCache):
             return []
 
 class RedisCacheCluster:
-    """Redis缓存集群管理"""
+    """Redis缓存集群，按一致性哈希环路由，可选多副本"""
     
-    def __init__(self, cluster_configs: List[Dict[str, Any]]):
-        self.nodes = [RedisCache(config) for config in cluster_configs]
+    def __init__(self, cluster_configs: List[Dict[str, Any]], vnodes: int = 160,
+                 replicas: int = 1):
+        self.ring = HashRing(vnodes=vnodes, replicas=replicas)
+        self.nodes: Dict[str, RedisCache] = {}
+        for config in cluster_configs:
+            self.add_node(config)
+    
+    @staticmethod
+    def _node_name(config: Dict[str, Any]) -> str:
+        """节点名称，未配置name时由连接地址生成"""
+        return config.get("name") or f"{config.get('host', 'localhost')}:{config.get('port', 6379)}/{config.get('db', 0)}"
+    
+    def add_node(self, config: Dict[str, Any]) -> List[MovedRange]:
+        """加入节点，返回改由新节点负责的哈希区间（这些键在新节点上首次访问会未命中）"""
+        name = self._node_name(config)
+        if name in self.nodes:
+            raise ValueError(f"节点已存在: {name}")
+        self.nodes[name] = RedisCache(config)
+        return self.ring.add_node(name, config.get("weight", 1))
+    
+    def remove_node(self, name: str) -> List[MovedRange]:
+        """移除节点，返回由其他节点接管的哈希区间"""
+        moved = self.ring.remove_node(name)
+        self.nodes.pop(name)
+        return moved
     
     def _get_node(self, key: str) -> RedisCache:
-        """根据key选择节点"""
-        import hashlib
-        hash_value = int(hashlib.md5(key.encode()).hexdigest(), 16)
-        return self.nodes[hash_value % len(self.nodes)]
+        """根据key在哈希环上选择主节点"""
+        return self.nodes[self.ring.get_node(key)]
+    
+    def _get_replicas(self, key: str) -> List[RedisCache]:
+        """键的所有副本节点，主节点在前"""
+        return [self.nodes[name] for name in self.ring.get_nodes(key)]
     
     def set(self, key: str, value: Any, **kwargs) -> bool:
-        """设置缓存值"""
-        node = self._get_node(key)
-        return node.set(key, value, **kwargs)
+        """设置缓存值，写入所有副本"""
+        results = [node.set(key, value, **kwargs) for node in self._get_replicas(key)]
+        return bool(results) and all(results)
     
     def get(self, key: str) -> Optional[Any]:
-        """获取缓存值"""
-        node = self._get_node(key)
-        return node.get(key)
+        """获取缓存值，主节点未命中或不可用时依次读取后续副本"""
+        for node in self._get_replicas(key):
+            value = node.get(key)
+            if value is not None:
+                return value
+        return None
+    
+    def delete(self, key: str) -> bool:
+        """删除所有副本上的缓存项"""
+        return any([node.delete(key) for node in self._get_replicas(key)])
+    
+    def _group_by_node(self, keys: List[str], replica: int = 0) -> List[tuple]:
+        """按第replica个副本所在节点分组键，返回 [(节点, 键列表)]"""
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            names = self.ring.get_nodes(key)
+            if replica < len(names):
+                groups.setdefault(names[replica], []).append(key)
+        return [(self.nodes[name], node_keys) for name, node_keys in groups.items()]
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取，每个节点一次MGET，未命中的键再查询后续副本"""
+        results = {}
+        remaining = list(keys)
+        for replica in range(self.ring.replicas):
+            for node, node_keys in self._group_by_node(remaining, replica):
+                results.update(node.get_many(node_keys))
+            remaining = [key for key in remaining if key not in results]
+            if not remaining:
+                break
+        return results
+    
+    def set_many(self, items: Dict[str, Any], **kwargs) -> int:
+        """批量设置，每个副本、每个节点一次pipeline，返回主副本写入数量"""
+        written = 0
+        for replica in range(self.ring.replicas):
+            for node, node_keys in self._group_by_node(list(items), replica):
+                count = node.set_many({key: items[key] for key in node_keys}, **kwargs)
+                if replica == 0:
+                    written += count
+        return written
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除所有副本，返回主副本删除数量"""
+        deleted = 0
+        for replica in range(self.ring.replicas):
+            for node, node_keys in self._group_by_node(keys, replica):
+                count = node.delete_many(node_keys)
+                if replica == 0:
+                    deleted += count
+        return deleted
+
+def benchmark_tagged_writes(config: Dict[str, Any], ops: int = 5000,
+                            num_tags: int = 3, batch_size: int = 100) -> Dict[str, float]:
+    """对比逐条命令、脚本和批量写入带标签缓存的吞吐量，以及标签失效耗时（需要可用的Redis）"""
+    cache = RedisCache({**config, "key_prefix": "cache_benchmark"})
+    cache.clear()
+    tags = [f"tag{i}" for i in range(num_tags)]
+    value = {"answer": "x" * 200}
+    results = {}
+    
+    # 旧实现: SETEX后每个标签单独SADD和EXPIRE，共 1 + 2N 次往返
+    start = time.perf_counter()
+    for i in range(ops):
+        cache_key = cache._generate_key(f"legacy:{i}")
+        cache.client.setex(cache_key, 3600, cache.codec.encode({"value": value, "tags": tags}))
+        for tag in tags:
+            cache.client.sadd(cache._tag_key(tag), cache_key)
+            cache.client.expire(cache._tag_key(tag), 3600)
+    results["legacy_ops_per_sec"] = ops / (time.perf_counter() - start)
+    cache.clear()
+    
+    start = time.perf_counter()
+    for i in range(ops):
+        cache.set(f"script:{i}", value, ttl=3600, tags=tags)
+    results["script_ops_per_sec"] = ops / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    for offset in range(0, ops, batch_size):
+        cache.set_many({f"batch:{i}": value for i in range(offset, min(ops, offset + batch_size))},
+                       ttl=3600, tags=tags)
+    results["set_many_ops_per_sec"] = ops / (time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    deleted = cache.delete_by_tags(tags)
+    results["delete_by_tags_ms"] = (time.perf_counter() - start) * 1000
+    results["deleted"] = deleted
+    
+    for name, result in results.items():
+        print(f"{name}: {result:,.1f}")
+    return results
+
+def benchmark_concurrency(config: Dict[str, Any], threads: int = 32, ops_per_thread: int = 500,
+                          read_ratio: float = 0.8) -> List[Dict[str, Any]]:
+    """多线程读写延迟对比：serialized模拟原先的全局锁，concurrent直接共享连接池（需要可用的Redis）"""
+    cache = RedisCache({**config, "key_prefix": "cache_concurrency",
+                        "max_connections": max(threads, config.get("max_connections", 50))})
+    keys = [f"key:{i}" for i in range(1000)]
+    cache.set_many({key: {"payload": "x" * 200} for key in keys})
+    results = []
+    
+    for mode in ("serialized", "concurrent"):
+        global_lock = threading.Lock()
+        latencies: List[List[float]] = [[] for _ in range(threads)]
+        
+        def worker(index: int):
+            rng = random.Random(index)
+            for _ in range(ops_per_thread):
+                key = rng.choice(keys)
+                start = time.perf_counter()
+                if mode == "serialized":
+                    with global_lock:
+                        cache.get(key) if rng.random() < read_ratio else cache.set(key, {"payload": "y"})
+                else:
+                    cache.get(key) if rng.random() < read_ratio else cache.set(key, {"payload": "y"})
+                latencies[index].append((time.perf_counter() - start) * 1000)
+        
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        
+        samples = sorted(latency for per_thread in latencies for latency in per_thread)
+        result = {
+            "mode": mode,
+            "threads": threads,
+            "ops_per_sec": len(samples) / elapsed,
+            "p50_ms": samples[len(samples) // 2],
+            "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        }
+        results.append(result)
+        print(f"{mode:<11} threads={threads} ops/s={result['ops_per_sec']:>10,.0f} "
+              f"p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms")
+    
+    return results
 
 # 使用示例
 if __name__ == "__main__":
@@ -349,4 +876,9 @@ if __name__ == "__main__":
     
     # 统计信息
     stats = cache.get_stats()
-    print(f"Redis统计: {json.dumps(stats, indent=2, ensure_ascii=False)}")
\ No newline at end of file
+    print(f"Redis统计: {json.dumps(stats, indent=2, ensure_ascii=False)}")
+    
+    # 吞吐量对比: python 14_redis_cache.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_tagged_writes(redis_config)
+        benchmark_concurrency(redis_config)
\ No newline at end of file
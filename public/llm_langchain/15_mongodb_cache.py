@@ -5,25 +5,156 @@ MongoDB自定义缓存实现
 """
 
 import pymongo
-from pymongo import MongoClient, IndexModel
+from pymongo import MongoClient, IndexModel, ReplaceOne, UpdateOne
 from pymongo.errors import PyMongoError
+import copy
+import difflib
+import io
 import json
 import hashlib
-from typing import Any, Optional, Dict, List, Union
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, BinaryIO, Optional, Dict, Iterable, Iterator, List, Tuple, Union
 from datetime import datetime, timedelta
 import logging
 from bson import ObjectId
 from gridfs import GridFS
 
+from cache_codec import ValueCodec, iter_chunks
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# 字符串差异的切分单位: 以空白或中英文标点结尾的片段
+_TOKEN_PATTERN = re.compile(r"[^\s。，！？；、.,!?;]+[\s。，！？；、.,!?;]*|[\s。，！？；、.,!?;]+")
+# 短于此长度的字符串变化直接整体替换
+STRING_DELTA_MIN_LENGTH = 256
+
+def _escape_pointer(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+def _unescape_pointer(part: str) -> str:
+    return part.replace("~1", "/").replace("~0", "~")
+
+def _string_delta(old: str, new: str) -> List[Union[str, List[int]]]:
+    """按片段比较字符串，返回由[起, 止)旧串区间和新增文本组成的编辑序列"""
+    old_tokens = _TOKEN_PATTERN.findall(old)
+    new_tokens = _TOKEN_PATTERN.findall(new)
+    offsets = [0]
+    for token in old_tokens:
+        offsets.append(offsets[-1] + len(token))
+
+    delta: List[Union[str, List[int]]] = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([offsets[i1], offsets[i2]])
+        elif j2 > j1:
+            delta.append("".join(new_tokens[j1:j2]))
+    return delta
+
+def _apply_string_delta(old: str, delta: List[Union[str, List[int]]]) -> str:
+    return "".join(old[part[0]:part[1]] if isinstance(part, list) else part for part in delta)
+
+def _json_diff(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """计算JSON Patch(RFC 6902)风格的差异
+    
+    字典按键、列表按下标递归比较；长字符串使用扩展的edit操作只记录变化的片段
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{"op": "remove", "path": f"{path}/{_escape_pointer(k)}"} for k in old if k not in new]
+        for k, v in new.items():
+            child = f"{path}/{_escape_pointer(k)}"
+            if k in old:
+                ops.extend(_json_diff(old[k], v, child))
+            else:
+                ops.append({"op": "add", "path": child, "value": v})
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        ops = []
+        for i in range(common):
+            ops.extend(_json_diff(old[i], new[i], f"{path}/{i}"))
+        ops.extend({"op": "add", "path": f"{path}/{i}", "value": new[i]} for i in range(common, len(new)))
+        # 从尾部删除，保证后续下标有效
+        ops.extend({"op": "remove", "path": f"{path}/{i}"} for i in reversed(range(common, len(old))))
+        return ops
+
+    if type(old) is type(new) and old == new:
+        return []
+
+    if isinstance(old, str) and isinstance(new, str) and len(new) >= STRING_DELTA_MIN_LENGTH:
+        delta = _string_delta(old, new)
+        if sum(len(part) for part in delta if isinstance(part, str)) < len(new) // 2:
+            return [{"op": "edit", "path": path, "delta": delta}]
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+def _apply_patch(document: Any, patch: List[Dict[str, Any]]) -> Any:
+    """按顺序应用_json_diff生成的差异，原地修改并返回结果"""
+    for op in patch:
+        parts = [_unescape_pointer(part) for part in op["path"].split("/")[1:]]
+        if not parts:
+            if op["op"] == "edit":
+                document = _apply_string_delta(document, op["delta"])
+            else:
+                document = op.get("value")
+            continue
+
+        parent = document
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        last = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+
+        if op["op"] == "remove":
+            del parent[last]
+        elif op["op"] == "add" and isinstance(parent, list):
+            parent.insert(last, op["value"])
+        elif op["op"] == "edit":
+            parent[last] = _apply_string_delta(parent[last], op["delta"])
+        else:
+            parent[last] = op["value"]
+    return document
+
+def _encode_revision(codec: ValueCodec, previous: Any, value: Any,
+                     snapshot: bool) -> Tuple[str, bytes, int]:
+    """编码一个版本，返回(类型, 存储数据, 完整快照大小)；差异不比快照小时仍存快照"""
+    snapshot_payload = codec.encode(value)
+    if snapshot:
+        return "snapshot", snapshot_payload, len(snapshot_payload)
+
+    delta_payload = codec.encode(_json_diff(previous, value))
+    if len(delta_payload) >= len(snapshot_payload):
+        return "snapshot", snapshot_payload, len(snapshot_payload)
+    return "delta", delta_payload, len(snapshot_payload)
+
 class MongoDBCache:
     """MongoDB缓存实现"""
     
-    def __init__(self, config: Dict[str, Any]):
+    # 读取值所需的字段，元数据与统计字段不回传
+    VALUE_PROJECTION = {"_id": 0, "value": 1, "is_gridfs": 1, "file_id": 1}
+    
+    def __init__(self, config: Dict[str, Any], codec: Optional[ValueCodec] = None):
         self.config = config
         self.client = None
+        # 仅用于GridFS大对象，内联文档仍以BSON原生存储便于查询
+        self.codec = codec or ValueCodec()
         self.db = None
         self.collection = None
         self.gridfs = None
+        # 访问统计批量回写：access_batch_size为0时每次读取随查询原子更新
+        self.access_batch_size = config.get("access_batch_size", 0)
+        self.access_flush_interval = config.get("access_flush_interval", 5.0)
+        self._pending_access: Dict[str, List] = {}  # cache_key -> [次数, 最后访问时间]
+        self._pending_lock = threading.Lock()
+        self._last_flush = time.monotonic()
         self._init_connection()
         self._create_indexes()
     
@@ -37,6 +168,11 @@ class MongoDBCache:
                 maxPoolSize=self.config.get("max_pool_size", 100),
                 minPoolSize=self.config.get("min_pool_size", 10),
                 maxIdleTimeMS=self.config.get("max_idle_time", 30000),
+                # 连接池耗尽时的最长等待，避免线程无限排队
+                waitQueueTimeoutMS=self.config.get("wait_queue_timeout", 5000),
+                serverSelectionTimeoutMS=self.config.get("server_selection_timeout", 5000),
+                connectTimeoutMS=self.config.get("connect_timeout", 2000),
+                socketTimeoutMS=self.config.get("socket_timeout", 10000),
                 **self.config.get("options", {})
             )
             
@@ -76,110 +212,308 @@ class MongoDBCache:
         prefix = self.config.get("key_prefix", "cache")
         return f"{prefix}_{hashlib.sha256(key.encode()).hexdigest()}"
     
+    @staticmethod
+    def _live_filter(cache_key: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """未过期文档的查询条件
+        
+        过期由expire_at上的TTL索引删除，但后台任务约60秒执行一次，
+        这里在查询条件中排除已过期尚未删除的文档
+        """
+        return {"cache_key": cache_key, "expire_at": {"$gt": datetime.utcnow()}}
+    
+    def _read_value(self, cache_doc: Dict[str, Any]) -> Any:
+        """从投影后的文档取值"""
+        if cache_doc.get("is_gridfs", False):
+            # 按GridFS分块增量解压，不缓存完整的压缩数据
+            return self.codec.decode_stream(self.gridfs.get(cache_doc["file_id"]))
+        return cache_doc.get("value")
+    
+    def _record_access(self, cache_keys: List[str]):
+        """累积访问统计，达到批量大小或间隔后一次bulk_write回写"""
+        now = datetime.utcnow()
+        with self._pending_lock:
+            for cache_key in cache_keys:
+                pending = self._pending_access.setdefault(cache_key, [0, now])
+                pending[0] += 1
+                pending[1] = now
+            due = (len(self._pending_access) >= self.access_batch_size or
+                   time.monotonic() - self._last_flush >= self.access_flush_interval)
+        if due:
+            self.flush_access_stats()
+    
+    def flush_access_stats(self) -> int:
+        """回写累积的访问统计，返回更新的文档数"""
+        with self._pending_lock:
+            pending, self._pending_access = self._pending_access, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        
+        try:
+            requests = [
+                UpdateOne({"cache_key": cache_key},
+                          {"$inc": {"access_count": count}, "$max": {"last_accessed": last_accessed}})
+                for cache_key, (count, last_accessed) in pending.items()
+            ]
+            result = self.collection.bulk_write(requests, ordered=False)
+            return result.modified_count
+        except PyMongoError as e:
+            logging.error(f"MongoDB访问统计回写错误: {e}")
+            return 0
+    
     def set(self, key: str, value: Any, ttl: int = 3600, 
             tags: List[str] = None, metadata: Dict = None, 
             use_gridfs: bool = False) -> bool:
         """设置缓存值"""
+        cache_doc = None
         try:
-            cache_key = self._generate_key(key)
-            expire_at = datetime.utcnow() + timedelta(seconds=ttl)
-            
-            # 检查数据大小
-            data_size = len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
-            max_size = self.config.get("max_document_size", 16777216)  # 16MB
-            
-            if use_gridfs or data_size > max_size:
-                # 使用GridFS存储大文件
-                value_str = json.dumps(value, ensure_ascii=False)
-                file_id = self.gridfs.put(
-                    value_str.encode('utf-8'),
-                    filename=cache_key,
-                    content_type="application/json",
-                    metadata=metadata or {}
-                )
-                
-                cache_doc = {
-                    "cache_key": cache_key,
-                    "original_key": key,
-                    "file_id": file_id,
-                    "is_gridfs": True,
-                    "data_type": type(value).__name__,
-                    "data_size": data_size,
-                    "tags": tags or [],
-                    "metadata": metadata or {},
-                    "created_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow(),
-                    "last_accessed": datetime.utcnow(),
-                    "access_count": 0,
-                    "expire_at": expire_at
-                }
-            else:
-                # 直接存储在文档中
-                cache_doc = {
-                    "cache_key": cache_key,
-                    "original_key": key,
-                    "value": value,
-                    "is_gridfs": False,
-                    "data_type": type(value).__name__,
-                    "data_size": data_size,
-                    "tags": tags or [],
-                    "metadata": metadata or {},
-                    "created_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow(),
-                    "last_accessed": datetime.utcnow(),
-                    "access_count": 0,
-                    "expire_at": expire_at
-                }
+            cache_doc = self._build_doc(key, value, ttl, tags, metadata, use_gridfs)
             
-            # 使用upsert更新或插入
-            result = self.collection.replace_one(
-                {"cache_key": cache_key},
+            # 使用upsert更新或插入，返回被替换的旧文档以便清理其GridFS文件
+            old_doc = self.collection.find_one_and_replace(
+                {"cache_key": cache_doc["cache_key"]},
                 cache_doc,
+                projection={"_id": 0, "file_id": 1},
                 upsert=True
             )
+            self._delete_files([old_doc])
             
-            return result.acknowledged
+            return True
             
         except PyMongoError as e:
             logging.error(f"MongoDB缓存设置错误: {e}")
+            # 替换失败时新上传的文件不会被引用
+            if cache_doc is not None:
+                self._delete_files([cache_doc])
             return False
     
+    def _delete_files(self, docs: Iterable[Optional[Dict[str, Any]]]):
+        """删除文档引用的GridFS文件，清理失败只记录日志"""
+        for doc in docs:
+            if doc and doc.get("file_id") is not None:
+                try:
+                    self.gridfs.delete(doc["file_id"])
+                except PyMongoError as e:
+                    logging.error(f"MongoDB GridFS文件清理错误: {e}")
+    
+    def set_many(self, items: Dict[str, Any], ttl: int = 3600,
+                 tags: List[str] = None, metadata: Dict = None) -> int:
+        """批量设置缓存值，一次无序bulk_write"""
+        if not items:
+            return 0
+        
+        cache_docs = []
+        try:
+            for key, value in items.items():
+                cache_docs.append(self._build_doc(key, value, ttl, tags, metadata))
+            
+            # bulk_write不返回旧文档，先查出将被覆盖的GridFS文件，写入成功后删除
+            old_docs = list(self.collection.find(
+                {"cache_key": {"$in": [doc["cache_key"] for doc in cache_docs]}, "is_gridfs": True},
+                {"_id": 0, "file_id": 1}
+            ))
+            result = self.collection.bulk_write([
+                ReplaceOne({"cache_key": doc["cache_key"]}, doc, upsert=True) for doc in cache_docs
+            ], ordered=False)
+            self._delete_files(old_docs)
+            return result.upserted_count + result.matched_count
+            
+        except PyMongoError as e:
+            logging.error(f"MongoDB批量设置错误: {e}")
+            self._delete_files(cache_docs)
+            return 0
+    
+    def _build_doc(self, key: str, value: Any, ttl: int, tags: Optional[List[str]],
+                   metadata: Optional[Dict], use_gridfs: bool = False) -> Dict[str, Any]:
+        """构建缓存文档，超过文档大小上限的值写入GridFS
+        
+        值只序列化一次: 指定GridFS时用iterencode分块序列化并流式上传；其他值用C实现的
+        json.dumps一次性序列化测量大小，超过上限时把已得到的数据分块压缩上传
+        """
+        cache_key = self._generate_key(key)
+        now = datetime.utcnow()
+        max_size = self.config.get("max_document_size", 16777216)  # 16MB
+        
+        chunks: Iterable[bytes] = ()
+        data_size = 0
+        if use_gridfs:
+            chunks = self.codec.iter_serialized(value)
+        else:
+            payload = self.codec.serialize(value)
+            data_size = len(payload)
+            if data_size > max_size:
+                use_gridfs = True
+                chunks = iter_chunks(payload)
+        
+        cache_doc = {
+            "cache_key": cache_key,
+            "original_key": key,
+            "is_gridfs": use_gridfs,
+            "data_type": type(value).__name__,
+            "data_size": data_size,
+            "tags": tags or [],
+            "metadata": metadata or {},
+            "created_at": now,
+            "updated_at": now,
+            "last_accessed": now,
+            "access_count": 0,
+            "expire_at": now + timedelta(seconds=ttl)
+        }
+        
+        if use_gridfs:
+            # 使用GridFS存储大文件
+            cache_doc["file_id"], cache_doc["data_size"] = self._upload_gridfs(
+                cache_key, chunks, metadata
+            )
+        else:
+            # 直接存储在文档中
+            cache_doc["value"] = value
+        
+        return cache_doc
+    
+    def _upload_gridfs(self, cache_key: str, chunks: Iterable[bytes],
+                       metadata: Optional[Dict]) -> Tuple[Any, int]:
+        """流式压缩并分块上传到GridFS，返回(文件ID, 序列化后大小)"""
+        data_size = 0
+        
+        def counted() -> Iterator[bytes]:
+            nonlocal data_size
+            for chunk in chunks:
+                data_size += len(chunk)
+                yield chunk
+        
+        grid_in = self.gridfs.new_file(
+            filename=cache_key,
+            content_type="application/octet-stream",
+            metadata=metadata or {}
+        )
+        try:
+            for block in self.codec.iter_encode(counted()):
+                grid_in.write(block)
+        except BaseException:
+            grid_in.abort()
+            raise
+        grid_in.close()
+        return grid_in._id, data_size
+    
+    def _fetch_doc(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """读取未过期文档的值字段，读取与访问统计在一次往返中完成"""
+        if self.access_batch_size:
+            cache_doc = self.collection.find_one(self._live_filter(cache_key), self.VALUE_PROJECTION)
+            if cache_doc:
+                self._record_access([cache_key])
+            return cache_doc
+        
+        return self.collection.find_one_and_update(
+            self._live_filter(cache_key),
+            {
+                "$inc": {"access_count": 1},
+                "$set": {"last_accessed": datetime.utcnow()}
+            },
+            projection=self.VALUE_PROJECTION
+        )
+    
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         try:
-            cache_key = self._generate_key(key)
-            cache_doc = self.collection.find_one({"cache_key": cache_key})
-            
+            cache_doc = self._fetch_doc(self._generate_key(key))
             if not cache_doc:
                 return None
-            
-            # 更新访问统计
-            self.collection.update_one(
-                {"cache_key": cache_key},
-                {
-                    "$inc": {"access_count": 1},
-                    "$set": {"last_accessed": datetime.utcnow()}
-                }
-            )
-            
-            if cache_doc.get("is_gridfs", False):
-                # 从GridFS获取数据
-                file_id = cache_doc["file_id"]
-                file_data = self.gridfs.get(file_id).read()
-                return json.loads(file_data.decode('utf-8'))
-            else:
-                # 直接从文档获取数据
-                return cache_doc.get("value")
+            return self._read_value(cache_doc)
                 
         except PyMongoError as e:
             logging.error(f"MongoDB缓存获取错误: {e}")
             return None
     
+    def open_stream(self, key: str) -> Optional[Tuple[str, BinaryIO]]:
+        """惰性读取缓存值，返回(序列化格式, 解压后的序列化数据流)
+        
+        GridFS中的值按块读取和解压，调用方可边读边处理而不必载入完整对象
+        """
+        try:
+            cache_doc = self._fetch_doc(self._generate_key(key))
+            if not cache_doc:
+                return None
+            if cache_doc.get("is_gridfs", False):
+                return self.codec.open_stream(self.gridfs.get(cache_doc["file_id"]))
+            # 内联值已随文档载入，序列化后以相同接口返回
+            return self.codec.serializer, io.BytesIO(self.codec.serialize(cache_doc.get("value")))
+            
+        except PyMongoError as e:
+            logging.error(f"MongoDB流式读取错误: {e}")
+            return None
+    
+    def iter_items(self, key: str, prefix: str = "item") -> Iterator[Any]:
+        """用ijson增量解析JSON值，逐个产出prefix路径下的元素（默认为顶层数组元素）"""
+        if not HAS_IJSON:
+            raise ImportError("增量解析需要安装ijson: pip install ijson")
+        
+        opened = self.open_stream(key)
+        if opened is None:
+            return
+        serializer, stream = opened
+        if serializer != "json":
+            raise ValueError(f"增量解析仅支持JSON序列化的值: {serializer}")
+        yield from ijson.items(stream, prefix, use_float=True)
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，一次$in查询，只返回命中的键"""
+        key_map = {self._generate_key(key): key for key in keys}
+        if not key_map:
+            return {}
+        
+        try:
+            results = {}
+            cache_keys = []
+            projection = {**self.VALUE_PROJECTION, "cache_key": 1}
+            for cache_doc in self.collection.find(self._live_filter({"$in": list(key_map)}), projection):
+                cache_key = cache_doc["cache_key"]
+                cache_keys.append(cache_key)
+                results[key_map[cache_key]] = self._read_value(cache_doc)
+            
+            # 更新访问统计
+            if cache_keys and self.access_batch_size:
+                self._record_access(cache_keys)
+            elif cache_keys:
+                self.collection.update_many(
+                    {"cache_key": {"$in": cache_keys}},
+                    {
+                        "$inc": {"access_count": 1},
+                        "$set": {"last_accessed": datetime.utcnow()}
+                    }
+                )
+            
+            return results
+            
+        except PyMongoError as e:
+            logging.error(f"MongoDB批量获取错误: {e}")
+            return {}
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """批量删除缓存项，返回删除数量"""
+        cache_keys = [self._generate_key(key) for key in keys]
+        if not cache_keys:
+            return 0
+        
+        try:
+            # 先删除GridFS文件
+            for doc in self.collection.find(
+                {"cache_key": {"$in": cache_keys}, "is_gridfs": True}, {"file_id": 1}
+            ):
+                self.gridfs.delete(doc["file_id"])
+            
+            result = self.collection.delete_many({"cache_key": {"$in": cache_keys}})
+            return result.deleted_count
+            
+        except PyMongoError as e:
+            logging.error(f"MongoDB批量删除错误: {e}")
+            return 0
+    
     def delete(self, key: str) -> bool:
         """删除缓存项"""
         try:
             cache_key = self._generate_key(key)
-            cache_doc = self.collection.find_one({"cache_key": cache_key})
+            cache_doc = self.collection.find_one({"cache_key": cache_key}, {"is_gridfs": 1, "file_id": 1})
             
             if cache_doc:
                 # 删除GridFS文件
@@ -220,10 +554,10 @@ class MongoDBCache:
             return 0
     
     def exists(self, key: str) -> bool:
-        """检查缓存是否存在"""
+        """检查缓存是否存在，只查询索引字段不读取值"""
         try:
             cache_key = self._generate_key(key)
-            return self.collection.count_documents({"cache_key": cache_key}) > 0
+            return self.collection.count_documents(self._live_filter(cache_key), limit=1) > 0
         except PyMongoError as e:
             logging.error(f"MongoDB存在检查错误: {e}")
             return False
@@ -232,7 +566,7 @@ class MongoDBCache:
         """获取剩余TTL（秒）"""
         try:
             cache_key = self._generate_key(key)
-            cache_doc = self.collection.find_one({"cache_key": cache_key})
+            cache_doc = self.collection.find_one({"cache_key": cache_key}, {"_id": 0, "expire_at": 1})
             
             if not cache_doc:
                 return -2  # 不存在
@@ -242,7 +576,9 @@ class MongoDBCache:
                 return -1  # 永不过期
             
             remaining = (expire_at - datetime.utcnow()).total_seconds()
-            return max(0, int(remaining))
+            if remaining <= 0:
+                return -2  # 已过期，等待TTL索引删除
+            return int(remaining)
             
         except PyMongoError as e:
             logging.error(f"MongoDB TTL获取错误: {e}")
@@ -291,6 +627,7 @@ class MongoDBCache:
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计"""
+        self.flush_access_stats()
         try:
             total_count = self.collection.count_documents({})
             
@@ -351,55 +688,240 @@ class MongoDBCache:
             logging.error(f"MongoDB统计错误: {e}")
             return {}
 
+    def close(self):
+        """回写未提交的访问统计并关闭连接"""
+        self.flush_access_stats()
+        if self.client:
+            self.client.close()
+
 class MongoDBCacheAdvanced(MongoDBCache):
     """高级MongoDB缓存，支持复杂查询和聚合"""
     
+    # 历史版本元数据字段，不含存储的快照或差异
+    VERSION_FIELDS = {"_id": 0, "version": 1, "kind": 1, "snapshot_version": 1, "stored_size": 1,
+                      "full_size": 1, "tags": 1, "metadata": 1, "created_at": 1}
+    
+    def __init__(self, config: Dict[str, Any], codec: Optional[ValueCodec] = None):
+        super().__init__(config, codec)
+        # 每隔snapshot_interval个版本存一次完整快照，其间只存与上一版本的差异
+        self.snapshot_interval = max(1, config.get("version_snapshot_interval", 10))
+        self.versions = self.db[f"{self.collection.name}_versions"]
+        try:
+            self.versions.create_indexes([
+                IndexModel([("cache_key", pymongo.ASCENDING), ("version", pymongo.DESCENDING)], unique=True)
+            ])
+        except PyMongoError as e:
+            logging.error(f"MongoDB版本索引创建失败: {e}")
+    
+    def _load_versions(self, cache_key: str, versions: List[int]) -> Dict[int, Any]:
+        """从不晚于最早目标版本的快照开始依次应用差异，重建各目标版本的值"""
+        if not versions:
+            return {}
+        
+        base = self.versions.find_one(
+            {"cache_key": cache_key, "version": {"$lte": min(versions)}, "kind": "snapshot"},
+            {"version": 1}, sort=[("version", -1)]
+        )
+        if not base:
+            return {}
+        
+        wanted = set(versions)
+        highest = max(versions)
+        results = {}
+        value = None
+        cursor = self.versions.find(
+            {"cache_key": cache_key, "version": {"$gte": base["version"], "$lte": highest}},
+            {"version": 1, "kind": 1, "payload": 1}
+        ).sort("version", pymongo.ASCENDING)
+        
+        for doc in cursor:
+            data = self.codec.decode(doc["payload"])
+            value = data if doc["kind"] == "snapshot" else _apply_patch(value, data)
+            if doc["version"] in wanted:
+                # 后续差异会原地修改value，中间版本需复制
+                results[doc["version"]] = value if doc["version"] == highest else copy.deepcopy(value)
+        
+        return results
+    
     def set_with_versioning(self, key: str, value: Any, ttl: int = 3600,
                            tags: List[str] = None, metadata: Dict = None) -> bool:
-        """设置带版本控制的缓存"""
+        """设置带版本控制的缓存，历史版本存为周期快照加增量差异"""
         try:
             cache_key = self._generate_key(key)
             
             # 获取当前版本号
-            current_doc = self.collection.find_one(
+            latest = self.versions.find_one(
                 {"cache_key": cache_key},
+                {"version": 1, "snapshot_version": 1},
                 sort=[("version", -1)]
             )
             
-            version = (current_doc.get("version", 0) + 1) if current_doc else 1
+            previous_version = latest["version"] if latest else None
+            version = (previous_version or 0) + 1
+            
+            snapshot = latest is None or version - latest["snapshot_version"] >= self.snapshot_interval
+            previous = None if snapshot else self._load_versions(cache_key, [previous_version]).get(previous_version)
+            kind, payload, full_size = _encode_revision(self.codec, previous, value, snapshot or previous is None)
+            
+            self.versions.insert_one({
+                "cache_key": cache_key,
+                "original_key": key,
+                "version": version,
+                "kind": kind,
+                "snapshot_version": version if kind == "snapshot" else latest["snapshot_version"],
+                "payload": payload,
+                "stored_size": len(payload),
+                "full_size": full_size,
+                "tags": tags or [],
+                "metadata": metadata or {},
+                "created_at": datetime.utcnow()
+            })
             
             # 设置新版本
             return self.set(key, value, ttl, tags, {
                 **(metadata or {}),
                 "version": version,
-                "previous_version": current_doc.get("version") if current_doc else None
+                "previous_version": previous_version
             })
             
         except PyMongoError as e:
             logging.error(f"MongoDB版本控制设置错误: {e}")
             return False
     
-    def get_version_history(self, key: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """获取版本历史"""
+    def get_version(self, key: str, version: Optional[int] = None) -> Optional[Any]:
+        """重建指定版本的值，默认最新版本"""
         try:
             cache_key = self._generate_key(key)
-            cursor = self.collection.find(
+            if version is None:
+                latest = self.versions.find_one({"cache_key": cache_key}, {"version": 1},
+                                                sort=[("version", -1)])
+                if not latest:
+                    return None
+                version = latest["version"]
+            return self._load_versions(cache_key, [version]).get(version)
+            
+        except PyMongoError as e:
+            logging.error(f"MongoDB版本获取错误: {e}")
+            return None
+    
+    def get_version_history(self, key: str, limit: int = 10,
+                            include_values: bool = False) -> List[Dict[str, Any]]:
+        """获取版本历史（新版本在前），默认只返回元数据不重建值"""
+        try:
+            cache_key = self._generate_key(key)
+            cursor = self.versions.find(
                 {"cache_key": cache_key},
-                sort=[("created_at", -1)]
+                self.VERSION_FIELDS,
+                sort=[("version", -1)]
             ).limit(limit)
             
-            history = []
-            for doc in cursor:
-                doc["_id"] = str(doc["_id"])
-                if "file_id" in doc:
-                    doc["file_id"] = str(doc["file_id"])
-                history.append(doc)
+            history = list(cursor)
+            if include_values:
+                values = self._load_versions(cache_key, [doc["version"] for doc in history])
+                for doc in history:
+                    doc["value"] = values.get(doc["version"])
             
             return history
             
         except PyMongoError as e:
             logging.error(f"MongoDB版本历史获取错误: {e}")
             return []
+    
+    def get_version_storage(self, key: Optional[str] = None) -> Dict[str, Any]:
+        """统计历史版本的实际存储与全部存完整副本时的大小"""
+        try:
+            match = {"cache_key": self._generate_key(key)} if key else {}
+            pipeline = [
+                {"$match": match},
+                {"$group": {
+                    "_id": "$kind",
+                    "count": {"$sum": 1},
+                    "stored_size": {"$sum": "$stored_size"},
+                    "full_size": {"$sum": "$full_size"}
+                }}
+            ]
+            by_kind = {doc["_id"]: doc for doc in self.versions.aggregate(pipeline)}
+            stored = sum(doc["stored_size"] for doc in by_kind.values())
+            full = sum(doc["full_size"] for doc in by_kind.values())
+            
+            return {
+                "versions": sum(doc["count"] for doc in by_kind.values()),
+                "snapshots": by_kind.get("snapshot", {}).get("count", 0),
+                "deltas": by_kind.get("delta", {}).get("count", 0),
+                "stored_bytes": stored,
+                "full_copy_bytes": full,
+                "saved_ratio": round(1 - stored / full, 4) if full else 0.0
+            }
+            
+        except PyMongoError as e:
+            logging.error(f"MongoDB版本存储统计错误: {e}")
+            return {}
+
+def benchmark_version_storage(revisions: int = 100, snapshot_interval: int = 10,
+                              paragraphs: int = 40, seed: int = 42) -> Dict[str, Any]:
+    """模拟大答案逐步修订，比较完整副本与快照+差异的存储大小和重建耗时"""
+    rng = random.Random(seed)
+    codec = ValueCodec()
+    vocabulary = ["缓存", "命中率", "延迟", "成本", "模型", "向量", "索引", "过期", "cache", "latency",
+                  "token", "embedding", "prompt", "shard", "replica", "eviction", "throughput"]
+    
+    def sentence() -> str:
+        return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(8, 16))) + "。"
+    
+    value = {
+        "question": "如何设计LLM应用的多级缓存?",
+        "answer": "\n".join(
+            f"第{p}段：" + "".join(sentence() for _ in range(6)) for p in range(paragraphs)
+        ),
+        "sources": [{"url": f"https://example.com/doc/{i}", "score": round(rng.random(), 3)} for i in range(20)],
+        "revision": 0
+    }
+    
+    full_total = stored_total = 0
+    chain: List[Tuple[str, bytes]] = []
+    previous = None
+    snapshot_version = 0
+    for version in range(1, revisions + 1):
+        value = copy.deepcopy(value)
+        lines = value["answer"].split("\n")
+        lines[rng.randrange(len(lines))] += f" 修订{version}: " + sentence()
+        value["answer"] = "\n".join(lines)
+        value["revision"] = version
+        if rng.random() < 0.2:
+            value["sources"].append({"url": f"https://example.com/new/{version}", "score": 0.5})
+        
+        snapshot = previous is None or version - snapshot_version >= snapshot_interval
+        kind, payload, full_size = _encode_revision(codec, previous, value, snapshot)
+        if kind == "snapshot":
+            snapshot_version = version
+        full_total += full_size
+        stored_total += len(payload)
+        chain.append((kind, payload))
+        previous = value
+    
+    # 重建最新版本: 从最近快照开始应用差异
+    start = time.perf_counter()
+    last_snapshot = max(i for i, (kind, _) in enumerate(chain) if kind == "snapshot")
+    rebuilt = None
+    for kind, payload in chain[last_snapshot:]:
+        data = codec.decode(payload)
+        rebuilt = data if kind == "snapshot" else _apply_patch(rebuilt, data)
+    rebuild_ms = (time.perf_counter() - start) * 1000
+    assert rebuilt == value
+    
+    result = {
+        "revisions": revisions,
+        "value_bytes": len(json.dumps(value, ensure_ascii=False).encode("utf-8")),
+        "full_copy_bytes": full_total,
+        "delta_bytes": stored_total,
+        "saved_ratio": round(1 - stored_total / full_total, 4),
+        "rebuild_latest_ms": round(rebuild_ms, 2)
+    }
+    print(f"{revisions}个版本, 单个值 {result['value_bytes']:,}B (快照间隔 {snapshot_interval})")
+    print(f"  完整副本(压缩后): {full_total:,}B")
+    print(f"  快照+差异: {stored_total:,}B, 节省 {result['saved_ratio']:.1%}")
+    print(f"  重建最新版本: {rebuild_ms:.2f}ms")
+    return result
 
 # 使用示例
 if __name__ == "__main__":
@@ -450,4 +972,9 @@ if __name__ == "__main__":
     }, tags=["config", "app"])
     
     history = advanced_cache.get_version_history("config:app")
-    print(f"配置版本历史: {json.dumps(history, indent=2, ensure_ascii=False)}")
\ No newline at end of file
+    print(f"配置版本历史: {json.dumps(history, indent=2, ensure_ascii=False, default=str)}")
+    print(f"版本存储: {advanced_cache.get_version_storage('config:app')}")
+    
+    # 版本存储模拟: python 15_mongodb_cache.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_version_storage()
\ No newline at end of file
@@ -7,7 +7,13 @@
 import numpy as np
 import hashlib
 import json
-from typing import Any, Optional, Dict, List, Tuple, Union
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional, Dict, Iterable, List, Tuple, Union
 from datetime import datetime, timedelta
 import logging
 from abc import ABC, abstractmethod
@@ -17,6 +23,8 @@ from sklearn.metrics.pairwise import cosine_similarity
 import openai
 from sentence_transformers import SentenceTransformer
 
+from vector_index import VectorIndex, IVFFlatIndex, HNSWIndex, FaissIVFIndex, HAS_HNSWLIB, HAS_FAISS
+
 class SemanticEncoder(ABC):
     """语义编码器抽象基类"""
     
@@ -25,6 +33,10 @@ class SemanticEncoder(ABC):
         """将文本编码为向量"""
         pass
     
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """批量编码，返回(len(texts), dim)的矩阵；默认逐条调用encode，子类可覆盖为一次模型调用"""
+        return np.vstack([self.encode(text) for text in texts])
+    
     @abstractmethod
     def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """计算向量相似度"""
@@ -55,6 +67,13 @@ class TfidfSemanticEncoder(SemanticEncoder):
         
         return self.vectorizer.transform([text]).toarray()[0]
     
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """批量编码为TF-IDF矩阵"""
+        if not self.is_fitted:
+            self.fit(texts)
+        
+        return self.vectorizer.transform(texts).toarray()
+    
     def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """计算余弦相似度"""
         return float(cosine_similarity([vec1], [vec2])[0][0])
@@ -62,13 +81,18 @@ class TfidfSemanticEncoder(SemanticEncoder):
 class TransformerSemanticEncoder(SemanticEncoder):
     """基于Transformer的语义编码器"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 32):
         self.model = SentenceTransformer(model_name)
+        self.batch_size = batch_size
     
     def encode(self, text: str) -> np.ndarray:
         """编码文本为语义向量"""
         return self.model.encode([text])[0]
     
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """批量编码，按batch_size分批送入模型"""
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+    
     def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """计算余弦相似度"""
         return float(cosine_similarity([vec1], [vec2])[0][0])
@@ -76,6 +100,9 @@ class TransformerSemanticEncoder(SemanticEncoder):
 class OpenAISemanticEncoder(SemanticEncoder):
     """基于OpenAI的语义编码器"""
     
+    # 单次请求的最大输入条数
+    MAX_BATCH_SIZE = 2048
+    
     def __init__(self, api_key: str, model: str = "text-embedding-ada-002"):
         openai.api_key = api_key
         self.model = model
@@ -88,20 +115,208 @@ class OpenAISemanticEncoder(SemanticEncoder):
         )
         return np.array(response['data'][0]['embedding'])
     
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        """一次请求编码多条文本，结果按index还原顺序"""
+        embeddings = []
+        for start in range(0, len(texts), self.MAX_BATCH_SIZE):
+            response = openai.Embedding.create(
+                input=texts[start:start + self.MAX_BATCH_SIZE],
+                model=self.model
+            )
+            data = sorted(response['data'], key=lambda item: item['index'])
+            embeddings.extend(item['embedding'] for item in data)
+        return np.array(embeddings)
+    
     def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """计算余弦相似度"""
         return float(cosine_similarity([vec1], [vec2])[0][0])
 
+class BatchingEncoder(SemanticEncoder):
+    """编码器包装: 按规范化文本记忆向量，并把并发的单条encode合并为一次encode_batch
+    
+    单条请求进入队列，由后台线程在max_wait_ms窗口内收集，凑满max_batch_size立即发出；
+    max_wait_ms为0时不等待合并，直接调用被包装的编码器
+    """
+    
+    def __init__(self, encoder: SemanticEncoder, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, memo_size: int = 10000):
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.stats = {"memo_hits": 0, "memo_misses": 0, "batches": 0, "batched_texts": 0}
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """记忆键: 合并空白并转小写"""
+        return re.sub(r'\s+', ' ', text.strip()).lower()
+    
+    def _memo_get(self, key: str) -> Optional[np.ndarray]:
+        with self._memo_lock:
+            vector = self._memo.get(key)
+            if vector is None:
+                self.stats["memo_misses"] += 1
+                return None
+            self._memo.move_to_end(key)
+            self.stats["memo_hits"] += 1
+            return vector
+    
+    def _memo_put(self, keys: List[str], vectors: np.ndarray):
+        with self._memo_lock:
+            for key, vector in zip(keys, vectors):
+                self._memo[key] = vector
+                self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+    
+    def _encode_misses(self, texts: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """批量编码未命中的文本（键 -> 原文），写入记忆"""
+        keys = list(texts)
+        results = {}
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            vectors = np.asarray(self.encoder.encode_batch([texts[key] for key in chunk]))
+            self._memo_put(chunk, vectors)
+            results.update(zip(chunk, vectors))
+            with self._memo_lock:
+                self.stats["batches"] += 1
+                self.stats["batched_texts"] += len(chunk)
+        return results
+    
+    def encode(self, text: str) -> np.ndarray:
+        key = self.normalize(text)
+        vector = self._memo_get(key)
+        if vector is not None:
+            return vector
+        if self.max_wait_ms <= 0:
+            return self._encode_misses({key: text})[key]
+        
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((key, text, future))
+        return future.result()
+    
+    def encode_batch(self, texts: List[str]) -> np.ndarray:
+        keys = [self.normalize(text) for text in texts]
+        vectors = {}
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in misses:
+                continue
+            vector = self._memo_get(key)
+            if vector is None:
+                misses[key] = text
+            else:
+                vectors[key] = vector
+        if misses:
+            vectors.update(self._encode_misses(misses))
+        return np.vstack([vectors[key] for key in keys])
+    
+    def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
+        return self.encoder.similarity(vec1, vec2)
+    
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        """后台合并线程: 以第一条请求为起点收集窗口内的请求后批量编码"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            self._dispatch(batch)
+            if stop:
+                return
+    
+    def _dispatch(self, batch: List[Tuple[str, str, Future]]):
+        try:
+            vectors = self._encode_misses({key: text for key, text, _ in batch})
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for key, _, future in batch:
+            future.set_result(vectors[key])
+    
+    def close(self):
+        """停止后台合并线程"""
+        with self._worker_lock:
+            if self._worker is not None and self._worker.is_alive():
+                self._queue.put(None)
+                self._worker.join()
+            self._worker = None
+
 class SemanticCache:
-    """语义化缓存实现"""
+    """语义化缓存实现
+    
+    向量按槽位存放在连续的float32矩阵中并做L2归一化，每个槽位对应矩阵的一行，
+    相似度按余弦相似度计算，查询为一次矩阵-向量乘积加过期与墓碑掩码，不逐条调用encoder.similarity。
+    删除只清除位图并把槽位放入空闲链表供后续写入复用，为O(1)；空闲槽位过多时压缩矩阵。
+    传入vector_index时查询改走近似最近邻索引，索引以槽位号为ID
+    """
+    
+    # 向量矩阵的初始槽位数，容量不足时按倍数增长
+    INITIAL_CAPACITY = 64
+    GROWTH_FACTOR = 2
+    # 空闲槽位超过已分配槽位的该比例时压缩矩阵并重建索引
+    COMPACT_RATIO = 0.25
+    # 压缩时每次搬移的槽位数
+    COMPACT_CHUNK = 16384
+    # 与矩阵行一一对应、随矩阵扩容和压缩一起移动的槽位数组
+    SLOT_ARRAYS = ("_alive", "_expire_at", "_value_sizes", "_access_counts")
+    # 相似度统计时每块Gram矩阵的行数
+    STATS_BLOCK = 256
     
-    def __init__(self, encoder: SemanticEncoder, threshold: float = 0.85):
+    def __init__(self, encoder: SemanticEncoder, threshold: float = 0.85,
+                 vector_index: Optional[VectorIndex] = None, candidate_pool: int = 16,
+                 stats_sample_size: int = 1000):
         self.encoder = encoder
         self.threshold = threshold
         self.cache = {}
-        self.vector_cache = {}
-        self.index = []
-        self.vectors = []
+        # 槽位 -> 缓存键，空闲槽位为None；_slot_keys的长度即已分配槽位的上界
+        self._slot_keys: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._free_slots: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)  # 墓碑位图，False为空闲槽位
+        self._expire_at = np.empty(0, dtype=np.float64)  # 过期时间戳(秒)
+        # 值大小、访问次数与标签计数在写入/删除时增量维护，get_stats无需遍历条目
+        self._value_sizes = np.zeros(0, dtype=np.int64)  # 值的JSON序列化长度
+        self._access_counts = np.zeros(0, dtype=np.int64)
+        self._total_value_bytes = 0
+        self._total_access = 0
+        self._tag_counts: Dict[str, int] = {}
+        # 相似度分布统计的随机采样条目数
+        self.stats_sample_size = stats_sample_size
+        self._rng = np.random.default_rng()
+        self.vector_index = vector_index
+        # 索引检索时多取的候选数，用于跳过已过期的槽位
+        self.candidate_pool = candidate_pool
     
     def _generate_key(self, text: str) -> str:
         """生成语义键"""
@@ -114,6 +329,192 @@ class SemanticCache:
         text = re.sub(r'[^\w\s]', '', text.lower())
         return text
     
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """转为float32并L2归一化，零向量保持为零"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _resize(self, capacity: int, dim: int):
+        """把向量矩阵与各槽位数组调整为capacity个槽位，保留已分配的槽位"""
+        size = len(self._slot_keys)
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        if self._matrix is not None:
+            matrix[:size] = self._matrix[:size]
+        self._matrix = matrix
+        for name in self.SLOT_ARRAYS:
+            array = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            array[:size] = getattr(self, name)[:size]
+            setattr(self, name, array)
+    
+    def _ensure_capacity(self, slots: int, dim: int):
+        """按倍数扩容，保证至少有slots个槽位"""
+        if self._matrix is None:
+            self._resize(max(self.INITIAL_CAPACITY, slots), dim)
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(f"向量维度不一致: 期望 {self._matrix.shape[1]}, 实际 {dim}")
+        
+        capacity = self._matrix.shape[0]
+        if slots > capacity:
+            self._resize(max(slots, capacity * self.GROWTH_FACTOR), dim)
+    
+    def _put_vector(self, cache_key: str, vector: np.ndarray, expire_at: float):
+        """写入向量，已存在的键原地覆盖"""
+        self._put_vectors([cache_key], np.asarray(vector)[np.newaxis], expire_at)
+    
+    def _put_vectors(self, cache_keys: List[str], vectors: np.ndarray, expire_at: float):
+        """批量写入向量（键不重复）: 已存在的键原地覆盖，新键优先复用空闲槽位，索引一次加入"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(cache_keys), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+        
+        # 先扩容再分配槽位，维度不一致时不留下半写入的状态
+        new_keys = sum(1 for cache_key in cache_keys if cache_key not in self._slots)
+        appended = max(0, new_keys - len(self._free_slots))
+        self._ensure_capacity(len(self._slot_keys) + appended, vectors.shape[1])
+        
+        slots = np.empty(len(cache_keys), dtype=np.int64)
+        for i, cache_key in enumerate(cache_keys):
+            slot = self._slots.get(cache_key)
+            if slot is None:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                    self._slot_keys[slot] = cache_key
+                else:
+                    slot = len(self._slot_keys)
+                    self._slot_keys.append(cache_key)
+                self._slots[cache_key] = slot
+            slots[i] = slot
+        
+        self._matrix[slots] = vectors
+        self._alive[slots] = True
+        self._expire_at[slots] = expire_at
+        
+        if self.vector_index is not None:
+            self.vector_index.add(slots, vectors)
+            if self.vector_index.needs_rebuild:
+                self.rebuild_index()
+    
+    def _remove_slots(self, cache_keys: List[str]):
+        """释放一批键的槽位: 清除位图并放入空闲链表，每个键O(1)，矩阵不移动以免索引ID失效"""
+        if not cache_keys:
+            return
+        slots = [self._slots.pop(cache_key) for cache_key in cache_keys]
+        for slot in slots:
+            self._slot_keys[slot] = None
+        self._total_value_bytes -= int(self._value_sizes[slots].sum())
+        self._total_access -= int(self._access_counts[slots].sum())
+        for name in self.SLOT_ARRAYS:
+            getattr(self, name)[slots] = 0
+        self._free_slots.extend(slots)
+        
+        if self.vector_index is not None:
+            self.vector_index.remove(np.array(slots, dtype=np.int64))
+        # 空闲槽位由后续写入复用，只有缓存明显缩小时才需要压缩
+        if len(self._free_slots) > max(self.COMPACT_RATIO * len(self._slot_keys), self.INITIAL_CAPACITY) or \
+                (self.vector_index is not None and self.vector_index.needs_rebuild):
+            self.rebuild_index()
+    
+    def _live_slots(self) -> np.ndarray:
+        return np.flatnonzero(self._alive[:len(self._slot_keys)])
+    
+    def rebuild_index(self):
+        """压缩矩阵回收空闲槽位（容量过剩时一并收缩），并用全部有效向量重建近似索引"""
+        if self._free_slots:
+            live = self._live_slots()
+            size, old_size = len(live), len(self._slot_keys)
+            # live升序且live[i] >= i，可原地分块前移，临时内存不超过一块
+            for start in range(0, size, self.COMPACT_CHUNK):
+                end = min(start + self.COMPACT_CHUNK, size)
+                self._matrix[start:end] = self._matrix[live[start:end]]
+            for name in self.SLOT_ARRAYS:
+                array = getattr(self, name)
+                array[:size] = array[live]
+                array[size:old_size] = 0
+            self._slot_keys = [self._slot_keys[slot] for slot in live.tolist()]
+            self._slots = {cache_key: slot for slot, cache_key in enumerate(self._slot_keys)}
+            self._free_slots = []
+            
+            capacity = max(self.INITIAL_CAPACITY, size * self.GROWTH_FACTOR)
+            if self._matrix.shape[0] > capacity * self.GROWTH_FACTOR:
+                self._resize(capacity, self._matrix.shape[1])
+        
+        if self.vector_index is not None:
+            size = len(self._slot_keys)
+            self.vector_index.rebuild(np.arange(size), self._matrix[:size])
+    
+    @staticmethod
+    def _value_size(value: Any) -> int:
+        # 只用于统计，不可序列化的对象按str计长，不能导致写入失败
+        return len(json.dumps(value, ensure_ascii=False, default=str))
+    
+    def _count_tags(self, cache_item: Dict[str, Any], delta: int):
+        for tag in cache_item.get("metadata", {}).get("tags", []):
+            count = self._tag_counts.get(tag, 0) + delta
+            if count > 0:
+                self._tag_counts[tag] = count
+            else:
+                self._tag_counts.pop(tag, None)
+    
+    def _store_items(self, cache_keys: List[str], cache_items: List[Dict[str, Any]], sizes: List[int]):
+        """写入缓存条目（向量须已写入槽位），增量维护值大小、访问次数与标签计数"""
+        for cache_key, cache_item, size in zip(cache_keys, cache_items, sizes):
+            slot = self._slots[cache_key]
+            old_item = self.cache.get(cache_key)
+            if old_item is not None:
+                self._count_tags(old_item, -1)
+            self._total_value_bytes += size - int(self._value_sizes[slot])
+            self._total_access -= int(self._access_counts[slot])
+            self._value_sizes[slot] = size
+            self._access_counts[slot] = 0
+            self._count_tags(cache_item, 1)
+            self.cache[cache_key] = cache_item
+    
+    def _drop_items(self, cache_keys: List[str]):
+        """删除缓存条目: 释放槽位并扣减标签计数"""
+        self._remove_slots(cache_keys)
+        for cache_key in cache_keys:
+            self._count_tags(self.cache.pop(cache_key), -1)
+    
+    def _scores(self, query_vector: np.ndarray) -> np.ndarray:
+        """查询向量与所有已分配槽位的余弦相似度，空闲及过期的槽位置为-inf"""
+        size = len(self._slot_keys)
+        if not size:
+            return np.empty(0, dtype=np.float32)
+        scores = self._matrix[:size] @ self._normalize(query_vector)
+        scores[~self._alive[:size] | (self._expire_at[:size] <= time.time())] = -np.inf
+        return scores
+    
+    def _search(self, query_vector: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回未过期的最相似k个槽位(槽位号, 相似度)，按相似度降序"""
+        if self.vector_index is None:
+            scores = self._scores(query_vector)
+            if not scores.size:
+                return np.empty(0, dtype=np.int64), scores
+            if k == 1:
+                slots = np.array([np.argmax(scores)])
+            else:
+                slots = np.argpartition(scores, -k)[-k:] if scores.size > k else np.arange(scores.size)
+                slots = slots[np.argsort(scores[slots])[::-1]]
+            slots = slots[np.isfinite(scores[slots])]
+            return slots, scores[slots]
+        
+        slots, scores = self.vector_index.search(self._normalize(query_vector), k + self.candidate_pool)
+        live = self._alive[slots] & (self._expire_at[slots] > time.time())
+        return slots[live][:k], scores[live][:k]
+    
+    def _match(self, slot: int, similarity: float) -> Dict[str, Any]:
+        cache_item = self.cache[self._slot_keys[slot]]
+        return {
+            "value": cache_item["value"],
+            "original_text": cache_item["text"],
+            "similarity": float(similarity),
+            "metadata": cache_item["metadata"],
+            "access_count": cache_item["access_count"]
+        }
+    
     def set(self, text: str, value: Any, metadata: Dict = None, 
             ttl: int = 3600) -> bool:
         """设置语义缓存"""
@@ -121,27 +522,23 @@ class SemanticCache:
             processed_text = self._preprocess_text(text)
             cache_key = self._generate_key(processed_text)
             
-            # 编码文本向量
+            # 编码文本向量；值大小在写入向量前计算，序列化失败时不留下孤立的槽位
             vector = self.encoder.encode(processed_text)
+            size = self._value_size(value)
+            
+            now = datetime.now()
+            expire_at = now + timedelta(seconds=ttl)
+            self._put_vector(cache_key, vector, expire_at.timestamp())
             
-            cache_item = {
+            # 存储缓存
+            self._store_items([cache_key], [{
                 "value": value,
                 "text": processed_text,
-                "vector": vector.tolist(),
                 "metadata": metadata or {},
-                "created_at": datetime.now().isoformat(),
-                "expire_at": (datetime.now() + timedelta(seconds=ttl)).isoformat(),
+                "created_at": now.isoformat(),
+                "expire_at": expire_at.isoformat(),
                 "access_count": 0
-            }
-            
-            # 存储缓存
-            self.cache[cache_key] = cache_item
-            self.vector_cache[cache_key] = vector
-            
-            # 更新索引
-            if cache_key not in self.index:
-                self.index.append(cache_key)
-                self.vectors.append(vector)
+            }], [size])
             
             return True
             
@@ -149,6 +546,72 @@ class SemanticCache:
             logging.error(f"语义缓存设置错误: {e}")
             return False
     
+    def set_many(self, items: Dict[str, Any], metadata: Dict = None,
+                 ttl: int = 3600) -> int:
+        """批量设置语义缓存，一次encode_batch编码全部文本，返回写入数量"""
+        try:
+            # 预处理后相同的文本只保留最后一个值
+            processed = {}
+            for text, value in items.items():
+                processed[self._preprocess_text(text)] = value
+            if not processed:
+                return 0
+            
+            texts = list(processed)
+            vectors = self.encoder.encode_batch(texts)
+            cache_keys = [self._generate_key(text) for text in texts]
+            sizes = [self._value_size(processed[text]) for text in texts]
+            
+            now = datetime.now()
+            expire_at = now + timedelta(seconds=ttl)
+            self._put_vectors(cache_keys, vectors, expire_at.timestamp())
+            
+            self._store_items(cache_keys, [{
+                "value": processed[text],
+                "text": text,
+                "metadata": metadata or {},
+                "created_at": now.isoformat(),
+                "expire_at": expire_at.isoformat(),
+                "access_count": 0
+            } for text in texts], sizes)
+            
+            return len(texts)
+            
+        except Exception as e:
+            logging.error(f"语义缓存批量设置错误: {e}")
+            return 0
+    
+    def warm_from_jsonl(self, path: str, text_field: str = "prompt", value_field: str = "response",
+                        batch_size: int = 256, ttl: int = 3600) -> int:
+        """从JSONL导出预热缓存，每batch_size行批量编码一次，返回加载数量
+        
+        每行为一个JSON对象，text_field为提示词；缺少value_field时整行作为缓存值
+        """
+        loaded = 0
+        batch: Dict[str, Any] = {}
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.warning(f"跳过无效的第{line_no}行: {e}")
+                    continue
+                
+                text = record.get(text_field)
+                if not text:
+                    continue
+                batch[text] = record.get(value_field, record)
+                if len(batch) >= batch_size:
+                    loaded += self.set_many(batch, ttl=ttl)
+                    batch = {}
+        
+        if batch:
+            loaded += self.set_many(batch, ttl=ttl)
+        return loaded
+    
     def get(self, text: str, min_similarity: float = None) -> Optional[Dict[str, Any]]:
         """获取语义相似的缓存"""
         try:
@@ -156,35 +619,20 @@ class SemanticCache:
             query_vector = self.encoder.encode(processed_text)
             
             threshold = min_similarity or self.threshold
-            best_match = None
-            best_similarity = 0.0
             
             # 查找最相似的缓存
-            for cache_key, cached_vector in self.vector_cache.items():
-                similarity = self.encoder.similarity(query_vector, cached_vector)
-                
-                if similarity >= threshold and similarity > best_similarity:
-                    cache_item = self.cache[cache_key]
-                    
-                    # 检查是否过期
-                    expire_at = datetime.fromisoformat(cache_item["expire_at"])
-                    if datetime.now() > expire_at:
-                        continue
-                    
-                    best_match = {
-                        "value": cache_item["value"],
-                        "original_text": cache_item["text"],
-                        "similarity": similarity,
-                        "metadata": cache_item["metadata"],
-                        "access_count": cache_item["access_count"]
-                    }
-                    best_similarity = similarity
-            
-            if best_match:
-                # 更新访问统计
-                cache_key = self._generate_key(best_match["original_text"])
-                self.cache[cache_key]["access_count"] += 1
-                
+            slots, scores = self._search(query_vector, 1)
+            if not slots.size or scores[0] < threshold:
+                return None
+            
+            best_slot = int(slots[0])
+            best_match = self._match(best_slot, scores[0])
+            
+            # 更新访问统计
+            self.cache[self._slot_keys[best_slot]]["access_count"] += 1
+            self._access_counts[best_slot] += 1
+            self._total_access += 1
+            
             return best_match
             
         except Exception as e:
@@ -199,31 +647,10 @@ class SemanticCache:
             query_vector = self.encoder.encode(processed_text)
             
             threshold = min_similarity or (self.threshold * 0.8)
-            matches = []
             
-            for cache_key, cached_vector in self.vector_cache.items():
-                similarity = self.encoder.similarity(query_vector, cached_vector)
-                
-                if similarity >= threshold:
-                    cache_item = self.cache[cache_key]
-                    
-                    # 检查是否过期
-                    expire_at = datetime.fromisoformat(cache_item["expire_at"])
-                    if datetime.now() > expire_at:
-                        continue
-                    
-                    matches.append({
-                        "value": cache_item["value"],
-                        "original_text": cache_item["text"],
-                        "similarity": similarity,
-                        "metadata": cache_item["metadata"],
-                        "access_count": cache_item["access_count"]
-                    })
-            
-            # 按相似度排序
-            matches.sort(key=lambda x: x["similarity"], reverse=True)
-            
-            return matches[:limit]
+            # 结果已按相似度排序
+            slots, scores = self._search(query_vector, limit)
+            return [self._match(slot, score) for slot, score in zip(slots, scores) if score >= threshold]
             
         except Exception as e:
             logging.error(f"语义搜索错误: {e}")
@@ -236,15 +663,8 @@ class SemanticCache:
             cache_key = self._generate_key(processed_text)
             
             if cache_key in self.cache:
-                del self.cache[cache_key]
-                del self.vector_cache[cache_key]
-                
-                # 更新索引
-                if cache_key in self.index:
-                    idx = self.index.index(cache_key)
-                    del self.index[idx]
-                    del self.vectors[idx]
-                
+                # 释放槽位
+                self._drop_items([cache_key])
                 return True
             
             return False
@@ -256,37 +676,28 @@ class SemanticCache:
     def delete_by_tags(self, tags: List[str]) -> int:
         """按标签删除语义缓存"""
         try:
-            deleted_count = 0
-            keys_to_delete = []
-            
-            for cache_key, cache_item in self.cache.items():
-                item_tags = cache_item.get("metadata", {}).get("tags", [])
-                if any(tag in item_tags for tag in tags):
-                    keys_to_delete.append(cache_key)
+            tags = set(tags)
+            keys_to_delete = [
+                cache_key for cache_key, cache_item in self.cache.items()
+                if not tags.isdisjoint(cache_item.get("metadata", {}).get("tags", []))
+            ]
             
-            for cache_key in keys_to_delete:
-                self.delete(self.cache[cache_key]["text"])
-                deleted_count += 1
+            self._drop_items(keys_to_delete)
             
-            return deleted_count
+            return len(keys_to_delete)
             
         except Exception as e:
             logging.error(f"语义标签删除错误: {e}")
             return 0
     
     def clear_expired(self) -> int:
-        """清理过期缓存"""
+        """清理过期缓存: 一次扫描过期数组，批量释放槽位"""
         try:
-            now = datetime.now()
-            expired_keys = []
+            size = len(self._slot_keys)
+            expired_slots = np.flatnonzero(self._alive[:size] & (self._expire_at[:size] <= time.time()))
+            expired_keys = [self._slot_keys[slot] for slot in expired_slots.tolist()]
             
-            for cache_key, cache_item in self.cache.items():
-                expire_at = datetime.fromisoformat(cache_item["expire_at"])
-                if now > expire_at:
-                    expired_keys.append(cache_key)
-            
-            for cache_key in expired_keys:
-                self.delete(self.cache[cache_key]["text"])
+            self._drop_items(expired_keys)
             
             return len(expired_keys)
             
@@ -294,55 +705,76 @@ class SemanticCache:
             logging.error(f"语义缓存清理错误: {e}")
             return 0
     
-    def get_stats(self) -> Dict[str, Any]:
-        """获取语义缓存统计"""
+    def _similarity_stats(self, sample_size: int) -> Dict[str, Any]:
+        """随机采样sample_size条，分块计算Gram矩阵上三角得到两两相似度分布"""
+        live = self._live_slots()
+        if len(live) > sample_size:
+            live = np.sort(self._rng.choice(live, sample_size, replace=False))
+        stats = {"average_similarity": 0, "max_similarity": 0, "min_similarity": 0,
+                 "p50_similarity": 0, "p95_similarity": 0, "above_threshold_ratio": 0,
+                 "sample_size": 0, "sampled_pairs": 0}
+        if len(live) < 2:
+            return stats
+        
+        # 向量已归一化，内积即余弦相似度
+        vectors = self._matrix[live]
+        count = len(vectors)
+        blocks = []
+        for start in range(0, count - 1, self.STATS_BLOCK):
+            end = min(start + self.STATS_BLOCK, count)
+            gram = vectors[start:end] @ vectors[start:].T
+            upper = np.arange(start, count)[np.newaxis, :] > np.arange(start, end)[:, np.newaxis]
+            blocks.append(gram[upper])
+        similarities = np.concatenate(blocks).astype(np.float64)
+        
+        p50, p95 = np.percentile(similarities, [50, 95])
+        stats.update({
+            "average_similarity": float(similarities.mean()),
+            "max_similarity": float(similarities.max()),
+            "min_similarity": float(similarities.min()),
+            "p50_similarity": float(p50),
+            "p95_similarity": float(p95),
+            # 超过命中阈值的条目对比例，偏高说明缓存中近似重复较多
+            "above_threshold_ratio": float(np.mean(similarities >= self.threshold)),
+            "sample_size": count,
+            "sampled_pairs": len(similarities)
+        })
+        return stats
+    
+    def get_stats(self, sample_size: Optional[int] = None) -> Dict[str, Any]:
+        """获取语义缓存统计
+        
+        总量与计数为增量维护的O(1)值，最大/最小值为一次向量化扫描，
+        相似度分布只在随机采样的sample_size条上计算，为0时跳过
+        """
         try:
             total_items = len(self.cache)
             
             if total_items == 0:
                 return {"total_items": 0}
             
-            # 计算统计信息
-            access_counts = [item["access_count"] for item in self.cache.values()]
-            data_sizes = [len(json.dumps(item["value"], ensure_ascii=False)) 
-                         for item in self.cache.values()]
-            
-            # 标签统计
-            tag_counts = {}
-            for item in self.cache.values():
-                tags = item.get("metadata", {}).get("tags", [])
-                for tag in tags:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-            
-            # 相似度统计
-            similarities = []
-            if total_items > 1:
-                for i, (key1, vec1) in enumerate(self.vector_cache.items()):
-                    for j, (key2, vec2) in enumerate(self.vector_cache.items()):
-                        if i < j:
-                            sim = self.encoder.similarity(vec1, vec2)
-                            similarities.append(sim)
+            size = len(self._slot_keys)
+            alive = self._alive[:size]
+            sizes = self._value_sizes[:size]
+            access_counts = self._access_counts[:size]
+            sample_size = self.stats_sample_size if sample_size is None else sample_size
             
             return {
                 "total_items": total_items,
-                "total_memory_bytes": sum(data_sizes),
+                "total_memory_bytes": self._total_value_bytes,
                 "access_stats": {
-                    "total_access": sum(access_counts),
-                    "average_access": sum(access_counts) / len(access_counts),
-                    "max_access": max(access_counts),
-                    "min_access": min(access_counts)
+                    "total_access": self._total_access,
+                    "average_access": self._total_access / total_items,
+                    "max_access": int(access_counts.max()),
+                    "min_access": int(access_counts.min(where=alive, initial=np.iinfo(np.int64).max))
                 },
                 "size_stats": {
-                    "average_size": sum(data_sizes) / len(data_sizes),
-                    "max_size": max(data_sizes),
-                    "min_size": min(data_sizes)
+                    "average_size": self._total_value_bytes / total_items,
+                    "max_size": int(sizes.max()),
+                    "min_size": int(sizes.min(where=alive, initial=np.iinfo(np.int64).max))
                 },
-                "top_tags": sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10],
-                "similarity_stats": {
-                    "average_similarity": sum(similarities) / len(similarities) if similarities else 0,
-                    "max_similarity": max(similarities) if similarities else 0,
-                    "min_similarity": min(similarities) if similarities else 0
-                }
+                "top_tags": sorted(self._tag_counts.items(), key=lambda x: x[1], reverse=True)[:10],
+                "similarity_stats": self._similarity_stats(sample_size)
             }
             
         except Exception as e:
@@ -386,6 +818,288 @@ class SemanticCacheWithPersistence:
         """获取缓存"""
         return self.semantic_cache.get(text, **kwargs)
 
+class _LookupEncoder(SemanticEncoder):
+    """基准测试用编码器: 按文本返回预先生成的向量"""
+    
+    def __init__(self, vectors: Dict[str, np.ndarray]):
+        self.vectors = vectors
+    
+    def encode(self, text: str) -> np.ndarray:
+        return self.vectors[text]
+    
+    def similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
+        return float(cosine_similarity([vec1], [vec2])[0][0])
+
+def benchmark_lookup(sizes: Tuple[int, ...] = (1_000, 10_000, 100_000, 1_000_000), dim: int = 384,
+                     queries: int = 20, legacy_max_size: int = 10_000, seed: int = 42) -> List[Dict[str, Any]]:
+    """比较逐条相似度循环与矩阵化查询在不同缓存规模下的单次get耗时"""
+    rng = np.random.default_rng(seed)
+    results = []
+    
+    print(f"{'条目数':>10} {'矩阵化get(ms)':>14} {'逐条循环(ms)':>14} {'矩阵内存(MB)':>14}")
+    for size in sizes:
+        query_vectors = {f"q{i}": rng.standard_normal(dim).astype(np.float32) for i in range(queries)}
+        cache = SemanticCache(_LookupEncoder(query_vectors), threshold=0.5)
+        expire_at = time.time() + 3600
+        for start in range(0, size, 10_000):
+            block = rng.standard_normal((min(10_000, size - start), dim)).astype(np.float32)
+            for offset, vector in enumerate(block):
+                cache_key = f"k{start + offset}"
+                cache._put_vector(cache_key, vector, expire_at)
+                cache.cache[cache_key] = {"value": None, "text": cache_key, "metadata": {},
+                                          "expire_at": "", "access_count": 0}
+        
+        start = time.perf_counter()
+        for text in query_vectors:
+            cache.get(text, min_similarity=0.5)
+        vectorized_ms = (time.perf_counter() - start) / queries * 1000
+        
+        # 原实现: 逐条调用encoder.similarity并解析过期时间
+        legacy_ms = None
+        if size <= legacy_max_size:
+            expire_iso = (datetime.now() + timedelta(hours=1)).isoformat()
+            rows = cache._matrix[:size]
+            start = time.perf_counter()
+            for text in list(query_vectors)[:3]:
+                query = query_vectors[text]
+                best = 0.0
+                for vector in rows:
+                    similarity = cache.encoder.similarity(query, vector)
+                    if similarity >= 0.5 and similarity > best and \
+                            datetime.now() <= datetime.fromisoformat(expire_iso):
+                        best = similarity
+            legacy_ms = (time.perf_counter() - start) / 3 * 1000
+        
+        matrix_mb = cache._matrix.nbytes / 1024 / 1024
+        results.append({"size": size, "vectorized_ms": round(vectorized_ms, 3),
+                        "legacy_ms": round(legacy_ms, 1) if legacy_ms is not None else None,
+                        "matrix_mb": round(matrix_mb, 1)})
+        legacy_text = f"{legacy_ms:>14.1f}" if legacy_ms is not None else f"{'-':>14}"
+        print(f"{size:>10,} {vectorized_ms:>14.3f} {legacy_text} {matrix_mb:>14.1f}")
+        del cache
+    
+    return results
+
+def _clustered_vectors(rng: np.random.Generator, size: int, dim: int, clusters: int) -> np.ndarray:
+    """生成带聚类结构的归一化向量，模拟主题相近的提示词"""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=size)]
+    vectors += 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def benchmark_ann(size: int = 100_000, dim: int = 128, queries: int = 200, k: int = 10,
+                  seed: int = 42) -> List[Dict[str, Any]]:
+    """比较各索引相对精确搜索的recall@k与单次查询延迟"""
+    rng = np.random.default_rng(seed)
+    vectors = _clustered_vectors(rng, size, dim, clusters=max(1, size // 100))
+    # 查询为已有条目加扰动，相当于改写过的提示词
+    query_vectors = vectors[rng.integers(size, size=queries)] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+    
+    cache = SemanticCache(_LookupEncoder({}))
+    expire_at = time.time() + 3600
+    for row, vector in enumerate(vectors):
+        cache._put_vector(f"k{row}", vector, expire_at)
+    
+    def run() -> Tuple[List[np.ndarray], float]:
+        start = time.perf_counter()
+        found = [cache._search(query, k)[0] for query in query_vectors]
+        return found, (time.perf_counter() - start) / queries * 1000
+    
+    exact, exact_ms = run()
+    results = [{"index": "exact", "param": "-", "recall": 1.0, "top1": 1.0,
+                "latency_ms": round(exact_ms, 3), "build_s": 0.0}]
+    
+    backends: List[Tuple[str, VectorIndex, str, List[int]]] = [("ivf-flat", IVFFlatIndex(), "nprobe", [1, 4, 16, 64])]
+    if HAS_HNSWLIB:
+        backends.append(("hnswlib", HNSWIndex(), "ef_search", [16, 64, 256]))
+    if HAS_FAISS:
+        backends.append(("faiss-ivf", FaissIVFIndex(), "nprobe", [1, 4, 16, 64]))
+    
+    print(f"{size:,}条 {dim}维, recall@{k}, {queries}次查询")
+    print(f"{'索引':<10} {'参数':>14} {'recall':>8} {'top1':>8} {'延迟(ms)':>10} {'构建(s)':>9}")
+    print(f"{'exact':<10} {'-':>14} {1.0:>8.3f} {1.0:>8.3f} {exact_ms:>10.3f} {'-':>9}")
+    for name, index, param, values in backends:
+        cache.vector_index = index
+        start = time.perf_counter()
+        cache.rebuild_index()
+        build_s = time.perf_counter() - start
+        
+        for value in values:
+            setattr(index, param, value)
+            found, latency_ms = run()
+            recall = np.mean([len(np.intersect1d(a, b)) / k for a, b in zip(found, exact)])
+            # get只取最相似的一条，单独统计top-1命中
+            top1 = np.mean([a.size > 0 and a[0] == b[0] for a, b in zip(found, exact)])
+            results.append({"index": name, "param": f"{param}={value}", "recall": round(float(recall), 4),
+                            "top1": round(float(top1), 4), "latency_ms": round(latency_ms, 3),
+                            "build_s": round(build_s, 2)})
+            print(f"{name:<10} {param + '=' + str(value):>14} {recall:>8.3f} {top1:>8.3f} "
+                  f"{latency_ms:>10.3f} {build_s:>9.2f}")
+    
+    return results
+
+def _filled_cache(size: int, dim: int, rng: np.random.Generator, expired_ratio: float) -> SemanticCache:
+    """基准测试用: 写入size条随机向量，其中expired_ratio比例已过期"""
+    cache = SemanticCache(_LookupEncoder({}))
+    now = time.time()
+    for start in range(0, size, 10_000):
+        count = min(10_000, size - start)
+        cache_keys = [f"k{start + offset}" for offset in range(count)]
+        vectors = rng.standard_normal((count, dim)).astype(np.float32)
+        expired = rng.random(count) < expired_ratio
+        for mask, expire_at in ((expired, now - 1), (~expired, now + 3600)):
+            cache._put_vectors([key for key, hit in zip(cache_keys, mask) if hit], vectors[mask], expire_at)
+        for cache_key in cache_keys:
+            cache.cache[cache_key] = {"value": None, "text": cache_key, "metadata": {},
+                                      "expire_at": "", "access_count": 0}
+    return cache
+
+def benchmark_delete(sizes: Tuple[int, ...] = (10_000, 100_000, 1_000_000), dim: int = 64,
+                     expired_ratio: float = 0.5, legacy_max_size: int = 20_000,
+                     churn_ops: int = 20_000, seed: int = 42) -> List[Dict[str, Any]]:
+    """比较原列表存储(list.index + del)与槽位存储的过期清理耗时，并测稳定规模下增删交替的开销"""
+    rng = np.random.default_rng(seed)
+    results = []
+    
+    print(f"{'条目数':>10} {'槽位清理(ms)':>13} {'列表清理(ms)':>13} {'增删交替(us/次)':>16} {'容量变化':>12}")
+    for size in sizes:
+        cache = _filled_cache(size, dim, rng, expired_ratio)
+        start = time.perf_counter()
+        removed = cache.clear_expired()
+        slot_ms = (time.perf_counter() - start) * 1000
+        
+        # 原实现: 每删除一条都要在键列表中线性查找并搬移向量列表
+        legacy_ms = None
+        if size <= legacy_max_size:
+            index = [f"k{i}" for i in range(size)]
+            vectors = list(rng.standard_normal((size, dim)).astype(np.float32))
+            expired = [key for key in index if rng.random() < expired_ratio]
+            start = time.perf_counter()
+            for cache_key in expired:
+                idx = index.index(cache_key)
+                del index[idx]
+                del vectors[idx]
+            legacy_ms = (time.perf_counter() - start) * 1000
+        
+        # 稳定规模下删一条写一条，新写入复用空闲槽位
+        capacity_before = cache._matrix.shape[0]
+        live_keys = list(cache._slots)
+        vectors = rng.standard_normal((churn_ops, dim)).astype(np.float32)
+        expire_at = time.time() + 3600
+        start = time.perf_counter()
+        for i in range(churn_ops):
+            cache._remove_slots([live_keys[i % len(live_keys)]])
+            live_keys[i % len(live_keys)] = f"c{i}"
+            cache._put_vector(f"c{i}", vectors[i], expire_at)
+        churn_us = (time.perf_counter() - start) / churn_ops * 1e6
+        capacity = f"{capacity_before}->{cache._matrix.shape[0]}"
+        
+        results.append({"size": size, "removed": removed, "slot_clear_ms": round(slot_ms, 2),
+                        "legacy_clear_ms": round(legacy_ms, 1) if legacy_ms is not None else None,
+                        "churn_us": round(churn_us, 2), "capacity": capacity})
+        legacy_text = f"{legacy_ms:>13.1f}" if legacy_ms is not None else f"{'-':>13}"
+        print(f"{size:>10,} {slot_ms:>13.2f} {legacy_text} {churn_us:>16.2f} {capacity:>12}")
+        del cache
+    
+    return results
+
+def benchmark_stats(sizes: Tuple[int, ...] = (1_000, 5_000, 50_000), dim: int = 384,
+                    sample_size: int = 1000, exact_max_size: int = 5_000, legacy_pairs: int = 20_000,
+                    seed: int = 42) -> List[Dict[str, Any]]:
+    """比较原两两encoder.similarity循环(按实测速率估算)与采样统计的get_stats耗时及平均相似度误差"""
+    rng = np.random.default_rng(seed)
+    tags = [f"tag{i}" for i in range(20)]
+    
+    # 原实现每对条目调用一次encoder.similarity，先实测单次调用的速率
+    encoder = _LookupEncoder({})
+    vectors = rng.standard_normal((2, dim)).astype(np.float32)
+    start = time.perf_counter()
+    for _ in range(legacy_pairs // 10):
+        encoder.similarity(vectors[0], vectors[1])
+    pairs_per_sec = legacy_pairs // 10 / (time.perf_counter() - start)
+    
+    results = []
+    print(f"{'条目数':>10} {'get_stats(ms)':>14} {'原实现估算(s)':>14} {'采样平均相似度':>14} {'全量平均相似度':>14}")
+    for size in sizes:
+        vectors = _clustered_vectors(rng, size, dim, clusters=max(1, size // 50))
+        encoder.vectors = {f"k{i}": vector for i, vector in enumerate(vectors)}
+        cache = SemanticCache(encoder, stats_sample_size=sample_size)
+        for t, tag in enumerate(tags):
+            cache.set_many({f"k{i}": {"response": "x" * int(rng.integers(10, 2000))}
+                            for i in range(t, size, len(tags))}, metadata={"tags": [tag]})
+        
+        stats_ms = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            stats = cache.get_stats()
+            stats_ms = min(stats_ms, (time.perf_counter() - start) * 1000)
+        legacy_s = size * (size - 1) / 2 / pairs_per_sec
+        
+        sampled_mean = stats["similarity_stats"]["average_similarity"]
+        exact_mean = cache._similarity_stats(size)["average_similarity"] if size <= exact_max_size else None
+        results.append({"size": size, "stats_ms": round(stats_ms, 2), "legacy_estimated_s": round(legacy_s, 1),
+                        "sampled_mean": round(sampled_mean, 4),
+                        "exact_mean": round(exact_mean, 4) if exact_mean is not None else None})
+        exact_text = f"{exact_mean:>14.4f}" if exact_mean is not None else f"{'-':>14}"
+        print(f"{size:>10,} {stats_ms:>14.2f} {legacy_s:>14.1f} {sampled_mean:>14.4f} {exact_text}")
+        del cache
+    
+    return results
+
+def _sample_prompts(count: int, seed: int = 42) -> List[str]:
+    """生成长度不一且互不重复的英文提示词"""
+    rng = np.random.default_rng(seed)
+    subjects = ["python performance", "redis caching", "vector search", "prompt templates",
+                "token pricing", "database indexing", "async io", "semantic similarity"]
+    templates = ["How do I improve {s} for project {n}?", "Explain {s} in simple terms for beginner #{n}.",
+                 "What are the trade-offs of {s} when serving {n} requests per second in production?",
+                 "Give me a step-by-step checklist for debugging {s} issues, with examples for case {n}."]
+    return [templates[rng.integers(len(templates))].format(s=subjects[rng.integers(len(subjects))], n=i)
+            for i in range(count)]
+
+def benchmark_encoding(encoder: Optional[SemanticEncoder] = None,
+                       batch_sizes: Tuple[int, ...] = (1, 8, 32, 128), num_texts: int = 512,
+                       threads: int = 16) -> Dict[str, Any]:
+    """比较不同批大小的编码吞吐，以及并发单条请求经BatchingEncoder合并、记忆命中后的吞吐"""
+    encoder = encoder or TransformerSemanticEncoder()
+    texts = _sample_prompts(num_texts)
+    encoder.encode_batch(texts[:8])  # 预热: 加载模型或拟合TF-IDF
+    results: Dict[str, Any] = {"encoder": type(encoder).__name__, "batch_sizes": []}
+    model_batch_size = getattr(encoder, "batch_size", None)
+    
+    print(f"{type(encoder).__name__}, {num_texts}条文本")
+    for batch_size in batch_sizes:
+        if model_batch_size is not None:
+            encoder.batch_size = batch_size
+        start = time.perf_counter()
+        for offset in range(0, num_texts, batch_size):
+            encoder.encode_batch(texts[offset:offset + batch_size])
+        texts_per_sec = num_texts / (time.perf_counter() - start)
+        results["batch_sizes"].append({"batch_size": batch_size, "texts_per_sec": round(texts_per_sec, 1)})
+        print(f"  encode_batch 批大小 {batch_size:>4}: {texts_per_sec:>10.1f} 条/秒")
+    if model_batch_size is not None:
+        encoder.batch_size = model_batch_size
+    
+    batching = BatchingEncoder(encoder, max_batch_size=32, max_wait_ms=5.0)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(batching.encode, texts))
+    concurrent_tps = num_texts / (time.perf_counter() - start)
+    avg_batch = batching.stats["batched_texts"] / max(1, batching.stats["batches"])
+    
+    start = time.perf_counter()
+    for text in texts:
+        batching.encode(text)
+    memo_tps = num_texts / (time.perf_counter() - start)
+    batching.close()
+    
+    results["micro_batched"] = {"threads": threads, "texts_per_sec": round(concurrent_tps, 1),
+                                "average_batch": round(avg_batch, 1)}
+    results["memo_hit_texts_per_sec"] = round(memo_tps, 1)
+    print(f"  {threads}线程并发encode经合并: {concurrent_tps:>10.1f} 条/秒 (平均批大小 {avg_batch:.1f})")
+    print(f"  记忆命中: {memo_tps:>10.1f} 条/秒")
+    return results
+
 # 使用示例
 if __name__ == "__main__":
     # 使用TF-IDF编码器
@@ -462,4 +1176,20 @@ if __name__ == "__main__":
             
     except ImportError:
         print("\n注意：需要安装sentence-transformers库来使用Transformer编码器")
-        print("pip install sentence-transformers")
\ No newline at end of file
+        print("pip install sentence-transformers")
+    
+    # 查询性能基准: python 16_semantic_cache.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_lookup()
+        print("\n近似最近邻索引")
+        benchmark_ann()
+        print("\n删除与过期清理")
+        benchmark_delete()
+        print("\nget_stats统计")
+        benchmark_stats()
+        print("\n批量编码吞吐")
+        benchmark_encoding(tfidf_encoder)
+        try:
+            benchmark_encoding()
+        except Exception as e:
+            print(f"Transformer编码基准跳过: {e}")
@@ -6,15 +6,17 @@
 
 import json
 import logging
-from typing import Any, Optional, Dict, List, Union, Tuple
+from typing import Any, Optional, Dict, List, Union, Tuple, Callable
 from datetime import datetime, timedelta
 from enum import Enum
 import threading
 import time
+import asyncio
+import inspect
 from dataclasses import dataclass, asdict
 
 # 导入所有缓存实现
-from memory_cache import MemoryCache, AdvancedMemoryCache
+from memory_cache import MemoryCache, AdvancedMemoryCache, SingleFlight
 from sqlite_cache import SQLiteCache, AdvancedSQLiteCache
 from mysql_cache import MySQLCache, MySQLCacheCluster
 from redis_cache import RedisCache, RedisCacheAdvanced
@@ -95,6 +97,7 @@ class UnifiedCacheManager:
             "errors": 0
         }
         self._lock = threading.RLock()
+        self._flight = SingleFlight()
         self._init_caches()
         self._init_strategy()
     
@@ -205,6 +208,38 @@ class UnifiedCacheManager:
             self.metrics["cache_misses"] += 1
             return None
     
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值，逐层只查询仍未命中的键，命中的值批量回写到更高层级"""
+        with self._lock:
+            remaining = list(dict.fromkeys(keys))
+            self.metrics["total_requests"] += len(remaining)
+            results = {}
+            
+            for level in self.strategy.read_levels:
+                if not remaining:
+                    break
+                if level not in self.caches:
+                    continue
+                
+                try:
+                    found = self.caches[level].get_many(remaining)
+                except Exception as e:
+                    logging.error(f"从 {level.value} 批量获取缓存错误: {e}")
+                    self.metrics["errors"] += 1
+                    continue
+                
+                if found:
+                    self.metrics["cache_hits"] += len(found)
+                    self.metrics["hit_by_level"][level.value] += len(found)
+                    results.update(found)
+                    
+                    # 回写到更高层级
+                    self._write_up_many(found, level)
+                    remaining = [key for key in remaining if key not in found]
+            
+            self.metrics["cache_misses"] += len(remaining)
+            return results
+    
     def set(self, key: str, value: Any, ttl: int = 3600, 
             tags: List[str] = None, metadata: Dict = None) -> bool:
         """设置缓存值"""
@@ -230,6 +265,83 @@ class UnifiedCacheManager:
             
             return success
     
+    def set_many(self, items: Dict[str, Any], ttl: int = 3600,
+                 tags: List[str] = None, metadata: Dict = None) -> int:
+        """批量设置缓存值，按写入层级分组后每层一次批量写入，返回写入成功的键数"""
+        with self._lock:
+            groups: Dict[CacheLevel, Dict[str, Any]] = {}
+            for key, value in items.items():
+                if not self.strategy.should_cache(key, value):
+                    continue
+                for level in self.strategy.select_write_levels(key, value):
+                    if level in self.caches:
+                        groups.setdefault(level, {})[key] = value
+            
+            written = set()
+            for level, level_items in groups.items():
+                try:
+                    if self._set_many_on(level, level_items, ttl, tags, metadata):
+                        self.metrics["write_by_level"][level.value] += len(level_items)
+                        written.update(level_items)
+                except Exception as e:
+                    logging.error(f"批量写入 {level.value} 缓存错误: {e}")
+                    self.metrics["errors"] += 1
+            
+            return len(written)
+    
+    def _set_many_on(self, level: CacheLevel, items: Dict[str, Any], ttl: int = 3600,
+                     tags: List[str] = None, metadata: Dict = None) -> bool:
+        """按各层级的批量接口写入"""
+        cache = self.caches[level]
+        if level == CacheLevel.L1_MEMORY:
+            # 内存层的TTL由其分级策略决定
+            cache.set_many(items)
+            return True
+        if level == CacheLevel.L2_SQLITE:
+            return cache.set_many(items, ttl=ttl, tags=tags) > 0
+        return cache.set_many(items, ttl=ttl, tags=tags, metadata=metadata) > 0
+    
+    def get_or_compute(self, key: str, loader: Callable[[], Any], ttl: int = 3600,
+                       tags: List[str] = None, metadata: Dict = None,
+                       use_semantic: bool = False) -> Any:
+        """获取缓存值，未命中时同一键只调用一次loader（如LLM请求），并发请求共享结果"""
+        value = self.get(key, use_semantic=use_semantic)
+        if value is not None:
+            return value
+        
+        def load():
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl=ttl, tags=tags, metadata=metadata)
+            return value
+        
+        return self._flight.do(key, load)
+    
+    async def aget_or_compute(self, key: str, loader: Callable[[], Any], ttl: int = 3600,
+                              tags: List[str] = None, metadata: Dict = None,
+                              use_semantic: bool = False) -> Any:
+        """get_or_compute的asyncio版本，缓存读写与同步loader在线程池中执行，避免阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        value = await loop.run_in_executor(None, lambda: self.get(key, use_semantic=use_semantic))
+        if value is not None:
+            return value
+        
+        async def load():
+            # 同步loader放到线程池执行，不阻塞事件循环
+            if inspect.iscoroutinefunction(loader):
+                value = await loader()
+            else:
+                value = await loop.run_in_executor(None, loader)
+                if inspect.isawaitable(value):
+                    value = await value
+            if value is not None:
+                await loop.run_in_executor(
+                    None, lambda: self.set(key, value, ttl=ttl, tags=tags, metadata=metadata)
+                )
+            return value
+        
+        return await self._flight.do_async(key, load)
+    
     def delete(self, key: str, levels: List[CacheLevel] = None) -> int:
         """删除缓存"""
         with self._lock:
@@ -247,6 +359,21 @@ class UnifiedCacheManager:
             
             return deleted_count
     
+    def delete_many(self, keys: List[str], levels: List[CacheLevel] = None) -> int:
+        """批量删除缓存，返回各层级删除数量之和"""
+        with self._lock:
+            deleted_count = 0
+            target_levels = levels or self.strategy.read_levels
+            
+            for level in target_levels:
+                if level in self.caches:
+                    try:
+                        deleted_count += self.caches[level].delete_many(keys)
+                    except Exception as e:
+                        logging.error(f"从 {level.value} 批量删除缓存错误: {e}")
+            
+            return deleted_count
+    
     def delete_by_tags(self, tags: List[str], 
                       levels: List[CacheLevel] = None) -> int:
         """按标签删除缓存"""
@@ -284,6 +411,7 @@ class UnifiedCacheManager:
         with self._lock:
             stats = {
                 "overall": self.metrics,
+                "single_flight": self._flight.get_stats(),
                 "by_level": {}
             }
             
@@ -298,6 +426,10 @@ class UnifiedCacheManager:
     
     def _write_up(self, key: str, value: Any, from_level: CacheLevel):
         """向上级缓存回写"""
+        self._write_up_many({key: value}, from_level)
+    
+    def _write_up_many(self, items: Dict[str, Any], from_level: CacheLevel):
+        """向上级缓存批量回写，每个层级一次批量写入"""
         try:
             write_levels = self.strategy.write_levels
             from_index = write_levels.index(from_level) if from_level in write_levels else -1
@@ -305,7 +437,7 @@ class UnifiedCacheManager:
             if from_index >= 0:
                 for level in write_levels[:from_index]:
                     if level in self.caches:
-                        self.caches[level].set(key, value, ttl=3600)
+                        self._set_many_on(level, items, ttl=3600)
                         
         except Exception as e:
             logging.error(f"向上级缓存回写错误: {e}")
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+缓存值编解码层
+为持久化缓存提供可插拔的序列化(JSON/pickle/msgpack)与压缩(zlib/lzma)，
+编码结果的首字节记录所用格式，并兼容读取旧的JSON文本数据
+"""
+
+import io
+import json
+import lzma
+import pickle
+import sys
+import time
+import tracemalloc
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# 头字节: 最高位固定为1，bit3-5为压缩算法，bit0-2为序列化格式
+# 旧数据是UTF-8的JSON文本，首字节必然是ASCII(<0x80)，据此区分
+HEADER_FLAG = 0x80
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+def _pickle_dumps(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+# 名称 -> (编号, 序列化, 反序列化)
+SERIALIZERS: Dict[str, Tuple[int, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (1, _json_dumps, json.loads),
+    # pickle只应用于可信的存储，反序列化不可信数据存在代码执行风险
+    "pickle": (2, _pickle_dumps, pickle.loads),
+}
+
+if HAS_MSGPACK:
+    SERIALIZERS["msgpack"] = (
+        3,
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda data: msgpack.unpackb(data, raw=False),
+    )
+
+# 名称 -> (编号, 压缩, 解压)
+COMPRESSORS: Dict[str, Tuple[int, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (0, None, None),
+    "zlib": (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (2, lambda data: lzma.compress(data, preset=1), lzma.decompress),
+}
+
+# 流式压缩: 名称 -> 压缩器工厂；编号 -> 解压器工厂，输出格式与上表一次性压缩一致
+_STREAM_COMPRESSORS: Dict[str, Callable[[], Any]] = {
+    "zlib": lambda: zlib.compressobj(6),
+    "lzma": lambda: lzma.LZMACompressor(preset=1),
+}
+_STREAM_DECOMPRESSORS: Dict[int, Callable[[], Any]] = {
+    1: zlib.decompressobj,
+    2: lzma.LZMADecompressor,
+}
+
+# 流式读写的分块大小
+STREAM_CHUNK_SIZE = 256 * 1024
+
+_SERIALIZERS_BY_ID = {codec_id: (name, loads) for name, (codec_id, _, loads) in SERIALIZERS.items()}
+_COMPRESSORS_BY_ID = {codec_id: (name, decompress) for name, (codec_id, _, decompress) in COMPRESSORS.items()}
+
+def iter_chunks(payload: bytes, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """把已序列化的数据按块切分，供流式压缩与上传"""
+    view = memoryview(payload)
+    for offset in range(0, len(view), chunk_size):
+        yield bytes(view[offset:offset + chunk_size])
+
+class _StreamReader(io.RawIOBase):
+    """按块读取底层文件并增量解压的只读流"""
+
+    def __init__(self, fileobj: BinaryIO, decompressor: Any = None, prefix: bytes = b"",
+                 chunk_size: int = STREAM_CHUNK_SIZE):
+        self._fileobj = fileobj
+        self._decompressor = decompressor
+        self._chunk_size = chunk_size
+        self._pending = memoryview(prefix)
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_block(self) -> bytes:
+        """读取下一块，解压输出不超过chunk_size，避免高压缩比数据一次展开"""
+        decompressor = self._decompressor
+        if decompressor is None:
+            data = self._fileobj.read(self._chunk_size)
+            self._eof = not data
+            return data
+
+        if decompressor.eof:
+            self._eof = True
+            return b""
+        # zlib未消费的输入留在unconsumed_tail，lzma则缓存在内部直到needs_input
+        if getattr(decompressor, "unconsumed_tail", b""):
+            data = decompressor.unconsumed_tail
+        elif getattr(decompressor, "needs_input", True):
+            data = self._fileobj.read(self._chunk_size)
+            if not data:
+                self._eof = True
+                return decompressor.flush() if hasattr(decompressor, "flush") else b""
+        else:
+            data = b""
+        return decompressor.decompress(data, self._chunk_size)
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._eof:
+            self._pending = memoryview(self._next_block())
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+class ValueCodec:
+    """缓存值编解码器
+
+    解码只接受allowed_serializers中的格式（默认仅为配置的serializer），头字节指向其他格式时拒绝，
+    防止能写入存储的一方伪造pickle数据执行代码；pickle必须显式传入allow_pickle=True。
+    无头字节的旧JSON文本始终可读
+    """
+
+    def __init__(self, serializer: str = "json", compression: str = "zlib",
+                 compress_threshold: int = 1024,
+                 allowed_serializers: Optional[Iterable[str]] = None, allow_pickle: bool = False):
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"不支持的序列化格式: {serializer}")
+        if compression not in COMPRESSORS:
+            raise ValueError(f"不支持的压缩算法: {compression}")
+
+        allowed = {serializer} | set(allowed_serializers or ())
+        unknown = allowed - set(SERIALIZERS)
+        if unknown:
+            raise ValueError(f"不支持的序列化格式: {', '.join(sorted(unknown))}")
+        if "pickle" in allowed and not allow_pickle:
+            raise ValueError("pickle反序列化可执行任意代码，仅在存储可信时传入allow_pickle=True启用")
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.allowed_serializers = frozenset(allowed)
+
+    def _check_header(self, header: int) -> Tuple[str, int]:
+        """校验头字节，返回(序列化格式, 压缩算法编号)"""
+        serializer_id = header & 0x07
+        compressor_id = (header >> 3) & 0x07
+        if serializer_id not in _SERIALIZERS_BY_ID:
+            raise ValueError(f"未知或未安装的序列化格式编号: {serializer_id}")
+        if compressor_id not in _COMPRESSORS_BY_ID:
+            raise ValueError(f"未知的压缩算法编号: {compressor_id}")
+        serializer = _SERIALIZERS_BY_ID[serializer_id][0]
+        if serializer not in self.allowed_serializers:
+            raise ValueError(f"拒绝解码不在允许列表中的序列化格式: {serializer}")
+        return serializer, compressor_id
+
+    def encode(self, value: Any) -> bytes:
+        """序列化并按需压缩，返回带头字节的二进制数据"""
+        serializer_id, dumps, _ = SERIALIZERS[self.serializer]
+        payload = dumps(value)
+
+        compressor_id = 0
+        if self.compression != "none" and len(payload) >= self.compress_threshold:
+            codec_id, compress, _ = COMPRESSORS[self.compression]
+            compressed = compress(payload)
+            # 压缩无收益时保留原文
+            if len(compressed) < len(payload):
+                payload = compressed
+                compressor_id = codec_id
+
+        return bytes([HEADER_FLAG | (compressor_id << 3) | serializer_id]) + payload
+
+    def decode(self, data: Union[bytes, bytearray, memoryview, str, None]) -> Any:
+        """按头字节解码；无头字节的数据按旧的JSON文本处理"""
+        if data is None:
+            return None
+        if isinstance(data, str):
+            return json.loads(data)
+
+        data = bytes(data)
+        if not data or data[0] < HEADER_FLAG:
+            return json.loads(data)
+
+        serializer, compressor_id = self._check_header(data[0])
+        payload = data[1:]
+        _, decompress = _COMPRESSORS_BY_ID[compressor_id]
+        if decompress:
+            payload = decompress(payload)
+
+        return SERIALIZERS[serializer][2](payload)
+
+    def serialize(self, value: Any) -> bytes:
+        """一次性序列化，不压缩、不带头字节；JSON走C实现的json.dumps，小对象应优先使用"""
+        return SERIALIZERS[self.serializer][1](value)
+
+    def iter_serialized(self, value: Any, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """分块产出未压缩的序列化数据，JSON借助iterencode避免生成完整文本
+
+        iterencode是纯Python实现，比json.dumps慢数倍，只适合已知需要流式写入的大对象
+        """
+        if self.serializer != "json":
+            yield from iter_chunks(self.serialize(value), chunk_size)
+            return
+
+        # iterencode逐个token产出，攒够一块再编码以减少调用开销
+        parts: List[str] = []
+        buffered = 0
+        for part in json.JSONEncoder(ensure_ascii=False).iterencode(value):
+            parts.append(part)
+            buffered += len(part)
+            if buffered >= chunk_size:
+                yield "".join(parts).encode("utf-8")
+                parts.clear()
+                buffered = 0
+        if parts:
+            yield "".join(parts).encode("utf-8")
+
+    def iter_encode(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """将序列化数据块流式压缩，产出与encode相同格式的数据（头字节在前）"""
+        serializer_id = SERIALIZERS[self.serializer][0]
+        if self.compression == "none":
+            yield bytes([HEADER_FLAG | serializer_id])
+            yield from chunks
+            return
+
+        # 流式写入无法预知大小，配置了压缩即始终压缩
+        compressor = _STREAM_COMPRESSORS[self.compression]()
+        yield bytes([HEADER_FLAG | (COMPRESSORS[self.compression][0] << 3) | serializer_id])
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def open_stream(self, fileobj: BinaryIO,
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> Tuple[str, io.BufferedReader]:
+        """打开编码数据的惰性读取流，返回(序列化格式, 解压后的序列化数据流)"""
+        header = fileobj.read(1)
+        if not header or header[0] < HEADER_FLAG:
+            # 旧的JSON文本，把已读出的首字节放回流中
+            return "json", io.BufferedReader(_StreamReader(fileobj, prefix=header, chunk_size=chunk_size))
+
+        serializer, compressor_id = self._check_header(header[0])
+        decompressor = _STREAM_DECOMPRESSORS[compressor_id]() if compressor_id else None
+        reader = _StreamReader(fileobj, decompressor, chunk_size=chunk_size)
+        return serializer, io.BufferedReader(reader, chunk_size)
+
+    def decode_stream(self, fileobj: BinaryIO) -> Any:
+        """从文件对象增量解压并解码，不缓存压缩后的完整数据
+
+        JSON在安装ijson且文件可回绕时边读边解析，不保留完整的序列化文本；
+        其他情况只有读取与解压是分块的，解码前仍会读出完整的序列化数据
+        """
+        start = fileobj.tell() if HAS_IJSON and fileobj.seekable() else None
+        serializer, reader = self.open_stream(fileobj)
+        if serializer == "json" and start is not None:
+            try:
+                return next(ijson.items(reader, "", use_float=True))
+            except ijson.JSONError:
+                # yajl不支持NaN/Infinity和超出64位的数值，回到起点整体解析
+                fileobj.seek(start)
+                serializer, reader = self.open_stream(fileobj)
+        if serializer == "json":
+            return json.load(reader)
+        return SERIALIZERS[serializer][2](reader.read())
+
+    @staticmethod
+    def describe(data: Union[bytes, str]) -> Dict[str, str]:
+        """返回数据使用的序列化格式与压缩算法"""
+        if isinstance(data, str) or not data or data[0] < HEADER_FLAG:
+            return {"serializer": "json", "compression": "none", "legacy": True}
+        header = data[0]
+        return {
+            "serializer": _SERIALIZERS_BY_ID.get(header & 0x07, ("unknown",))[0],
+            "compression": _COMPRESSORS_BY_ID.get((header >> 3) & 0x07, ("unknown",))[0],
+            "legacy": False
+        }
+
+def _sample_payloads() -> Dict[str, Any]:
+    """基准测试用的典型缓存值"""
+    answer = ("缓存可以显著降低LLM调用成本。Caching repeated prompts avoids paying for "
+              "the same tokens twice, and semantic caching extends this to paraphrases. ") * 30
+    return {
+        "small_dict": {"user_id": 123, "name": "张三", "active": True},
+        "llm_answer": {"prompt": "如何优化缓存?", "response": answer, "tokens": 812,
+                       "model": "gpt-4o-mini"},
+        "nested_large": {
+            "documents": [
+                {"id": i, "title": f"文档 {i}", "chunks": [answer[:400]] * 5,
+                 "scores": [0.1 * n for n in range(20)]}
+                for i in range(60)
+            ]
+        },
+    }
+
+def benchmark_codecs(payloads: Dict[str, Any] = None, rounds: int = 200) -> List[Dict[str, Any]]:
+    """比较各编解码组合的编码/解码耗时与存储大小"""
+    payloads = payloads or _sample_payloads()
+    results = []
+
+    for payload_name, value in payloads.items():
+        legacy_size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        print(f"\n{payload_name} (旧JSON文本 {legacy_size:,} 字节)")
+
+        for serializer in SERIALIZERS:
+            for compression in COMPRESSORS:
+                codec = ValueCodec(serializer, compression, compress_threshold=256,
+                                   allow_pickle=serializer == "pickle")
+
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    encoded = codec.encode(value)
+                encode_us = (time.perf_counter() - start) / rounds * 1e6
+
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    codec.decode(encoded)
+                decode_us = (time.perf_counter() - start) / rounds * 1e6
+
+                results.append({
+                    "payload": payload_name,
+                    "serializer": serializer,
+                    "compression": compression,
+                    "encode_us": round(encode_us, 1),
+                    "decode_us": round(decode_us, 1),
+                    "size_bytes": len(encoded),
+                    "size_ratio": round(len(encoded) / legacy_size, 3)
+                })
+                print(f"  {serializer:<8} {compression:<5} encode={encode_us:>9.1f}us "
+                      f"decode={decode_us:>9.1f}us size={len(encoded):>8,}B "
+                      f"({len(encoded) / legacy_size:.1%})")
+
+    return results
+
+class _NullSink:
+    """只统计写入字节数的输出端，模拟分块上传"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data: bytes):
+        self.size += len(data)
+
+def _peak_memory(func: Callable[[], Any]) -> Tuple[float, float]:
+    """返回(耗时秒, tracemalloc峰值MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+def benchmark_streaming(num_documents: int = 2000, codec: "ValueCodec" = None) -> Dict[str, Any]:
+    """比较整块与流式编解码大对象时的峰值内存"""
+    codec = codec or ValueCodec("json", "zlib")
+    value = {
+        "documents": [
+            {"id": i, "title": f"文档 {i}", "text": f"第{i}段转换结果。" * 200,
+             "scores": [i * 0.001 + n for n in range(50)]}
+            for i in range(num_documents)
+        ]
+    }
+    encoded = codec.encode(value)
+    value_mb = len(json.dumps(value, ensure_ascii=False).encode("utf-8")) / 1024 / 1024
+
+    def buffered_write():
+        # 原实现: 先序列化一次测量大小，再整体编码后一次写入
+        len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        _NullSink().write(codec.encode(value))
+
+    def streaming_write():
+        sink = _NullSink()
+        for block in codec.iter_encode(codec.iter_serialized(value)):
+            sink.write(block)
+
+    def buffered_read():
+        codec.decode(io.BytesIO(encoded).read())
+
+    def streaming_read():
+        codec.decode_stream(io.BytesIO(encoded))
+
+    def lazy_scan():
+        _, reader = codec.open_stream(io.BytesIO(encoded))
+        while reader.read(STREAM_CHUNK_SIZE):
+            pass
+
+    results = {"value_mb": round(value_mb, 2), "encoded_mb": round(len(encoded) / 1024 / 1024, 2)}
+    print(f"JSON {value_mb:.1f}MB, 编码后 {len(encoded) / 1024 / 1024:.2f}MB")
+    for name, func in [("buffered_write", buffered_write), ("streaming_write", streaming_write),
+                       ("buffered_read", buffered_read), ("streaming_read", streaming_read),
+                       ("lazy_scan", lazy_scan)]:
+        elapsed, peak_mb = _peak_memory(func)
+        results[name] = {"seconds": round(elapsed, 3), "peak_mb": round(peak_mb, 2)}
+        print(f"  {name:<16} {elapsed * 1000:>8.1f}ms 峰值 {peak_mb:>8.2f}MB")
+
+    return results
+
+# 使用示例
+if __name__ == "__main__":
+    codec = ValueCodec(serializer="json", compression="zlib")
+
+    encoded = codec.encode({"response": "你好" * 1000})
+    print(f"编码格式: {ValueCodec.describe(encoded)}, 大小: {len(encoded)} 字节")
+    print(f"旧数据解码: {codec.decode(json.dumps({'legacy': True}))}")
+
+    # 编解码基准测试: python cache_codec.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_codecs()
+        print("\n大对象流式编解码")
+        benchmark_streaming()
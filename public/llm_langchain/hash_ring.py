@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+一致性哈希环
+支持虚拟节点、按权重分配容量和多副本，节点增删时报告迁移的哈希区间
+"""
+
+import bisect
+import hashlib
+import random
+import statistics
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 哈希空间为64位整数
+RING_SIZE = 2 ** 64
+
+def _md5_hash(value: str) -> int:
+    """取MD5前8字节作为环上位置"""
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+@dataclass
+class MovedRange:
+    """节点变更后归属发生变化的哈希区间 (start, end]，start > end 表示跨越环的零点"""
+    start: int
+    end: int
+    source: Optional[str]
+    target: Optional[str]
+
+    @property
+    def size(self) -> int:
+        return (self.end - self.start) % RING_SIZE
+
+    @property
+    def fraction(self) -> float:
+        """区间占整个哈希空间的比例"""
+        return self.size / RING_SIZE
+
+class HashRing:
+    """带虚拟节点的一致性哈希环"""
+
+    def __init__(self, nodes: Optional[Dict[str, int]] = None, vnodes: int = 160,
+                 replicas: int = 1, hash_func: Callable[[str], int] = _md5_hash):
+        self.vnodes = vnodes
+        self.replicas = replicas
+        self.hash_func = hash_func
+        self.weights: Dict[str, int] = {}
+        self._positions: List[int] = []
+        self._owners: List[str] = []
+
+        for node, weight in (nodes or {}).items():
+            self.add_node(node, weight)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self.weights)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def _node_positions(self, node: str, weight: int) -> List[int]:
+        """节点的虚拟节点位置，数量与权重成正比"""
+        return [self.hash_func(f"{node}#{i}") for i in range(self.vnodes * weight)]
+
+    def _snapshot(self) -> Tuple[List[int], List[str]]:
+        return list(self._positions), list(self._owners)
+
+    def add_node(self, node: str, weight: int = 1) -> List[MovedRange]:
+        """加入节点，返回迁移到该节点的哈希区间"""
+        if node in self.weights:
+            raise ValueError(f"节点已存在: {node}")
+        if weight < 1:
+            raise ValueError(f"节点权重必须为正整数: {weight}")
+
+        before = self._snapshot()
+        self.weights[node] = weight
+        for position in self._node_positions(node, weight):
+            index = bisect.bisect_left(self._positions, position)
+            self._positions.insert(index, position)
+            self._owners.insert(index, node)
+        return self._diff(before)
+
+    def remove_node(self, node: str) -> List[MovedRange]:
+        """移除节点，返回从该节点迁出的哈希区间"""
+        if node not in self.weights:
+            raise KeyError(node)
+
+        before = self._snapshot()
+        del self.weights[node]
+        kept = [(position, owner) for position, owner in zip(self._positions, self._owners)
+                if owner != node]
+        self._positions = [position for position, _ in kept]
+        self._owners = [owner for _, owner in kept]
+        return self._diff(before)
+
+    @staticmethod
+    def _owner_at(positions: List[int], owners: List[str], point: int) -> Optional[str]:
+        """顺时针第一个不小于point的虚拟节点的归属"""
+        if not positions:
+            return None
+        return owners[bisect.bisect_left(positions, point) % len(positions)]
+
+    def _diff(self, before: Tuple[List[int], List[str]]) -> List[MovedRange]:
+        """比较变更前后的环，合并归属变化的相邻区间"""
+        old_positions, old_owners = before
+        boundaries = sorted(set(old_positions) | set(self._positions))
+        moved: List[MovedRange] = []
+
+        for i, end in enumerate(boundaries):
+            start = boundaries[i - 1]  # i == 0 时为跨零点的区间
+            source = self._owner_at(old_positions, old_owners, end)
+            target = self._owner_at(self._positions, self._owners, end)
+            if source == target:
+                continue
+            if moved and moved[-1].end == start and \
+                    (moved[-1].source, moved[-1].target) == (source, target):
+                moved[-1].end = end
+            else:
+                moved.append(MovedRange(start, end, source, target))
+
+        return moved
+
+    def get_node(self, key: str) -> Optional[str]:
+        """获取键的主节点"""
+        return self._owner_at(self._positions, self._owners, self.hash_func(key))
+
+    def get_nodes(self, key: str, count: Optional[int] = None) -> List[str]:
+        """获取键的副本节点列表（主节点在前），沿环顺时针取不同的物理节点"""
+        count = min(count or self.replicas, len(self.weights))
+        if not count:
+            return []
+
+        start = bisect.bisect_left(self._positions, self.hash_func(key))
+        nodes: List[str] = []
+        for offset in range(len(self._positions)):
+            owner = self._owners[(start + offset) % len(self._positions)]
+            if owner not in nodes:
+                nodes.append(owner)
+                if len(nodes) == count:
+                    break
+        return nodes
+
+    def ownership(self) -> Dict[str, float]:
+        """各节点拥有的哈希空间比例"""
+        shares = {node: 0 for node in self.weights}
+        for i, position in enumerate(self._positions):
+            shares[self._owners[i]] += (position - self._positions[i - 1]) % RING_SIZE
+        if len(self._positions) == 1:
+            shares[self._owners[0]] = RING_SIZE
+        return {node: share / RING_SIZE for node, share in shares.items()}
+
+def simulate_rebalance(node_counts: range = range(3, 13), num_keys: int = 100000,
+                       vnodes: int = 160, seed: int = 42) -> List[Dict[str, Any]]:
+    """模拟扩容一个节点时的键迁移比例与负载均衡，对比取模分片"""
+    rng = random.Random(seed)
+    keys = [f"key:{rng.getrandbits(64)}" for _ in range(num_keys)]
+    key_hashes = [_md5_hash(key) for key in keys]
+    results = []
+
+    print(f"{'节点':>4} {'取模迁移':>10} {'哈希环迁移':>10} {'理想迁移':>10} "
+          f"{'负载max/avg':>12} {'负载CV':>8}")
+    for count in node_counts:
+        names = [f"node-{i}" for i in range(count)]
+        ring = HashRing({name: 1 for name in names}, vnodes=vnodes)
+
+        before = [ring.get_node(key) for key in keys]
+        ring.add_node(f"node-{count}")
+        after = [ring.get_node(key) for key in keys]
+        ring_moved = sum(1 for a, b in zip(before, after) if a != b) / num_keys
+
+        modulo_moved = sum(
+            1 for h in key_hashes if h % count != h % (count + 1)
+        ) / num_keys
+
+        loads = {name: 0 for name in names}
+        for node in before:
+            loads[node] += 1
+        mean_load = num_keys / count
+        max_ratio = max(loads.values()) / mean_load
+        cv = statistics.pstdev(loads.values()) / mean_load
+
+        results.append({
+            "nodes": count,
+            "modulo_moved": round(modulo_moved, 4),
+            "ring_moved": round(ring_moved, 4),
+            "ideal_moved": round(1 / (count + 1), 4),
+            "max_over_avg_load": round(max_ratio, 3),
+            "load_cv": round(cv, 4)
+        })
+        print(f"{count:>4} {modulo_moved:>10.1%} {ring_moved:>10.1%} {1 / (count + 1):>10.1%} "
+              f"{max_ratio:>12.3f} {cv:>8.4f}")
+
+    return results
+
+# 使用示例
+if __name__ == "__main__":
+    ring = HashRing({"cache-a": 1, "cache-b": 1, "cache-c": 2}, replicas=2)
+    print(f"user:123 -> {ring.get_nodes('user:123')}")
+    print(f"容量占比: {ring.ownership()}")
+
+    moved = ring.add_node("cache-d")
+    print(f"加入cache-d: 迁移 {len(moved)} 个区间, 共 {sum(r.fraction for r in moved):.1%} 的哈希空间")
+
+    # 迁移与负载均衡模拟: python hash_ring.py --benchmark
+    if "--benchmark" in sys.argv:
+        for vnodes in (16, 160):
+            print(f"\n虚拟节点数 {vnodes}")
+            simulate_rebalance(vnodes=vnodes)
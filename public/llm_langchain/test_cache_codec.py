@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+cache_codec.py 行为测试
+"""
+
+import io
+import json
+import math
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import cache_codec
+from cache_codec import HEADER_FLAG, ValueCodec
+
+class _Exploit:
+    """被反序列化时会执行代码的对象"""
+
+    triggered = False
+
+    def __reduce__(self):
+        return (_Exploit._trigger, ())
+
+    @staticmethod
+    def _trigger():
+        _Exploit.triggered = True
+
+def _pickle_payload(value) -> bytes:
+    return bytes([HEADER_FLAG | cache_codec.SERIALIZERS["pickle"][0]]) + pickle.dumps(value)
+
+def test_default_codec_rejects_pickle_header():
+    """默认编解码器拒绝伪造的pickle数据，且不执行其中的代码"""
+    codec = ValueCodec()
+    forged = _pickle_payload(_Exploit())
+    with pytest.raises(ValueError):
+        codec.decode(forged)
+    with pytest.raises(ValueError):
+        codec.decode_stream(io.BytesIO(forged))
+    assert not _Exploit.triggered
+
+def test_pickle_requires_explicit_opt_in():
+    with pytest.raises(ValueError):
+        ValueCodec(serializer="pickle")
+    with pytest.raises(ValueError):
+        ValueCodec(allowed_serializers=["pickle"])
+
+    codec = ValueCodec(allowed_serializers=["pickle"], allow_pickle=True)
+    assert codec.decode(_pickle_payload({"a": 1})) == {"a": 1}
+
+def test_unknown_header_rejected():
+    with pytest.raises(ValueError):
+        ValueCodec().decode(bytes([HEADER_FLAG | 0x07]) + b"{}")
+
+def test_legacy_json_still_readable():
+    """没有头字节的旧JSON文本照常解码"""
+    codec = ValueCodec()
+    legacy = json.dumps({"answer": "是"}, ensure_ascii=False)
+    assert codec.decode(legacy) == {"answer": "是"}
+    assert codec.decode(legacy.encode("utf-8")) == {"answer": "是"}
+    assert codec.decode_stream(io.BytesIO(legacy.encode("utf-8"))) == {"answer": "是"}
+
+def test_stream_round_trip():
+    """流式写入的数据可一次性或流式读回，ijson无法解析的数值回退到json"""
+    value = {"items": [{"id": i, "text": "x" * 50} for i in range(500)], "big": 2 ** 70}
+    for compression in ("none", "zlib", "lzma"):
+        codec = ValueCodec(compression=compression)
+        encoded = b"".join(codec.iter_encode(codec.iter_serialized(value, chunk_size=1024)))
+        assert codec.decode(encoded) == value
+        assert codec.decode_stream(io.BytesIO(encoded)) == value
+
+    codec = ValueCodec()
+    special = codec.decode_stream(io.BytesIO(codec.encode({"x": float("nan")})))
+    assert math.isnan(special["x"])
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
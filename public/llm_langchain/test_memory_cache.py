@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+11_memory_cache.py 行为测试
+"""
+
+import asyncio
+import importlib.util
+import sys
+import threading
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+_spec = importlib.util.spec_from_file_location("memory_cache", HERE / "11_memory_cache.py")
+memory_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(memory_cache)
+
+def test_tinylfu_counts_miss_then_fill_once():
+    """未命中后回填只计一次频率，直接set仍计数"""
+    cache = memory_cache.WTinyLFUCache(max_size=100)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache._sketch.estimate(cache._generate_key("a")) == 1
+
+    cache.set("b", 1)
+    cache.set("b", 2)
+    assert cache._sketch.estimate(cache._generate_key("b")) == 2
+
+def test_tinylfu_keeps_hot_keys_under_scan():
+    """一次性键的长扫描不能冲掉反复访问的热点"""
+    cache = memory_cache.WTinyLFUCache(max_size=200)
+    hot = [f"hot:{i}" for i in range(100)]
+    for _ in range(5):
+        memory_cache.replay_trace(cache, hot)
+
+    memory_cache.replay_trace(cache, [f"scan:{i}" for i in range(5000)])
+
+    assert sum(cache.get(key) is not None for key in hot) >= 95
+    assert cache.get_stats()["rejections"] > 4000
+
+def test_tinylfu_beats_lru_on_scan_trace():
+    """同等容量下，zipf加扫描的访问序列上TinyLFU命中率高于LRU"""
+    trace = memory_cache.scan_trace(40000, 4000, scan_every=2000, scan_length=1000)
+    lru = memory_cache.replay_trace(memory_cache.MemoryCache(max_size=400), trace)
+    tinylfu = memory_cache.replay_trace(memory_cache.WTinyLFUCache(max_size=400), trace)
+    assert tinylfu > lru
+
+def test_advanced_cache_defaults_to_tiers():
+    cache = memory_cache.AdvancedMemoryCache()
+    assert cache.policy == "tiered"
+    assert set(cache.caches) == {"hot", "warm", "cold"}
+    assert memory_cache.AdvancedMemoryCache(policy="tinylfu").caches == {}
+
+def test_timing_wheel_fires_once_after_reschedule():
+    """改期后只在新的到期时间触发一次，跨层级的登记逐级下放"""
+    wheel = memory_cache.TimingWheel(tick=1.0, slots=8, levels=3)
+    start = time.time()
+    wheel.schedule("a", start + 3)
+    wheel.schedule("b", start + 100)
+    wheel.schedule("a", start + 20)
+    assert len(wheel) == 2
+
+    assert wheel.advance(start + 10) == []
+    assert wheel.advance(start + 22) == ["a"]
+    assert wheel.advance(start + 99) == []
+    assert wheel.advance(start + 102) == ["b"]
+    assert len(wheel) == 0
+
+def test_sharded_cache_expires_through_wheel():
+    """到期条目由时间轮回收，删除与淘汰同时取消登记"""
+    cache = memory_cache.ShardedMemoryCache(max_size=32, ttl=5, num_shards=4,
+                                            background_expiry=False)
+    now = time.time()
+    cache.set_many({f"k{i}": i for i in range(8)})
+    cache.delete("k0")
+    assert cache.get_stats()["wheel_entries"] == 7
+
+    assert cache.expire(now + 2) == 0
+    assert cache.expire(now + 8) == 7
+    stats = cache.get_stats()
+    assert stats["size"] == 0 and stats["wheel_entries"] == 0
+
+    for i in range(100):
+        cache.set(f"e{i}", i)
+    stats = cache.get_stats()
+    assert stats["wheel_entries"] == stats["size"] <= 32
+
+def test_sharded_cache_delete_during_set_keeps_wheel_in_sync():
+    """set写入条目与登记时间轮之间插入的并发delete，不会留下无条目的登记"""
+    cache = memory_cache.ShardedMemoryCache(max_size=100, ttl=60, num_shards=1,
+                                            background_expiry=False)
+    schedule = cache._wheel.schedule
+    deleter = threading.Thread(target=cache.delete, args=("k",))
+
+    def racing_schedule(item, expire_at):
+        # 给并发delete一个在登记前执行的机会
+        deleter.start()
+        deleter.join(timeout=0.1)
+        schedule(item, expire_at)
+
+    cache._wheel.schedule = racing_schedule
+    cache.set("k", 1)
+    deleter.join()
+
+    live = {(index, cache_key) for index, shard in enumerate(cache._shards)
+            for cache_key in shard._cache}
+    assert set(cache._wheel._locations) == live
+    assert live == set()
+
+def test_single_flight_leader_cancellation_spares_waiters():
+    """发起加载的调用方被取消后，其余等待者照常拿到结果，loader只执行一次"""
+    async def run():
+        cache = memory_cache.MemoryCache(max_size=10)
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            started.set()
+            await release.wait()
+            return "value"
+
+        leader = asyncio.ensure_future(cache.aget_or_compute("k", loader))
+        await started.wait()
+        follower = asyncio.ensure_future(cache.aget_or_compute("k", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == "value"
+        assert leader.cancelled()
+        assert calls == [1]
+        assert cache.get("k") == "value"
+        assert cache.get_stats()["single_flight"] == {"loads": 1, "coalesced": 1}
+
+    asyncio.run(run())
+
+def test_single_flight_finishes_load_when_all_callers_cancel():
+    """所有调用方都取消时加载仍跑完并写入缓存"""
+    async def run():
+        cache = memory_cache.MemoryCache(max_size=10)
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "value"
+
+        caller = asyncio.ensure_future(cache.aget_or_compute("k", loader))
+        await asyncio.sleep(0)
+        caller.cancel()
+        release.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert cache.get("k") == "value"
+
+    asyncio.run(run())
+
+def test_async_sync_loader_runs_off_loop():
+    """同步loader在线程池中执行，不占用事件循环线程"""
+    async def run():
+        cache = memory_cache.MemoryCache(max_size=10)
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def loader():
+            threads.append(threading.get_ident())
+            return 42
+
+        assert await cache.aget_or_compute("k", loader) == 42
+        assert threads and threads[0] != loop_thread
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+13_mysql_cache.py 中AsyncMySQLCache的行为测试（以内存中的假连接池代替MySQL服务）
+"""
+
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mysql.connector")
+pytest.importorskip("aiomysql")
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+_spec = importlib.util.spec_from_file_location("mysql_cache", HERE / "13_mysql_cache.py")
+mysql_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(mysql_cache)
+
+class FakeCursor:
+    """按cache_key保存行，只解析测试用到的几类语句"""
+
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+        self._result = []
+
+    async def __aenter__(self) -> "FakeCursor":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+    async def execute(self, sql: str, params=()) -> int:
+        self.pool.executed.append(sql)
+        rows = self.pool.rows
+        text = " ".join(sql.split())
+        if text.startswith("INSERT"):
+            for i in range(0, len(params), 6):
+                rows[params[i]] = params[i + 1]
+            return len(params) // 6
+        if text.startswith("SELECT"):
+            self._result = [(key, rows[key]) for key in params if key in rows]
+            return len(self._result)
+        if text.startswith("DELETE"):
+            return sum(rows.pop(key, None) is not None for key in params)
+        return 0
+
+    async def fetchall(self) -> list:
+        return self._result
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    def cursor(self, *args) -> FakeCursor:
+        return FakeCursor(self.pool)
+
+class FakePool:
+    def __init__(self):
+        self.rows = {}
+        self.executed = []
+        self.size = 1
+        self.freesize = 1
+
+    async def acquire(self) -> FakeConnection:
+        return FakeConnection(self)
+
+    def release(self, conn: FakeConnection) -> None:
+        pass
+
+def _cache() -> "mysql_cache.AsyncMySQLCache":
+    cache = mysql_cache.AsyncMySQLCache({"table_name": "cache_data"})
+    cache.pool = FakePool()
+    return cache
+
+def test_async_round_trip_and_batches():
+    """批量读写按BATCH_CHUNK_SIZE分块，值经编解码往返"""
+    async def run():
+        cache = _cache()
+        items = {f"k{i}": {"n": i} for i in range(mysql_cache.BATCH_CHUNK_SIZE + 10)}
+        assert await cache.set_many(items) == len(items)
+        assert await cache.get("k3") == {"n": 3}
+        assert await cache.get_many(list(items)) == items
+        assert await cache.delete("k3")
+        assert await cache.get("k3") is None
+        return cache
+
+    cache = asyncio.run(run())
+    stats = cache.get_pool_stats()
+    assert stats["acquires"] == 5
+    assert stats["max_wait_ms"] >= stats["p50_wait_ms"] >= 0
+
+def test_sql_text_built_once_per_shape():
+    """同一(类型, 行数)的SQL文本只构建一次并复用"""
+    cache = _cache()
+    assert cache._sql("get", 3) is cache._sql("get", 3)
+    assert cache._sql("get", 3) != cache._sql("get", 4)
+    assert cache.get_pool_stats()["cached_sql_texts"] == 2
+    with pytest.raises(ValueError):
+        cache._sql("unknown")
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+16_semantic_cache.py 行为测试
+"""
+
+import importlib.util
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+_spec = importlib.util.spec_from_file_location("semantic_cache", HERE / "16_semantic_cache.py")
+semantic_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(semantic_cache)
+
+def test_set_accepts_non_json_value():
+    """值大小统计不能因为值无法JSON序列化而拒绝写入"""
+    cache = semantic_cache.SemanticCache(semantic_cache.TfidfSemanticEncoder())
+    value = {"t": datetime.now()}
+
+    assert cache.set("hello world", value)
+    assert cache.get("hello world")["value"] is value
+    assert cache.get_stats()["total_items"] == 1
+
+def test_deleted_slots_are_reused_then_compacted():
+    """删除的槽位先被新写入复用，空闲过多时压缩矩阵并重新编号，查询结果不变"""
+    rng = np.random.default_rng(0)
+    texts = [f"q{i}" for i in range(300)]
+    vectors = {text: rng.standard_normal(16).astype(np.float32) for text in texts}
+    cache = semantic_cache.SemanticCache(semantic_cache._LookupEncoder(vectors), threshold=0.99)
+    for text in texts[:200]:
+        cache.set(text, {"text": text})
+
+    freed = cache._slots[cache._generate_key("q5")]
+    cache.delete("q5")
+    cache.set("q200", {"text": "q200"})
+    assert cache._slots[cache._generate_key("q200")] == freed
+    assert len(cache._slot_keys) == 200
+
+    deleted = texts[:100]
+    for text in deleted:
+        cache.delete(text)
+    live = texts[100:201]
+    assert len(cache._slot_keys) < 200
+    assert len(cache._free_slots) <= cache.COMPACT_RATIO * len(cache._slot_keys) + cache.INITIAL_CAPACITY
+    assert int(cache._alive[:len(cache._slot_keys)].sum()) == len(live)
+    for slot, cache_key in enumerate(cache._slot_keys):
+        if cache_key is not None:
+            assert cache._slots[cache_key] == slot
+
+    for text in live:
+        assert cache.get(text)["value"] == {"text": text}
+        slot = cache._slots[cache._generate_key(text)]
+        assert np.allclose(cache._matrix[slot], cache._normalize(vectors[text]))
+    for text in deleted:
+        assert cache.get(text) is None
+    assert cache.get_stats()["total_items"] == len(live)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+12_sqlite_cache.py 行为测试
+"""
+
+import hashlib
+import importlib.util
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+_spec = importlib.util.spec_from_file_location("sqlite_cache", HERE / "12_sqlite_cache.py")
+sqlite_cache = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sqlite_cache)
+
+def _db_path() -> str:
+    return str(Path(tempfile.mkdtemp()) / "cache.db")
+
+def _fts_rows(db_path: str) -> list:
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute("SELECT rowid, content FROM cache_data_fts").fetchall())
+
+def test_search_without_index_scans_values():
+    """未配置search_text时仍按键和值文本搜索"""
+    cache = sqlite_cache.AdvancedSQLiteCache(db_path=_db_path())
+    cache.set("user:1", {"name": "Alice", "city": "Paris"})
+    cache.set("user:2", {"name": "Bob", "city": "Berlin"})
+
+    results = cache.search_by_pattern("paris", include_values=True)
+    assert [item["value"]["name"] for item in results] == ["Alice"]
+    assert cache.search_by_pattern("user:1") == []
+    assert len(cache.search_by_pattern(cache._generate_key("user:2"))) == 1
+    cache.close()
+
+def test_search_index_survives_vacuum():
+    """VACUUM后索引行仍指向正确的缓存行"""
+    db_path = _db_path()
+    cache = sqlite_cache.AdvancedSQLiteCache(db_path=db_path,
+                                             search_text=sqlite_cache.text_fields("prompt"))
+    for i in range(50):
+        cache.set(f"k{i}", {"prompt": f"question number {i:03d}", "answer": f"secret {i}"})
+    for i in range(0, 50, 2):
+        cache.delete(f"k{i}")
+
+    with cache._connect() as conn:
+        conn.execute("VACUUM")
+
+    for i in (1, 25, 49):
+        results = cache.search_by_pattern(f"number {i:03d}", include_values=True)
+        assert [item["value"]["answer"] for item in results] == [f"secret {i}"]
+    assert cache.search_by_pattern("number 010") == []
+    assert cache.search_by_pattern("secret") == []
+    cache.close()
+
+def test_rebuild_matches_live_index():
+    """重建索引与写入时生成的索引一致"""
+    db_path = _db_path()
+    cache = sqlite_cache.AdvancedSQLiteCache(
+        db_path=db_path, search_text=lambda cache_key, value: f"{cache_key[:8]} {value}"
+    )
+    cache.set_many({"a": "alpha", "b": "beta"})
+    cache.batch_set([{"key": "c", "value": "gamma"}])
+    live = _fts_rows(db_path)
+
+    assert cache.rebuild_search_index() == 3
+    assert _fts_rows(db_path) == live
+    cache.close()
+
+def test_legacy_table_migrates_to_explicit_ids():
+    """以key为主键的旧表迁移为带id列的表，数据、标签与全文索引保持对应"""
+    db_path = _db_path()
+    codec = sqlite_cache.ValueCodec()
+    cache_key = hashlib.sha256(b"old").hexdigest()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE cache_data (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL, data_type TEXT DEFAULT 'json',
+                created_at REAL NOT NULL, updated_at REAL NOT NULL,
+                access_count INTEGER DEFAULT 1, ttl INTEGER DEFAULT 86400, tags TEXT DEFAULT '[]'
+            )
+        """)
+        conn.execute("INSERT INTO cache_data VALUES (?, ?, 'dict', ?, ?, 1, 3600, ?)",
+                     (cache_key, codec.encode({"prompt": "hello there"}), time.time(), time.time(),
+                      json.dumps(["greeting"])))
+
+    cache = sqlite_cache.AdvancedSQLiteCache(db_path=db_path,
+                                             search_text=sqlite_cache.text_fields("prompt"))
+    with cache._connect() as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cache_data)")]
+    assert columns[0] == "id"
+    assert cache.get("old") == {"prompt": "hello there"}
+    assert len(cache.search_by_pattern("hello")) == 1
+    assert cache.delete_by_tags(["greeting"]) == 1
+    assert cache.search_by_pattern("hello") == []
+    cache.close()
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
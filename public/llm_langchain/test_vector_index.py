@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+vector_index.py 行为测试
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import vector_index
+
+def _vectors(count: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+def test_ivf_flat_untrained_rebuilds_on_tombstones():
+    """未训练的IVF-Flat在墓碑过多时也要求重建"""
+    index = vector_index.IVFFlatIndex(train_size=10_000)
+    vectors = _vectors(100)
+    index.add(np.arange(100), vectors)
+    assert not index.needs_rebuild
+
+    index.remove(np.arange(60))
+    assert index.needs_rebuild
+
+@pytest.mark.skipif(not vector_index.HAS_HNSWLIB, reason="需要hnswlib")
+def test_hnsw_search_after_mass_deletion():
+    """大量节点标记删除后检索不抛错，只返回存活的标签"""
+    vectors = _vectors(3000)
+    index = vector_index.HNSWIndex(M=2, ef_search=1)
+    index.add(np.arange(3000), vectors)
+    index.remove(np.arange(2950))
+
+    ids, scores = index.search(vectors[-1], 50)
+    assert 0 < len(ids) <= 50
+    assert len(scores) == len(ids)
+    assert set(ids.tolist()) <= set(range(2950, 3000))
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+向量近似最近邻索引
+为语义缓存提供可插拔的检索后端: 纯NumPy的IVF-Flat，以及安装了hnswlib/FAISS时的适配器。
+向量以整数ID（缓存矩阵的行号）标识，均为L2归一化的float32，相似度为内积（余弦）
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib
+    HAS_HNSWLIB = True
+except ImportError:
+    HAS_HNSWLIB = False
+
+try:
+    import faiss
+    HAS_FAISS = True
+except ImportError:
+    HAS_FAISS = False
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """取相似度最高的k个，按相似度降序"""
+    if scores.size > k:
+        top = np.argpartition(scores, -k)[-k:]
+        ids, scores = ids[top], scores[top]
+    order = np.argsort(scores)[::-1]
+    return ids[order], scores[order]
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """分块计算每个向量内积最大的聚类中心，避免生成N×nlist的完整矩阵"""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        assign[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assign
+
+def _default_nlist(size: int) -> int:
+    return max(1, int(math.sqrt(size)))
+
+# 墓碑或规模增长超过该比例时建议重建
+REBUILD_TOMBSTONE_RATIO = 0.3
+
+class VectorIndex(ABC):
+    """向量索引接口"""
+
+    @abstractmethod
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """加入向量，ID已存在时覆盖"""
+        pass
+
+    @abstractmethod
+    def remove(self, ids: np.ndarray):
+        """标记删除（墓碑），空间在rebuild时回收"""
+        pass
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回(ID数组, 相似度数组)，按相似度降序"""
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """清空索引"""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """有效（未删除）向量数"""
+        pass
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """墓碑过多或数据分布已明显变化，需要调用方用全部有效向量重建"""
+        return False
+
+    def rebuild(self, ids: np.ndarray, vectors: np.ndarray):
+        """用全部有效向量重建索引，清除墓碑并按当前数据重新训练"""
+        self.reset()
+        if len(ids):
+            self.add(ids, vectors)
+
+class _InvertedList:
+    """IVF的倒排列表: 可增长的向量块与存活掩码"""
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray) -> int:
+        """追加一批向量，返回起始位置"""
+        start, end = self.size, self.size + len(ids)
+        if end > len(self.ids):
+            capacity = max(end, len(self.ids) * 2)
+            self.ids = np.resize(self.ids, capacity)
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:start] = self.vectors[:start]
+            self.vectors = grown
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:start] = self.alive[:start]
+            self.alive = alive
+        self.ids[start:end] = ids
+        self.vectors[start:end] = vectors
+        self.alive[start:end] = True
+        self.size = end
+        return start
+
+class IVFFlatIndex(VectorIndex):
+    """纯NumPy实现的IVF-Flat索引
+
+    球面k-means把向量划分到nlist个倒排列表，查询只扫描与查询最相近的nprobe个列表。
+    向量数不足train_size时不训练，退化为单列表精确搜索
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, train_size: int = 4096,
+                 kmeans_iters: int = 10, seed: int = 42):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.kmeans_iters = kmeans_iters
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[_InvertedList] = []
+        self._where: Dict[int, Tuple[int, int]] = {}  # ID -> (列表号, 位置)
+        self._tombstones = 0
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        size = len(self._where)
+        # 未训练时也要检查墓碑: 槽位复用下的持续增删只会让唯一的倒排列表不断变长
+        if self._tombstones > REBUILD_TOMBSTONE_RATIO * (size + self._tombstones):
+            return True
+        if self.centroids is None:
+            return size >= self.train_size
+        # 规模翻倍后聚类中心不再代表数据分布
+        return size >= 2 * self._trained_size
+
+    def _kmeans(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """球面k-means，在采样上训练聚类中心"""
+        sample_size = min(len(vectors), nlist * 32)
+        sample = vectors[self.rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[self.rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            assign = _nearest_centroid(sample, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            nonempty = counts > 0
+
+            sums = np.empty_like(centroids)
+            sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+            # 空簇用随机样本重新初始化
+            sums[~nonempty] = sample[self.rng.choice(sample_size, int((~nonempty).sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return centroids.astype(np.float32)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if not len(ids):
+            return
+
+        existing = [i for i in ids.tolist() if i in self._where]
+        if existing:
+            self.remove(np.array(existing))
+        if not self.lists:
+            self.lists = [_InvertedList(vectors.shape[1])]
+
+        if self.centroids is None:
+            assign = np.zeros(len(ids), dtype=np.int64)
+        else:
+            assign = _nearest_centroid(vectors, self.centroids)
+        order = np.argsort(assign, kind="stable")
+        boundaries = np.flatnonzero(np.diff(assign[order])) + 1
+        for group in np.split(order, boundaries):
+            list_no = int(assign[group[0]])
+            start = self.lists[list_no].append(ids[group], vectors[group])
+            for offset, vector_id in enumerate(ids[group].tolist()):
+                self._where[vector_id] = (list_no, start + offset)
+
+    def remove(self, ids: np.ndarray):
+        for vector_id in np.asarray(ids, dtype=np.int64).tolist():
+            location = self._where.pop(vector_id, None)
+            if location:
+                self.lists[location[0]].alive[location[1]] = False
+                self._tombstones += 1
+
+    def rebuild(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.reset()
+        if len(ids) >= self.train_size:
+            nlist = min(self.nlist or _default_nlist(len(ids)), len(ids))
+            self.centroids = self._kmeans(vectors, nlist)
+            self.lists = [_InvertedList(vectors.shape[1]) for _ in range(nlist)]
+            self._trained_size = len(ids)
+        self.add(ids, vectors)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self._where or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if self.centroids is None:
+            probes = [0]
+        else:
+            nprobe = min(self.nprobe, len(self.centroids))
+            probes = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+
+        ids, scores = [], []
+        for list_no in probes:
+            inverted = self.lists[list_no]
+            # 先整体计算再屏蔽墓碑，避免按掩码复制向量块
+            list_scores = inverted.vectors[:inverted.size] @ query
+            list_scores[~inverted.alive[:inverted.size]] = -np.inf
+            ids.append(inverted.ids[:inverted.size])
+            scores.append(list_scores)
+        ids, scores = _top_k(np.concatenate(ids), np.concatenate(scores), k)
+        found = np.isfinite(scores)
+        return ids[found], scores[found]
+
+class HNSWIndex(VectorIndex):
+    """hnswlib的HNSW图索引适配器，容量不足时按倍数扩容"""
+
+    def __init__(self, M: int = 16, ef_construction: int = 200, ef_search: int = 64,
+                 initial_capacity: int = 1024):
+        if not HAS_HNSWLIB:
+            raise ImportError("HNSW索引需要安装hnswlib: pip install hnswlib")
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.initial_capacity = initial_capacity
+        self.reset()
+
+    def reset(self):
+        self._index = None
+        self._labels: set = set()
+        self._deleted: set = set()
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        # 标记删除的节点仍留在图中参与遍历
+        return len(self._deleted) > REBUILD_TOMBSTONE_RATIO * (len(self._labels) + len(self._deleted))
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if not len(ids):
+            return
+
+        if self._index is None:
+            self._index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+            self._index.init_index(max_elements=max(self.initial_capacity, len(ids)),
+                                   ef_construction=self.ef_construction, M=self.M)
+            self._index.set_ef(self.ef_search)
+
+        required = self._index.get_current_count() + len(ids)
+        if required > self._index.get_max_elements():
+            self._index.resize_index(max(required, self._index.get_max_elements() * 2))
+
+        # 已标记删除的标签重新加入时先取消删除标记，hnswlib会覆盖其向量
+        for vector_id in set(ids.tolist()) & self._deleted:
+            self._index.unmark_deleted(vector_id)
+            self._deleted.discard(vector_id)
+        self._index.add_items(vectors, ids)
+        self._labels.update(ids.tolist())
+
+    def remove(self, ids: np.ndarray):
+        for vector_id in np.asarray(ids, dtype=np.int64).tolist():
+            if vector_id in self._labels:
+                self._index.mark_deleted(vector_id)
+                self._labels.discard(vector_id)
+                self._deleted.add(vector_id)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self._labels))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        total = len(self._labels) + len(self._deleted)
+        ef = max(self.ef_search, k)
+        while True:
+            self._index.set_ef(ef)
+            try:
+                labels, distances = self._index.knn_query(query, k=k)
+                break
+            except RuntimeError:
+                # 大量节点标记删除后，遍历到的存活节点可能不足k个，hnswlib此时抛错；
+                # 先加大ef直至覆盖全部节点，仍不足时减小k
+                if ef < total:
+                    ef = min(ef * 2, total)
+                elif k > 1:
+                    k //= 2
+                else:
+                    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # ip空间的距离为 1 - 内积
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+class FaissIVFIndex(VectorIndex):
+    """FAISS IVF-Flat索引适配器，训练前使用精确的IndexFlatIP"""
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, train_size: int = 4096):
+        if not HAS_FAISS:
+            raise ImportError("FAISS索引需要安装faiss-cpu: pip install faiss-cpu")
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.reset()
+
+    def reset(self):
+        self._index = None
+        self._ids: set = set()
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        if not self._trained_size:
+            return len(self._ids) >= self.train_size
+        return len(self._ids) >= 2 * self._trained_size
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if not len(ids):
+            return
+
+        if self._index is None:
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+
+        self.remove(ids)
+        self._index.add_with_ids(vectors, ids)
+        self._ids.update(ids.tolist())
+
+    def remove(self, ids: np.ndarray):
+        # FAISS的remove_ids直接删除，无需墓碑
+        ids = [i for i in np.asarray(ids, dtype=np.int64).tolist() if i in self._ids]
+        if ids:
+            self._index.remove_ids(np.array(ids, dtype=np.int64))
+            self._ids.difference_update(ids)
+
+    def rebuild(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.reset()
+        if len(ids) < self.train_size:
+            self.add(ids, vectors)
+            return
+
+        dim = vectors.shape[1]
+        nlist = min(self.nlist or _default_nlist(len(ids)), len(ids))
+        self._quantizer = faiss.IndexFlatIP(dim)  # 保持引用，避免被回收
+        index = faiss.IndexIVFFlat(self._quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        self._index = index
+        self._ids = set(ids.tolist())
+        self._trained_size = len(ids)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self._ids))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if self._trained_size:
+            self._index.nprobe = self.nprobe
+        scores, ids = self._index.search(np.asarray(query, dtype=np.float32).reshape(1, -1), k)
+        found = ids[0] >= 0
+        return ids[0][found], scores[0][found]